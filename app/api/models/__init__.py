@@ -1,3 +1,6 @@
 from app.api.models.user import User  # noqa: F401
 from app.api.models.deck import Deck  # noqa: F401
-from app.api.models.flashcard import Flashcard  # noqa: F401
\ No newline at end of file
+from app.api.models.flashcard import Flashcard  # noqa: F401
+from app.api.models.generation_job import GenerationJob  # noqa: F401
+from app.api.models.revoked_token import RevokedToken  # noqa: F401
+from app.api.models.llm_usage import LLMUsage  # noqa: F401
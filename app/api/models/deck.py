@@ -1,19 +1,22 @@
 """Deck data model"""
 
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.core.base.model import BaseTableModel
 
 
 class Deck(BaseTableModel):
     __tablename__ = "decks"
+    __table_args__ = (Index("ix_decks_user_id_id", "user_id", "id"),)
 
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     # Relationship
-    cards = relationship("Flashcard", back_populates="deck", cascade="all, delete-orphan")
+    cards = relationship(
+        "Flashcard", back_populates="deck", cascade="all, delete-orphan", passive_deletes=True
+    )
     user = relationship("User", back_populates="decks")
 
     def __str__(self):
@@ -1,17 +1,18 @@
 """Flashcard data model"""
 
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.core.base.model import BaseTableModel
 
 
 class Flashcard(BaseTableModel):
     __tablename__ = "flashcards"
+    __table_args__ = (Index("ix_flashcards_deck_id_id", "deck_id", "id"),)
 
     question = Column(String, nullable=False)
     answer = Column(String, nullable=False)
     explanation = Column(String, nullable=True)
-    deck_id = Column(String, ForeignKey("decks.id"), nullable=False)
+    deck_id = Column(String, ForeignKey("decks.id", ondelete="CASCADE"), nullable=False)
 
     # Relationship
     deck = relationship("Deck", back_populates="cards")
@@ -0,0 +1,44 @@
+"""Generation job data model"""
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String
+from app.core.base.model import BaseTableModel
+
+
+class GenerationJob(BaseTableModel):
+    __tablename__ = "generation_jobs"
+    __table_args__ = (
+        Index("ix_generation_jobs_status_available_at", "status", "available_at"),
+        Index("ix_generation_jobs_user_id", "user_id"),
+        Index("ix_generation_jobs_deck_id", "deck_id"),
+    )
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    topic = Column(String, nullable=False)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String, nullable=False, default=PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime(timezone=True), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    deck_id = Column(String, ForeignKey("decks.id", ondelete="SET NULL"), nullable=True)
+    error = Column(String, nullable=True)
+
+    def __str__(self):
+        return f"GenerationJob: {self.topic} ({self.status})"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "topic": self.topic,
+            "status": self.status,
+            "attempts": self.attempts,
+            "deck_id": self.deck_id,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
@@ -0,0 +1,22 @@
+"""LLM usage data model"""
+
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer, String
+from app.core.base.model import BaseTableModel
+
+
+class LLMUsage(BaseTableModel):
+    __tablename__ = "llm_usage"
+    __table_args__ = (
+        Index("ix_llm_usage_user_id_created_at", "user_id", "created_at"),
+    )
+
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    topic = Column(String, nullable=False)
+    model = Column(String, nullable=True)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Float, nullable=False, default=0)
+
+    def __str__(self):
+        return f"LLMUsage: {self.user_id} ({self.total_tokens} tokens)"
@@ -0,0 +1,18 @@
+"""Revoked token data model"""
+
+from sqlalchemy import Column, DateTime, Index, String
+from app.core.base.model import BaseTableModel
+
+
+class RevokedToken(BaseTableModel):
+    __tablename__ = "revoked_tokens"
+    __table_args__ = (
+        Index("ix_revoked_tokens_created_at", "created_at"),
+        Index("ix_revoked_tokens_expires_at", "expires_at"),
+    )
+
+    jti = Column(String, unique=True, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __str__(self):
+        return f"RevokedToken: {self.jti}"
@@ -12,7 +12,9 @@ class User(BaseTableModel):
     password = Column(String, nullable=True)
 
     # Relationship
-    decks = relationship("Deck", back_populates="user", cascade="all, delete-orphan")
+    decks = relationship(
+        "Deck", back_populates="user", cascade="all, delete-orphan", passive_deletes=True
+    )
 
     def __str__(self):
         return "User: {}".format(self.username)
@@ -1,6 +1,53 @@
-from sqlalchemy.orm import Session
-from app.core.base.repository import BaseRepository
+from typing import List, Optional
+
+from sqlalchemy import Select, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.core.base.repository import AsyncBaseRepository, BaseRepository
 from app.api.models.deck import Deck
+from app.api.models.flashcard import Flashcard
+
+
+def deck_summaries_query(
+    user_id: str, limit: Optional[int] = None, before_id: Optional[str] = None
+) -> Select:
+    """
+    Build the query listing a user's decks without their cards, newest first.
+
+    Only the list columns are selected, plus the number of cards of each deck
+    counted by a correlated subquery, so no Flashcard rows are loaded.
+    IDs are time-ordered uuid7 strings, so paging on `id` is an index range scan.
+
+    Args:
+        user_id (str): The ID of the user.
+        limit (Optional[int]): The maximum number of rows.
+        before_id (Optional[str]): Only list decks created before the deck with this ID.
+
+    Returns:
+        Select: The query, yielding `id`, `name`, `description`, `user_id` and `card_count` rows.
+    """
+    card_count = (
+        select(func.count(Flashcard.id))
+        .where(Flashcard.deck_id == Deck.id)
+        .correlate(Deck)
+        .scalar_subquery()
+    )
+    query = (
+        select(
+            Deck.id,
+            Deck.name,
+            Deck.description,
+            Deck.user_id,
+            card_count.label("card_count"),
+        )
+        .where(Deck.user_id == user_id)
+        .order_by(Deck.id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        query = query.where(Deck.id < before_id)
+    return query
 
 
 class DeckRepository(BaseRepository[Deck]):
@@ -15,18 +62,48 @@ class DeckRepository(BaseRepository[Deck]):
     def __init__(self, db: Session):
         super().__init__(Deck, db)
 
-    def get_all_user_decks(self, user_id: str) -> list[Deck]:
+    def create_with_cards(
+        self, deck_data: dict, cards_data: List[dict], commit: bool = True
+    ) -> Deck:
         """
-        Get all decks for a specific user.
+        Create a deck and all of its flashcards in a single transaction.
+
+        The deck and the cards are each written with one INSERT ... RETURNING
+        statement (multi-row for the cards) and committed once, so either the whole
+        deck is saved or nothing is.
 
         Args:
-            user_id (str): The ID of the user.
+            deck_data (dict): The column values of the deck.
+            cards_data (List[dict]): The column values of each flashcard, without `deck_id`.
+            commit (bool): When False the transaction is left open, for the caller to
+                commit together with its own writes or roll back.
 
         Returns:
-            list[Deck]: A list of Deck objects associated with the user.
+            Deck: The created deck with its cards loaded.
         """
-        return self.db.query(self.model).filter(self.model.user_id == user_id).all()
-    
+        try:
+            deck = self.db.scalars(insert(Deck).returning(Deck), [deck_data]).one()
+            cards = []
+            if cards_data:
+                # The cards come back in the order of their parameters, as generated
+                cards = self.db.scalars(
+                    insert(Flashcard).returning(Flashcard, sort_by_parameter_order=True),
+                    [{**card, "deck_id": deck.id} for card in cards_data],
+                ).all()
+            set_committed_value(deck, "cards", cards)
+
+            # Detach the fully loaded rows (the cards follow the deck's cascade) so
+            # the commit does not expire them, which would cost a SELECT per object
+            # on the next attribute access.
+            self.db.expunge(deck)
+            if commit:
+                self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return deck
+
     def get_user_deck_by_id(self, deck_id: str, user_id: str) -> Deck:
         """
         Get a specific deck belonging to a user by deck ID.
@@ -40,4 +117,67 @@ class DeckRepository(BaseRepository[Deck]):
         return self.db.query(self.model).filter(
             self.model.id == deck_id,
             self.model.user_id == user_id
-        ).first()
\ No newline at end of file
+        ).first()
+
+
+class AsyncDeckRepository(AsyncBaseRepository[Deck]):
+    """
+    Async deck repository class for CRUD operations on Deck model.
+    Decks are returned with their cards eagerly loaded, since relationships
+    cannot be lazily loaded on an AsyncSession.
+    Attributes:
+        db (AsyncSession): The SQLAlchemy async session.
+    """
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(Deck, db)
+
+    async def get_user_deck_summaries(
+        self, user_id: str, limit: Optional[int] = None, before_id: Optional[str] = None
+    ) -> list[dict]:
+        """
+        Get the list columns and card count of the decks of a user in a single query, newest first.
+
+        Args:
+            user_id (str): The ID of the user.
+            limit (Optional[int]): The maximum number of decks.
+            before_id (Optional[str]): Only list decks created before the deck with this ID.
+
+        Returns:
+            list[dict]: The deck summaries.
+        """
+        rows = (
+            await self.db.execute(deck_summaries_query(user_id, limit, before_id))
+        ).mappings()
+        return [dict(row) for row in rows]
+
+    async def user_owns_deck(self, deck_id: str, user_id: str) -> bool:
+        """
+        Check that a deck exists and belongs to a user, without loading it.
+        Args:
+            deck_id (str): The ID of the deck
+            user_id (str): The ID of the user
+        Returns:
+            bool: Whether the user owns the deck
+        """
+        deck_id = await self.db.scalar(
+            select(self.model.id).where(
+                self.model.id == deck_id, self.model.user_id == user_id
+            )
+        )
+        return deck_id is not None
+
+    async def get_user_deck_by_id(self, deck_id: str, user_id: str) -> Deck:
+        """
+        Get a specific deck belonging to a user by deck ID.
+        Args:
+            deck_id (str): The ID of the deck to retrieve
+            user_id (str): The ID identifier of the user who owns the deck
+        Returns:
+            Deck: The deck object if found
+        """
+        return await self.db.scalar(
+            select(self.model)
+            .where(self.model.id == deck_id, self.model.user_id == user_id)
+            .options(selectinload(self.model.cards))
+        )
@@ -1,5 +1,9 @@
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.base.repository import BaseRepository
+from app.core.base.repository import AsyncBaseRepository, BaseRepository
 from app.api.models.flashcard import Flashcard
 
 class FlashCardRepository(BaseRepository[Flashcard]):
@@ -12,4 +16,39 @@ class FlashCardRepository(BaseRepository[Flashcard]):
     """
 
     def __init__(self, db: Session):
-        super().__init__(Flashcard, db)
\ No newline at end of file
+        super().__init__(Flashcard, db)
+
+
+class AsyncFlashCardRepository(AsyncBaseRepository[Flashcard]):
+    """
+    Async flashcard repository class for CRUD operations on Flashcard model.
+    It inherits from the AsyncBaseRepository class.
+    Attributes:
+        db (AsyncSession): The SQLAlchemy async session.
+    """
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(Flashcard, db)
+
+    async def get_deck_cards(
+        self, deck_id: str, limit: int, after_id: Optional[str] = None
+    ) -> list[Flashcard]:
+        """
+        Get a page of the cards of a deck in creation order.
+        IDs are time-ordered uuid7 strings, so paging on `id` is an index range scan.
+        Args:
+            deck_id (str): The ID of the deck.
+            limit (int): The maximum number of cards.
+            after_id (Optional[str]): Only list cards created after the card with this ID.
+        Returns:
+            list[Flashcard]: The cards.
+        """
+        query = (
+            select(self.model)
+            .where(self.model.deck_id == deck_id)
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        if after_id is not None:
+            query = query.where(self.model.id > after_id)
+        return list(await self.db.scalars(query))
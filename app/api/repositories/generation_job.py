@@ -0,0 +1,196 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from app.core.base.repository import BaseRepository
+from app.api.models.generation_job import GenerationJob
+
+
+class GenerationJobRepository(BaseRepository[GenerationJob]):
+    """
+    Generation job repository class for the persistent deck generation queue.
+    It inherits from the BaseRepository class.
+    Attributes:
+        db (Session): The SQLAlchemy session.
+    """
+
+    def __init__(self, db: Session):
+        super().__init__(GenerationJob, db)
+
+    def get_user_job(self, job_id: str, user_id: str) -> Optional[GenerationJob]:
+        """
+        Get a specific job belonging to a user by job ID.
+        Args:
+            job_id (str): The ID of the job to retrieve
+            user_id (str): The ID of the user who enqueued the job
+        Returns:
+            Optional[GenerationJob]: The job object if found
+        """
+        return self.db.query(self.model).filter(
+            self.model.id == job_id,
+            self.model.user_id == user_id,
+        ).first()
+
+    def claim_next(self, now: datetime) -> Optional[GenerationJob]:
+        """
+        Claim the next available pending job and mark it as running.
+
+        Jobs of users with the fewest running jobs come first, so one user queueing
+        many topics cannot hold every worker. Within that, the oldest job wins.
+        On PostgreSQL rows locked by another worker are skipped.
+
+        Args:
+            now (datetime): The current time.
+
+        Returns:
+            Optional[GenerationJob]: The claimed job, None if nothing is available.
+        """
+        running = (
+            select(self.model.user_id, func.count().label("running"))
+            .where(self.model.status == GenerationJob.RUNNING)
+            .group_by(self.model.user_id)
+            .subquery()
+        )
+        candidate = self.db.scalars(
+            select(self.model)
+            .outerjoin(running, running.c.user_id == self.model.user_id)
+            .where(
+                self.model.status == GenerationJob.PENDING,
+                self.model.available_at <= now,
+            )
+            .order_by(func.coalesce(running.c.running, 0), self.model.created_at)
+            .limit(1)
+            .with_for_update(skip_locked=True, of=self.model)
+        ).first()
+
+        if candidate is None:
+            self.db.rollback()
+            return None
+
+        # Only succeeds if no other worker claimed the job in the meantime
+        claimed = self.db.execute(
+            update(self.model)
+            .where(
+                self.model.id == candidate.id,
+                self.model.status == GenerationJob.PENDING,
+            )
+            .values(
+                status=GenerationJob.RUNNING,
+                attempts=self.model.attempts + 1,
+                started_at=now,
+            )
+        ).rowcount
+        self.db.commit()
+
+        if not claimed:
+            return None
+
+        self.db.refresh(candidate)
+        return candidate
+
+    def complete(self, job_id: str, deck_id: str, now: datetime) -> bool:
+        """
+        Mark a running job as succeeded with its deck, in the open transaction.
+
+        The caller commits, so the deck and the outcome of the job are saved together.
+        Args:
+            job_id (str): The ID of the job.
+            deck_id (str): The ID of the generated deck.
+            now (datetime): The current time.
+        Returns:
+            bool: False if the job is no longer running, e.g. it was requeued as stale.
+        """
+        return self.db.execute(
+            update(self.model)
+            .where(self.model.id == job_id, self.model.status == GenerationJob.RUNNING)
+            .values(
+                status=GenerationJob.SUCCEEDED,
+                deck_id=deck_id,
+                error=None,
+                finished_at=now,
+            )
+        ).rowcount > 0
+
+    def release(self, job_id: str, now: datetime) -> bool:
+        """
+        Return a running job to the queue without counting its attempt.
+        Args:
+            job_id (str): The ID of the job.
+            now (datetime): The current time.
+        Returns:
+            bool: False if the job is no longer running, e.g. it already succeeded.
+        """
+        released = self.db.execute(
+            update(self.model)
+            .where(self.model.id == job_id, self.model.status == GenerationJob.RUNNING)
+            .values(
+                status=GenerationJob.PENDING,
+                attempts=self.model.attempts - 1,
+                available_at=now,
+            )
+        ).rowcount
+        self.db.commit()
+        return released > 0
+
+    def requeue_stale(self, started_before: datetime, max_attempts: int) -> int:
+        """
+        Put back running jobs whose worker is presumed dead and that have attempts left.
+        Args:
+            started_before (datetime): Running jobs started before this time are requeued.
+            max_attempts (int): Jobs that made this many attempts are left to fail_stale.
+        Returns:
+            int: The number of requeued jobs.
+        """
+        requeued = self.db.execute(
+            update(self.model)
+            .where(
+                self.model.status == GenerationJob.RUNNING,
+                self.model.started_at < started_before,
+                self.model.attempts < max_attempts,
+            )
+            .values(status=GenerationJob.PENDING, available_at=started_before)
+        ).rowcount
+        self.db.commit()
+        return requeued
+
+    def fail_stale(
+        self, started_before: datetime, max_attempts: int, now: datetime, error: str
+    ) -> List[Tuple[str, str, str]]:
+        """
+        Mark running jobs whose worker is presumed dead as failed once they used up their attempts.
+        Args:
+            started_before (datetime): Running jobs started before this time are failed.
+            max_attempts (int): Only jobs that made this many attempts are failed.
+            now (datetime): The current time.
+            error (str): The error recorded on the jobs.
+        Returns:
+            List[Tuple[str, str, str]]: The ID, user ID and topic of every failed job.
+        """
+        failed = self.db.execute(
+            update(self.model)
+            .where(
+                self.model.status == GenerationJob.RUNNING,
+                self.model.started_at < started_before,
+                self.model.attempts >= max_attempts,
+            )
+            .values(status=GenerationJob.FAILED, finished_at=now, error=error)
+            .returning(self.model.id, self.model.user_id, self.model.topic)
+        ).all()
+        self.db.commit()
+        return [tuple(row) for row in failed]
+
+    def count_active(self) -> dict[str, int]:
+        """
+        Count pending and running jobs.
+        Returns:
+            dict[str, int]: The number of jobs of each active status.
+        """
+        rows = self.db.execute(
+            select(self.model.status, func.count())
+            .where(
+                self.model.status.in_([GenerationJob.PENDING, GenerationJob.RUNNING])
+            )
+            .group_by(self.model.status)
+        ).all()
+        return {status: count for status, count in rows}
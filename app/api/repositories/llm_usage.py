@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.base.repository import BaseRepository
+from app.api.models.llm_usage import LLMUsage
+
+
+class LLMUsageRepository(BaseRepository[LLMUsage]):
+    """
+    LLM usage repository class for the token ledger.
+    This class inherits from BaseRepository and provides specific methods for LLMUsage model.
+    Attributes:
+        model (Type[LLMUsage]): The SQLAlchemy LLMUsage model class.
+        db (Session): The SQLAlchemy session.
+    """
+
+    def __init__(self, db: Session):
+        super().__init__(LLMUsage, db)
+
+    def insert_many(self, rows: List[dict]) -> None:
+        """Insert usage records in one batch.
+
+        Args:
+            rows (List[dict]): The column values of each record.
+        """
+        self.db.execute(insert(self.model), rows)
+        self.db.commit()
+
+    def get_user_totals(self, user_id: str, since: datetime) -> dict:
+        """Sum the usage of a user since a given time.
+
+        Args:
+            user_id (str): The ID of the user.
+            since (datetime): The start of the period.
+
+        Returns:
+            dict: The number of requests and the prompt, completion and total tokens.
+        """
+        row = self.db.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(self.model.prompt_tokens), 0),
+                func.coalesce(func.sum(self.model.completion_tokens), 0),
+                func.coalesce(func.sum(self.model.total_tokens), 0),
+            ).where(self.model.user_id == user_id, self.model.created_at >= since)
+        ).one()
+        return {
+            "requests": row[0],
+            "prompt_tokens": row[1],
+            "completion_tokens": row[2],
+            "total_tokens": row[3],
+        }
+
+    def get_total_tokens(self, user_ids: List[str], since: datetime) -> Dict[str, int]:
+        """Sum the tokens used by several users since a given time.
+
+        Args:
+            user_ids (List[str]): The IDs of the users.
+            since (datetime): The start of the period.
+
+        Returns:
+            Dict[str, int]: The total tokens of each user with any usage.
+        """
+        statement = (
+            select(self.model.user_id, func.sum(self.model.total_tokens))
+            .where(self.model.user_id.in_(user_ids), self.model.created_at >= since)
+            .group_by(self.model.user_id)
+        )
+        return {user_id: total for user_id, total in self.db.execute(statement)}
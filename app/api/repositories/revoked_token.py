@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.base.repository import BaseRepository
+from app.api.models.revoked_token import RevokedToken
+
+
+class RevokedTokenRepository(BaseRepository[RevokedToken]):
+    """
+    Revoked token repository class for the token revocation table.
+    This class inherits from BaseRepository and provides specific methods for RevokedToken model.
+    Attributes:
+        model (Type[RevokedToken]): The SQLAlchemy RevokedToken model class.
+        db (Session): The SQLAlchemy session.
+    """
+
+    def __init__(self, db: Session):
+        super().__init__(RevokedToken, db)
+
+    def get_unexpired(
+        self, now: datetime, since: Optional[datetime] = None
+    ) -> List[Tuple[str, datetime, datetime]]:
+        """Get the revoked tokens that have not expired.
+
+        Args:
+            now (datetime): The current time.
+            since (Optional[datetime]): Only return tokens revoked at or after this time.
+
+        Returns:
+            List[Tuple[str, datetime, datetime]]: The `jti`, expiry and revocation time of each token.
+        """
+        statement = select(
+            self.model.jti, self.model.expires_at, self.model.created_at
+        ).where(self.model.expires_at > now)
+        if since is not None:
+            statement = statement.where(self.model.created_at >= since)
+        return [tuple(row) for row in self.db.execute(statement)]
+
+    def delete_expired(self, now: datetime) -> int:
+        """Delete the revoked tokens that have expired.
+
+        Args:
+            now (datetime): The current time.
+
+        Returns:
+            int: The number of deleted rows.
+        """
+        result = self.db.execute(delete(self.model).where(self.model.expires_at <= now))
+        self.db.commit()
+        return result.rowcount
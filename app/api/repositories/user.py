@@ -1,5 +1,7 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.base.repository import BaseRepository
+from app.core.base.repository import AsyncBaseRepository, BaseRepository
 from app.api.models.user import User
 
 
@@ -25,3 +27,28 @@ class UserRepository(BaseRepository[User]):
             User: The user object if found, None otherwise.
         """
         return self.db.query(self.model).filter(self.model.username == username).first()
+
+
+class AsyncUserRepository(AsyncBaseRepository[User]):
+    """
+    Async user repository class for CRUD operations on User model.
+    It inherits from the AsyncBaseRepository class.
+    Attributes:
+        db (AsyncSession): The SQLAlchemy async session.
+    """
+
+    def __init__(self, db: AsyncSession):
+        super().__init__(User, db)
+
+    async def get_by_username(self, username: str) -> User:
+        """Get a user by username.
+
+        Args:
+            username (str): The username of the user.
+
+        Returns:
+            User: The user object if found, None otherwise.
+        """
+        return await self.db.scalar(
+            select(self.model).where(self.model.username == username)
+        )
@@ -1,13 +1,22 @@
 from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Tuple
 
-from app.api.repositories.deck import DeckRepository
+from app.api.repositories.deck import AsyncDeckRepository, DeckRepository
+from app.api.repositories.flashcard import AsyncFlashCardRepository
 from app.api.services.flashcard import FlashCardService
 from app.api.models.deck import Deck
+from app.api.models.flashcard import Flashcard
 from app.api.v1.deck.schemas import DeckModel as DeckModel
+from app.api.v1.deck.schemas import Flashcard as FlashcardModel
 from app.api.v1.deck.schemas import UpdateDeckRequest
-from app.utils.logger import logger
+from app.utils.logger import get_logger
+from app.utils.pagination import decode_cursor, paginate
+
+
+# INFO records are sampled at LOG_SAMPLE_RATES["deck"]
+logger = get_logger("deck")
 
 
 class DeckService:
@@ -26,38 +35,76 @@ class DeckService:
         self.repository = DeckRepository(db)
         self.flashcard_service = FlashCardService(db)
 
-    def save_deck(self, deck_model: DeckModel, user_id: str) -> Deck:
+    def save_deck(self, deck_model: DeckModel, user_id: str, commit: bool = True) -> Deck:
         """
         Save a new deck to the database.
-        This method creates a new deck and its associated flashcards if provided.
+        This method creates a new deck and its associated flashcards if provided,
+        all in a single transaction.
 
         Args:
             deck_model (DeckModel): The deck model containing the deck data.
             user_id (str): The ID of the user creating the deck.
+            commit (bool): When False the transaction is left open for the caller to commit.
 
         Returns:
             Deck: The created deck object.
         """
-        new_deck = Deck(
-            name=deck_model.name,
-            description=deck_model.description,
-            user_id=user_id,
+        new_deck = self.repository.create_with_cards(
+            deck_data={
+                "name": deck_model.name,
+                "description": deck_model.description,
+                "user_id": user_id,
+            },
+            cards_data=[card.model_dump() for card in deck_model.cards or []],
+            commit=commit,
+        )
+
+        logger.info(
+            "Deck created with ID: %s, title: %s and %s cards",
+            new_deck.id,
+            new_deck.name,
+            len(new_deck.cards),
         )
+        return new_deck
+
+    def create_deck(self, name: str, description: str, user_id: str) -> Deck:
+        """
+        Create an empty deck that cards are added to as they are generated.
+
+        Args:
+            name (str): The name of the deck.
+            description (str): The description of the deck.
+            user_id (str): The ID of the user creating the deck.
+
+        Returns:
+            Deck: The created deck object.
+        """
+        new_deck = Deck(name=name, description=description, user_id=user_id)
         new_deck = self.repository.create(new_deck)
 
-        # Create flashcards if provided
-        if deck_model.cards:
-            for card in deck_model.cards:
-                self.flashcard_service.create_flashcard(
-                    question=card.question,
-                    answer=card.answer,
-                    explanation=card.explanation,
-                    deck_id=new_deck.id,
-                )
-
-        logger.info(f"Deck created with ID: {new_deck.id} and title: {new_deck.name}")
+        logger.info("Deck created with ID: %s and title: %s", new_deck.id, new_deck.name)
         return new_deck
 
+    def add_card(self, deck_id: str, card: FlashcardModel) -> Flashcard:
+        """
+        Add a single generated card to a deck created by the caller, without
+        looking the deck up again for every card.
+
+        Args:
+            deck_id (str): The ID of the deck.
+            card (FlashcardModel): The generated card.
+
+        Returns:
+            Flashcard: The created flashcard object.
+        """
+        return self.flashcard_service.create_flashcard(
+            question=card.question,
+            answer=card.answer,
+            explanation=card.explanation,
+            deck_id=deck_id,
+            validate_deck=False,
+        )
+
     def get_deck(self, deck_id: str, user_id: str) -> Deck:
         """
         Get a deck by its ID.
@@ -77,24 +124,9 @@ class DeckService:
                 detail=f"Deck with ID {deck_id} not found",
             )
 
-        logger.info(f"Fetching deck with ID: {deck_id}")
+        logger.info("Fetching deck with ID: %s", deck_id)
         return deck
 
-    def get_user_decks(self, user_id: str) -> List[Deck]:
-        """
-        Get all decks for a specific user.
-
-        Args:
-            user_id (str): The ID of the user.
-
-        Returns:
-            List[Deck]: A list of decks belonging to the user.
-        """
-        decks = self.repository.get_all_user_decks(user_id)
-
-        logger.info(f"Fetching decks for user with ID: {user_id}")
-        return decks
-
     def update_deck(self, deck_id: str, schema: UpdateDeckRequest, user_id: str) -> Deck:
         """
         Update an existing deck.
@@ -106,21 +138,25 @@ class DeckService:
         Returns:
             Optional[Deck]: The updated deck object if found, None otherwise.
         """
-        deck = self.repository.get_user_deck_by_id(deck_id, user_id)
+        update_data = schema.model_dump(exclude_unset=True)
+        if update_data:
+            deck = self.repository.update_fields(deck_id, update_data, user_id=user_id)
+        else:
+            deck = self.repository.get_user_deck_by_id(deck_id, user_id)
+
         if not deck:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Deck with ID {deck_id} not found",
             )
 
-        update_data = schema.model_dump(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(deck, key, value)
-
         logger.info(
-            f"Updating deck with ID: {deck_id} to name: {deck.name} and description: {deck.description}"
+            "Updating deck with ID: %s to name: %s and description: %s",
+            deck_id,
+            deck.name,
+            deck.description,
         )
-        return self.repository.update(deck)
+        return deck
 
     def delete_deck(self, deck_id: str, user_id: str) -> bool:
         """
@@ -132,14 +168,108 @@ class DeckService:
         Returns:
             bool: True if the deck was deleted, False otherwise.
         """
-        deck = self.repository.get_user_deck_by_id(deck_id, user_id)
+        if not self.repository.delete(id=deck_id, user_id=user_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Deck with ID {deck_id} not found",
+            )
+
+        logger.info("Deck with ID: %s deleted successfully", deck_id)
+        return True
+
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[str]:
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+class AsyncDeckService:
+    """
+    Async deck service class for deck reads served on the event loop.
+    Single decks are returned with their cards loaded, listings are paginated with cursors.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """
+        Initialize the AsyncDeckService with an async database session.
+
+        Args:
+            db (AsyncSession): The SQLAlchemy async session.
+        """
+        self.repository = AsyncDeckRepository(db)
+        self.flashcard_repository = AsyncFlashCardRepository(db)
+
+    async def get_deck(self, deck_id: str, user_id: str) -> Deck:
+        """
+        Get a deck by its ID.
+
+        Args:
+            deck_id (str): The ID of the deck.
+            user_id (str): The ID of the user.
+
+        Returns:
+            Deck: The deck object.
+        """
+        deck = await self.repository.get_user_deck_by_id(deck_id, user_id)
         if not deck:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Deck with ID {deck_id} not found",
             )
 
-        self.repository.delete(id=deck.id)
+        logger.info("Fetching deck with ID: %s", deck_id)
+        return deck
+
+    async def get_user_decks(
+        self, user_id: str, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Get a page of the decks of a user, newest first, without their cards.
 
-        logger.info(f"Deck with ID: {deck_id} deleted successfully")
-        return True
+        Args:
+            user_id (str): The ID of the user.
+            limit (int): The page size.
+            cursor (Optional[str]): The cursor returned with the previous page.
+
+        Returns:
+            Tuple[List[dict], Optional[str]]: The deck summaries and the cursor of the next page.
+        """
+        rows = await self.repository.get_user_deck_summaries(
+            user_id, limit=limit + 1, before_id=_decode_cursor(cursor)
+        )
+
+        logger.info("Fetching decks for user with ID: %s", user_id)
+        return paginate(rows, limit)
+
+    async def get_deck_cards(
+        self, deck_id: str, user_id: str, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[Flashcard], Optional[str]]:
+        """
+        Get a page of the cards of a deck in creation order.
+
+        Args:
+            deck_id (str): The ID of the deck.
+            user_id (str): The ID of the user.
+            limit (int): The page size.
+            cursor (Optional[str]): The cursor returned with the previous page.
+
+        Returns:
+            Tuple[List[Flashcard], Optional[str]]: The cards and the cursor of the next page.
+        """
+        after_id = _decode_cursor(cursor)
+        if not await self.repository.user_owns_deck(deck_id, user_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Deck with ID {deck_id} not found",
+            )
+
+        cards = await self.flashcard_repository.get_deck_cards(
+            deck_id, limit=limit + 1, after_id=after_id
+        )
+
+        logger.info("Fetching cards of deck with ID: %s", deck_id)
+        return paginate(cards, limit)
@@ -4,7 +4,11 @@ from fastapi import HTTPException, status
 from app.api.repositories.flashcard import FlashCardRepository
 from app.api.repositories.deck import DeckRepository
 from app.api.models.flashcard import Flashcard
-from app.utils.logger import logger
+from app.utils.logger import get_logger
+
+
+# INFO records are sampled at LOG_SAMPLE_RATES["flashcard"]
+logger = get_logger("flashcard")
 
 
 class FlashCardService:
@@ -17,36 +21,43 @@ class FlashCardService:
         self.repository = FlashCardRepository(db)
         self.deck_repository = DeckRepository(db)
 
-    def create_flashcard(self, question: str, answer: str, explanation: str, deck_id: str) -> Flashcard:
+    def create_flashcard(
+        self,
+        question: str,
+        answer: str,
+        explanation: str,
+        deck_id: str,
+        validate_deck: bool = True,
+    ) -> Flashcard:
         """
         Create a new flashcard.
         Args:
             question (str): The question for the flashcard.
             answer (str): The answer for the flashcard.
             deck_id (str): The ID of the deck to which the flashcard belongs.
+            validate_deck (bool): Look the deck up first; skip it for a deck the caller just created.
         Returns:
             Flashcard: The created flashcard object.
         """
 
         # Validate deck ID
-        deck = self.deck_repository.get(deck_id)
-        if not deck:
-            logger.error(f"Deck with ID {deck_id} not found.")
+        if validate_deck and not self.deck_repository.get(deck_id):
+            logger.error("Deck with ID %s not found.", deck_id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Deck with ID {deck_id} not found.",
             )
-        
+
         new_flashcard = Flashcard(
             question=question,
             answer=answer,
             explanation=explanation,
-            deck_id=deck.id,
+            deck_id=deck_id,
         )
 
         new_flashcard = self.repository.create(new_flashcard)
 
         logger.info(
-            f"Creating flashcard with ID: {new_flashcard.id} and question: {new_flashcard.question} for deck ID: {deck.id}"
+            "Created flashcard with ID: %s for deck ID: %s", new_flashcard.id, deck_id
         )
         return new_flashcard
@@ -0,0 +1,431 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.api.models.deck import Deck
+from app.api.models.generation_job import GenerationJob
+from app.api.repositories.generation_job import GenerationJobRepository
+from app.api.services.deck import DeckService
+from app.api.services.llm import AsyncLLMService, TokenUsage, get_async_llm_service
+from app.api.services.usage import charge_llm_usage
+from app.api.v1.deck.schemas import DeckModel
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.utils.logger import logger
+from app.utils.metrics import (
+    generation_job_attempts,
+    generation_job_run_seconds,
+    generation_job_wait_seconds,
+    generation_jobs_queued,
+)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; every timestamp here is written in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class GenerationJobService:
+    """
+    Generation job service class for the background deck generation queue.
+    This class provides methods for enqueueing jobs, tracking their status and recording their outcome.
+    """
+
+    def __init__(self, db: Session):
+        """
+        Initialize the GenerationJobService with a database session.
+
+        Args:
+            db (Session): The SQLAlchemy session.
+        """
+        self.repository = GenerationJobRepository(db)
+        self.deck_service = DeckService(db)
+
+    def enqueue(self, topic: str, user_id: str) -> GenerationJob:
+        """
+        Enqueue a deck generation job.
+
+        Args:
+            topic (str): The topic for which to generate the deck.
+            user_id (str): The ID of the user requesting the deck.
+
+        Returns:
+            GenerationJob: The pending job.
+        """
+        job = GenerationJob(
+            topic=topic,
+            user_id=user_id,
+            status=GenerationJob.PENDING,
+            attempts=0,
+            available_at=_utcnow(),
+        )
+        job = self.repository.create(job)
+
+        logger.info("Generation job enqueued with ID: %s for topic: %s", job.id, topic)
+        return job
+
+    def get_job(self, job_id: str, user_id: str) -> GenerationJob:
+        """
+        Get a job by its ID.
+
+        Args:
+            job_id (str): The ID of the job.
+            user_id (str): The ID of the user.
+
+        Returns:
+            GenerationJob: The job object.
+        """
+        job = self.repository.get_user_job(job_id, user_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Job with ID {job_id} not found",
+            )
+
+        return job
+
+    def claim_next_job(self) -> Optional[GenerationJob]:
+        """
+        Claim the next job to run.
+
+        Returns:
+            Optional[GenerationJob]: The claimed job, None if the queue is empty.
+        """
+        return self.repository.claim_next(now=_utcnow())
+
+    def complete_job(self, job_id: str, user_id: str, deck_model: DeckModel) -> Optional[Deck]:
+        """
+        Save the generated deck of a job and mark the job as succeeded, in one transaction.
+
+        Args:
+            job_id (str): The ID of the job.
+            user_id (str): The ID of the user who enqueued the job.
+            deck_model (DeckModel): The generated deck.
+
+        Returns:
+            Optional[Deck]: The saved deck, None if the job is no longer running and
+            the deck was discarded.
+        """
+        db = self.repository.db
+        # So the user reads the new deck from the primary, despite replication lag
+        db.info["user_id"] = user_id
+        try:
+            deck = self.deck_service.save_deck(
+                deck_model=deck_model, user_id=user_id, commit=False
+            )
+            if not self.repository.complete(job_id, deck_id=deck.id, now=_utcnow()):
+                db.rollback()
+                logger.warning("Generation job %s is no longer running, discarding its deck", job_id)
+                return None
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        logger.info("Generation job %s succeeded with deck ID: %s", job_id, deck.id)
+        return deck
+
+    def fail_job(self, job_id: str, error: str) -> GenerationJob:
+        """
+        Record a failed attempt, scheduling a retry with exponential backoff
+        until the maximum number of attempts is reached.
+
+        Args:
+            job_id (str): The ID of the job.
+            error (str): The error of the failed attempt.
+
+        Returns:
+            GenerationJob: The updated job.
+        """
+        job = self.repository.get(job_id)
+
+        if job.attempts < settings.JOB_MAX_ATTEMPTS:
+            delay = settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            values = {
+                "status": GenerationJob.PENDING,
+                "available_at": _utcnow() + timedelta(seconds=delay),
+            }
+            logger.warning(
+                "Generation job %s failed on attempt %s, retrying in %ss: %s",
+                job_id,
+                job.attempts,
+                delay,
+                error,
+            )
+        else:
+            values = {"status": GenerationJob.FAILED, "finished_at": _utcnow()}
+            logger.error(
+                "Generation job %s failed after %s attempts: %s",
+                job_id,
+                job.attempts,
+                error,
+            )
+
+        return self.repository.update_fields(job_id, {**values, "error": error})
+
+    def release_job(self, job_id: str) -> bool:
+        """
+        Return an interrupted job to the queue without counting the attempt.
+
+        Args:
+            job_id (str): The ID of the job.
+
+        Returns:
+            bool: False if the job is no longer running, e.g. it already succeeded.
+        """
+        return self.repository.release(job_id, now=_utcnow())
+
+    def requeue_stale_jobs(self) -> int:
+        """
+        Requeue running jobs that exceeded the job timeout, e.g. after a worker crash,
+        unless they reached the maximum number of attempts.
+
+        Returns:
+            int: The number of requeued jobs.
+        """
+        started_before = _utcnow() - timedelta(seconds=settings.JOB_TIMEOUT)
+        return self.repository.requeue_stale(
+            started_before=started_before, max_attempts=settings.JOB_MAX_ATTEMPTS
+        )
+
+    def fail_stale_jobs(self) -> List[Tuple[str, str, str]]:
+        """
+        Fail running jobs that exceeded the job timeout on their last attempt.
+
+        Returns:
+            List[Tuple[str, str, str]]: The ID, user ID and topic of every failed job.
+        """
+        now = _utcnow()
+        failed = self.repository.fail_stale(
+            started_before=now - timedelta(seconds=settings.JOB_TIMEOUT),
+            max_attempts=settings.JOB_MAX_ATTEMPTS,
+            now=now,
+            error=f"Timed out after {settings.JOB_MAX_ATTEMPTS} attempts",
+        )
+        for job_id, _, _ in failed:
+            logger.error(
+                "Generation job %s timed out after %s attempts",
+                job_id,
+                settings.JOB_MAX_ATTEMPTS,
+            )
+        return failed
+
+    def count_active_jobs(self) -> dict[str, int]:
+        """
+        Count pending and running jobs.
+
+        Returns:
+            dict[str, int]: The number of jobs of each active status.
+        """
+        counts = self.repository.count_active()
+        return {
+            GenerationJob.PENDING: counts.get(GenerationJob.PENDING, 0),
+            GenerationJob.RUNNING: counts.get(GenerationJob.RUNNING, 0),
+        }
+
+
+class GenerationWorkerPool:
+    """
+    Bounded pool of asyncio workers draining the generation job queue.
+    The LLM call is awaited on the event loop and database work runs in the threadpool,
+    each worker using its own short-lived sessions.
+    Attributes:
+        workers (int): The number of concurrent workers.
+        poll_interval (float): Seconds an idle worker waits before polling the queue again.
+        sweep_interval (float): Seconds between sweeps of the jobs whose worker is presumed dead.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.JOB_WORKERS,
+        poll_interval: float = settings.JOB_POLL_INTERVAL,
+        session_factory: Callable[[], Session] = SessionLocal,
+        llm_service_factory: Callable[[], AsyncLLMService] = get_async_llm_service,
+        sweep_interval: float = settings.JOB_TIMEOUT,
+    ):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.session_factory = session_factory
+        self.llm_service_factory = llm_service_factory
+        self.sweep_interval = sweep_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._next_sweep = 0.0
+
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.wait_seconds_total = 0.0
+        self.run_seconds_total = 0.0
+
+    async def start(self) -> None:
+        """Sweep stale jobs and start the workers."""
+        self._wakeup = asyncio.Event()
+        await self._sweep_stale_jobs()
+
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"generation-worker-{n}")
+            for n in range(self.workers)
+        ]
+        logger.info("Started %s generation workers", self.workers)
+
+    async def stop(self) -> None:
+        """Stop the workers, returning their in-progress jobs to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Stopped generation workers")
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was enqueued."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def observe_queue_depth(self) -> dict[str, int]:
+        """Count the pending and running jobs and export them as the queue depth gauge.
+
+        Returns:
+            dict[str, int]: The number of jobs of each active status.
+        """
+        counts = self._call("count_active_jobs")
+        for job_status, count in counts.items():
+            generation_jobs_queued.labels(job_status).set(count)
+        return counts
+
+    def stats(self) -> dict:
+        """Return the queue depth together with throughput and per-attempt latency counters."""
+        attempts = max(self.completed + self.failed + self.retried, 1)
+        return {
+            **self.observe_queue_depth(),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "average_wait_seconds": self.wait_seconds_total / attempts,
+            "average_run_seconds": self.run_seconds_total / attempts,
+        }
+
+    def _call(self, method: str, *args):
+        with self.session_factory() as db:
+            return getattr(GenerationJobService(db), method)(*args)
+
+    def _claim(self) -> Optional[dict]:
+        with self.session_factory() as db:
+            job = GenerationJobService(db).claim_next_job()
+            if job is None:
+                return None
+            # Plain values, so nothing is lazily loaded once the session is gone
+            return {
+                "id": job.id,
+                "topic": job.topic,
+                "user_id": job.user_id,
+                "attempts": job.attempts,
+                "available_at": _as_utc(job.available_at),
+                "started_at": _as_utc(job.started_at),
+            }
+
+    async def _sweep_stale_jobs(self) -> None:
+        # Workers share one event loop, so only the first to find the sweep due runs it
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        try:
+            requeued = await run_in_threadpool(self._call, "requeue_stale_jobs")
+            if requeued:
+                logger.warning("Requeued %s stale generation jobs", requeued)
+                self.notify()
+
+            for _, user_id, topic in await run_in_threadpool(self._call, "fail_stale_jobs"):
+                self.failed += 1
+                generation_job_attempts.labels("failed").inc()
+                # Nothing is known of the lost attempt's usage; this settles the reservation
+                await charge_llm_usage(user_id, topic, TokenUsage())
+        except Exception as e:
+            logger.error("Error sweeping stale generation jobs: %s", e)
+
+    async def _work(self) -> None:
+        while True:
+            if time.monotonic() >= self._next_sweep:
+                await self._sweep_stale_jobs()
+
+            try:
+                job = await run_in_threadpool(self._claim)
+            except Exception as e:
+                logger.error("Error claiming generation job: %s", e)
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(job)
+
+    async def _process(self, job: dict) -> None:
+        wait = (job["started_at"] - job["available_at"]).total_seconds()
+        self.wait_seconds_total += wait
+        generation_job_wait_seconds.observe(wait)
+        started = time.perf_counter()
+        usage = TokenUsage()
+        # The reservation taken at enqueue is settled once the job will not run again
+        finished = False
+        completion: Optional[asyncio.Future] = None
+
+        try:
+            deck_model = await self.llm_service_factory().generate_deck_from_topic(
+                topic=job["topic"], usage=usage
+            )
+            # Shielded, so shutting down cannot interrupt saving the deck
+            completion = asyncio.ensure_future(
+                run_in_threadpool(
+                    self._call, "complete_job", job["id"], job["user_id"], deck_model
+                )
+            )
+            # A discarded deck means the job was requeued and another worker settles it
+            finished = await asyncio.shield(completion) is not None
+            self.completed += 1
+            generation_job_attempts.labels("completed").inc()
+        except asyncio.CancelledError:
+            if completion is not None:
+                # Let the deck finish saving instead of running the job again
+                await asyncio.wait([completion])
+            if completion is not None and completion.exception() is None:
+                finished = completion.result() is not None
+                self.completed += 1
+                generation_job_attempts.labels("completed").inc()
+            else:
+                # Shutting down: hand the job back rather than waiting for the stale timeout
+                await run_in_threadpool(self._call, "release_job", job["id"])
+                generation_job_attempts.labels("released").inc()
+            raise
+        except Exception as e:
+            updated = await run_in_threadpool(self._call, "fail_job", job["id"], str(e))
+            if updated.status == GenerationJob.PENDING:
+                self.retried += 1
+                generation_job_attempts.labels("retried").inc()
+            else:
+                finished = True
+                self.failed += 1
+                generation_job_attempts.labels("failed").inc()
+        finally:
+            run = time.perf_counter() - started
+            self.run_seconds_total += run
+            generation_job_run_seconds.observe(run)
+            # The budgets were checked and the request cost taken when the job was enqueued
+            await charge_llm_usage(
+                job["user_id"], job["topic"], usage, settle_reservation=finished
+            )
+
+
+# Worker pool started in the application lifespan
+generation_worker_pool = GenerationWorkerPool()
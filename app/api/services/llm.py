@@ -1,9 +1,119 @@
+import hashlib
 import json
-from groq import Groq
+import re
+import time
+import unicodedata
+from functools import lru_cache
+from typing import Any, AsyncIterator, Optional, Tuple
+from groq import AsyncGroq, Groq
+from pydantic import ValidationError
 
 from app.api.v1.deck.schemas import DeckModel, Flashcard
 from app.core.config import settings
+from app.utils.cache import CacheBackend, TieredCache, build_cache
+from app.utils.json_stream import DeckStreamParser
 from app.utils.logger import logger
+from app.utils.metrics import llm_request_errors, observe_llm_completion
+from app.utils.single_flight import FileLockBackend, SingleFlight
+
+# Cache of generated decks shared by every LLM service instance
+deck_cache = (
+    build_cache(
+        max_size=settings.DECK_CACHE_MAX_SIZE,
+        ttl=settings.DECK_CACHE_TTL,
+        shared_url=settings.CACHE_SHARED_URL,
+        name="deck",
+    )
+    if settings.DECK_CACHE_ENABLED
+    else None
+)
+
+
+class TokenUsage:
+    """
+    The LLM tokens consumed on behalf of one request or job.
+    Attributes:
+        completions (int): Completions requested.
+        prompt_tokens (int): Prompt tokens consumed.
+        completion_tokens (int): Completion tokens consumed.
+        total_tokens (int): Prompt and completion tokens consumed.
+        model (Optional[str]): The model of the last completion.
+        latency (float): Seconds spent waiting for completions.
+    """
+
+    def __init__(self):
+        self.completions = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self.model: Optional[str] = None
+        self.latency = 0.0
+
+    def add(self, usage: Any, model: Optional[str] = None, latency: float = 0.0) -> None:
+        """Add a completion and the usage reported with it, if any.
+        Args:
+            usage (Any): The `usage` of the completion, or None.
+            model (Optional[str]): The model that served it.
+            latency (float): Seconds it took.
+        """
+        self.completions += 1
+        self.prompt_tokens += getattr(usage, "prompt_tokens", None) or 0
+        self.completion_tokens += getattr(usage, "completion_tokens", None) or 0
+        self.total_tokens += getattr(usage, "total_tokens", None) or 0
+        self.model = model or self.model
+        self.latency += latency
+
+
+def build_generation_flight(
+    lock_dir: str, cache: Optional[CacheBackend]
+) -> SingleFlight:
+    """
+    Build the coalescer of concurrent generations of the same topic.
+
+    With a lock directory the workers of the host take turns generating a topic,
+    and the ones that waited read the deck from the shared tier of the deck cache.
+    Without that tier they would generate it again, so it is required.
+
+    Args:
+        lock_dir (str): The directory of the cross-worker locks, empty for none.
+        cache (Optional[CacheBackend]): The deck cache.
+
+    Returns:
+        SingleFlight: The coalescer.
+
+    Raises:
+        ValueError: If a lock directory is set without a shared deck cache.
+    """
+    if not lock_dir:
+        return SingleFlight("generation")
+
+    if not isinstance(cache, TieredCache) or cache.shared is None:
+        raise ValueError(
+            "GENERATION_LOCK_DIR requires DECK_CACHE_ENABLED and a CACHE_SHARED_URL"
+        )
+    return SingleFlight("generation", lock_backend=FileLockBackend(lock_dir))
+
+
+# Coalesces concurrent generations of the same topic, across workers when a lock directory is set
+generation_flight = build_generation_flight(settings.GENERATION_LOCK_DIR, deck_cache)
+
+
+def normalize_topic(topic: str) -> str:
+    """
+    Normalize a topic so that trivially different spellings share a cache entry.
+    e.g. "The French Revolution " and "french   revolution" both become "french revolution".
+
+    Args:
+        topic (str): The topic as typed by the user.
+
+    Returns:
+        str: The normalized topic.
+    """
+    topic = unicodedata.normalize("NFKC", topic).casefold()
+    topic = re.sub(r"[^\w\s]", " ", topic)
+    topic = re.sub(r"\s+", " ", topic).strip()
+    return re.sub(r"^(the|a|an) ", "", topic)
+
 
 class LLMService:
     """
@@ -11,6 +121,8 @@ class LLMService:
     This class provides methods for generating decks based on a given topic.
     """
     
+    MODEL = "deepseek-r1-distill-llama-70b"
+
     SYSTEM_PROMPT = """
     You are an expert educational tutor specializing in creating structured flashcard decks. Your task is to generate valid JSON output ONLY, following these strict rules:
 
@@ -51,56 +163,170 @@ class LLMService:
 
     SAMPLE_JSON_DECK = SAMPLE_DECK.model_dump_json(indent=2)
 
-    def __init__(self, client: Groq = None, api_key: str = settings.GROQ_API_KEY):
+    # Changes whenever the prompts change, so cached decks from older prompts are not reused
+    PROMPT_VERSION = hashlib.sha256(
+        (SYSTEM_PROMPT + USER_PROMPT + SAMPLE_JSON_DECK).encode()
+    ).hexdigest()[:12]
+
+    def __init__(
+        self,
+        client: Groq = None,
+        api_key: str = settings.GROQ_API_KEY,
+        cache: Optional[CacheBackend] = deck_cache,
+    ):
         """
         Initialize the LLMService with a Groq client.
         
         Args:
             client (Groq, optional): An instance of the Groq client. Defaults to None.
             api_key (str, optional): The API key for the Groq client. Defaults to settings.GROQ_API_KEY.
+            cache (CacheBackend, optional): Cache of generated decks. Defaults to the shared deck cache.
         """
         self.client = client or Groq(api_key=api_key)
+        self.cache = cache
 
-    def generate_deck_from_topic(self, topic: str) -> DeckModel:
+    def cache_key(self, topic: str) -> str:
         """
-        Generate a deck based on a given topic using the Groq API.
-        
+        Build the cache key of a topic for the current model and prompt version.
+
         Args:
             topic (str): The topic for which to generate the deck.
-        
+
         Returns:
-            Deck: The generated deck.
-        
+            str: The cache key.
+        """
+        return f"deck:{self.MODEL}:{self.PROMPT_VERSION}:{normalize_topic(topic)}"
+
+    def get_cached_deck(self, topic: str) -> Optional[DeckModel]:
+        """
+        Look up a previously generated deck for a topic.
+
+        Args:
+            topic (str): The topic for which to generate the deck.
+
+        Returns:
+            Optional[DeckModel]: The cached deck, None on a miss or when caching is disabled.
+        """
+        if self.cache is None:
+            return None
+
+        return self._cached_deck(topic, self.cache.get(self.cache_key(topic)))
+
+    async def get_cached_deck_async(self, topic: str) -> Optional[DeckModel]:
+        """
+        Async variant of get_cached_deck that keeps the shared tier off the event loop.
+
+        Args:
+            topic (str): The topic for which to generate the deck.
+
+        Returns:
+            Optional[DeckModel]: The cached deck, None on a miss or when caching is disabled.
+        """
+        if self.cache is None:
+            return None
+
+        return self._cached_deck(topic, await self.cache.aget(self.cache_key(topic)))
+
+    def _cached_deck(self, topic: str, cached_deck: Optional[dict]) -> Optional[DeckModel]:
+        if cached_deck is None:
+            return None
+
+        logger.info("Deck cache hit for topic: %s", topic)
+        return DeckModel.model_validate(cached_deck)
+
+    def cache_deck(self, topic: str, deck: DeckModel) -> None:
+        """
+        Store a generated deck for later requests on the same topic.
+
+        Args:
+            topic (str): The topic for which the deck was generated.
+            deck (DeckModel): The generated deck.
+        """
+        if self.cache is not None:
+            self.cache.set(self.cache_key(topic), deck.model_dump())
+
+    async def cache_deck_async(self, topic: str, deck: DeckModel) -> None:
+        """
+        Async variant of cache_deck that keeps the shared tier off the event loop.
+
+        Args:
+            topic (str): The topic for which the deck was generated.
+            deck (DeckModel): The generated deck.
+        """
+        if self.cache is not None:
+            await self.cache.aset(self.cache_key(topic), deck.model_dump())
+
+    def build_completion_kwargs(self, topic: str) -> dict:
+        """
+        Build the keyword arguments for a chat completion request.
+
+        Args:
+            topic (str): The topic for which to generate the deck.
+
+        Returns:
+            dict: The keyword arguments passed to `chat.completions.create`.
+        """
+        return {
+            "model": self.MODEL,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": self.SYSTEM_PROMPT.format(
+                        json_structure=self.SAMPLE_JSON_DECK,
+                    ),
+                },
+                {
+                    "role": "user",
+                    "content": self.USER_PROMPT.format(
+                        topic=topic,
+                    ),
+                },
+            ],
+            "temperature": 0.6,
+            "max_completion_tokens": 4096,
+            "top_p": 0.95,
+            "stream": False,
+            "response_format": {"type": "json_object"},
+            "stop": None,
+        }
+
+    def record_completion(
+        self,
+        model: str,
+        mode: str,
+        started: float,
+        reported_usage: Any,
+        usage: Optional[TokenUsage] = None,
+    ) -> None:
+        """
+        Record the latency and tokens of a completion in the metrics and the caller's usage.
+
+        Args:
+            model (str): The model that served the completion.
+            mode (str): `completion` or `stream`.
+            started (float): The `time.perf_counter()` at which it was requested.
+            reported_usage (Any): The `usage` reported with it, or None.
+            usage (Optional[TokenUsage]): The usage of the caller, if collected.
+        """
+        latency = time.perf_counter() - started
+        observe_llm_completion(model, mode, latency, reported_usage)
+        if usage is not None:
+            usage.add(reported_usage, model=model, latency=latency)
+
+    def parse_deck(self, json_output: str) -> DeckModel:
+        """
+        Parse and validate the raw JSON output of the LLM.
+
+        Args:
+            json_output (str): The raw completion content.
+
+        Returns:
+            DeckModel: The validated deck.
+
         Raises:
             ValueError: If the JSON output is invalid or cannot be validated against the Deck model.
         """
         try:
-            completion = self.client.chat.completions.create(
-                model="deepseek-r1-distill-llama-70b",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self.SYSTEM_PROMPT.format(
-                            json_structure=self.SAMPLE_JSON_DECK,
-                        ),
-                    },
-                    {
-                        "role": "user",
-                        "content": self.USER_PROMPT.format(
-                            topic=topic,
-                        ),
-                    },
-                ],
-                temperature=0.6,
-                max_completion_tokens=4096,
-                top_p=0.95,
-                stream=False,
-                response_format={"type": "json_object"},
-                stop=None,
-            )
-
-            json_output = completion.choices[0].message.content
-
             # Validate the JSON output
             parsed_deck = json.loads(json_output)
             logger.info("Valid JSON output received from LLM and parsed.")
@@ -116,4 +342,219 @@ class LLMService:
 
         except Exception as e:
             logger.error("Error validating JSON output: %s", e)
-            raise ValueError("Error validating JSON output received from LLM") from e
\ No newline at end of file
+            raise ValueError("Error validating JSON output received from LLM") from e
+
+    def generate_deck_from_topic(
+        self, topic: str, usage: Optional[TokenUsage] = None
+    ) -> DeckModel:
+        """
+        Generate a deck based on a given topic using the Groq API.
+        
+        Args:
+            topic (str): The topic for which to generate the deck.
+            usage (Optional[TokenUsage]): Collects the tokens consumed; a cached deck consumes none.
+        
+        Returns:
+            Deck: The generated deck.
+        
+        Raises:
+            ValueError: If the JSON output is invalid or cannot be validated against the Deck model.
+        """
+        cached_deck = self.get_cached_deck(topic)
+        if cached_deck is not None:
+            return cached_deck
+
+        kwargs = self.build_completion_kwargs(topic)
+        started = time.perf_counter()
+        try:
+            completion = self.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            logger.error("Error requesting completion from LLM: %s", e)
+            llm_request_errors.labels(kwargs["model"], "completion").inc()
+            raise ValueError("Error requesting completion from LLM") from e
+
+        self.record_completion(
+            kwargs["model"], "completion", started, completion.usage, usage
+        )
+        deck = self.parse_deck(completion.choices[0].message.content)
+        self.cache_deck(topic, deck)
+        return deck
+
+
+class AsyncLLMService(LLMService):
+    """
+    Asynchronous variant of the LLMService built on the async Groq client.
+    Completions are awaited on the event loop instead of pinning a threadpool worker.
+    """
+
+    def __init__(
+        self,
+        client: AsyncGroq = None,
+        api_key: str = settings.GROQ_API_KEY,
+        cache: Optional[CacheBackend] = deck_cache,
+        single_flight: SingleFlight = generation_flight,
+    ):
+        """
+        Initialize the AsyncLLMService with an async Groq client.
+
+        Args:
+            client (AsyncGroq, optional): An instance of the async Groq client. Defaults to None.
+            api_key (str, optional): The API key for the Groq client. Defaults to settings.GROQ_API_KEY.
+            cache (CacheBackend, optional): Cache of generated decks. Defaults to the shared deck cache.
+            single_flight (SingleFlight, optional): Coalescer of identical generations. Defaults to the shared one.
+        """
+        self.client = client or AsyncGroq(api_key=api_key)
+        self.cache = cache
+        self.single_flight = single_flight
+
+    async def generate_deck_from_topic(
+        self, topic: str, usage: Optional[TokenUsage] = None
+    ) -> DeckModel:
+        """
+        Generate a deck based on a given topic using the async Groq API.
+
+        Args:
+            topic (str): The topic for which to generate the deck.
+            usage (Optional[TokenUsage]): Collects the tokens consumed; a cached deck
+                or one shared with a concurrent request consumes none.
+
+        Returns:
+            DeckModel: The generated deck.
+
+        Raises:
+            ValueError: If the JSON output is invalid or cannot be validated against the Deck model.
+        """
+        cached_deck = await self.get_cached_deck_async(topic)
+        if cached_deck is not None:
+            return cached_deck
+
+        # Concurrent requests for the same topic share a single completion
+        return await self.single_flight.do(
+            self.cache_key(topic), lambda: self._generate_uncached(topic, usage)
+        )
+
+    async def _generate_uncached(
+        self, topic: str, usage: Optional[TokenUsage] = None
+    ) -> DeckModel:
+        """Request a deck from the LLM and cache it."""
+        if self.single_flight.lock_backend is not None:
+            # Another worker may have generated the deck while this one waited for the lock
+            cached_deck = await self.get_cached_deck_async(topic)
+            if cached_deck is not None:
+                return cached_deck
+
+        kwargs = self.build_completion_kwargs(topic)
+        started = time.perf_counter()
+        try:
+            completion = await self.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            logger.error("Error requesting completion from LLM: %s", e)
+            llm_request_errors.labels(kwargs["model"], "completion").inc()
+            raise ValueError("Error requesting completion from LLM") from e
+
+        self.record_completion(
+            kwargs["model"], "completion", started, completion.usage, usage
+        )
+        deck = self.parse_deck(completion.choices[0].message.content)
+        await self.cache_deck_async(topic, deck)
+        return deck
+
+    async def stream_deck_from_topic(
+        self, topic: str, usage: Optional[TokenUsage] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a deck for a given topic, yielding each part as soon as it is complete.
+
+        Args:
+            topic (str): The topic for which to generate the deck.
+            usage (Optional[TokenUsage]): Collects the tokens consumed, estimated from
+                the streamed content if the stream ends before reporting its usage.
+
+        Yields:
+            Tuple[str, Any]: ("field", (key, value)) for top-level deck fields such as
+                the name and description, and ("card", Flashcard) for every card.
+
+        Raises:
+            ValueError: If the completion fails or the streamed JSON is invalid.
+        """
+        cached_deck = await self.get_cached_deck_async(topic)
+        if cached_deck is not None:
+            yield "field", ("name", cached_deck.name)
+            yield "field", ("description", cached_deck.description)
+            for card in cached_deck.cards:
+                yield "card", card
+            return
+
+        kwargs = self.build_completion_kwargs(topic)
+        # JSON mode is not available for streamed completions; the system prompt
+        # already constrains the output and the parser skips any preamble.
+        kwargs.pop("response_format")
+        kwargs.update(stream=True, reasoning_format="hidden")
+
+        started = time.perf_counter()
+        try:
+            stream = await self.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            logger.error("Error requesting completion from LLM: %s", e)
+            llm_request_errors.labels(kwargs["model"], "stream").inc()
+            raise ValueError("Error requesting completion from LLM") from e
+
+        parser = DeckStreamParser()
+        fields = {}
+        cards = []
+        streamed_chars = 0
+        reported_usage = None
+        try:
+            async for chunk in stream:
+                # Groq reports the usage with the last chunk
+                x_groq = getattr(chunk, "x_groq", None)
+                reported_usage = getattr(x_groq, "usage", None) or reported_usage
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if not content:
+                    continue
+
+                streamed_chars += len(content)
+                for event, payload in parser.feed(content):
+                    if event == "card":
+                        try:
+                            payload = Flashcard.model_validate(payload)
+                        except ValidationError as e:
+                            logger.error("Error validating streamed card: %s", e)
+                            raise ValueError(
+                                "Error validating card received from LLM"
+                            ) from e
+                        cards.append(payload)
+                    else:
+                        key, value = payload
+                        fields[key] = value
+                    yield event, payload
+        finally:
+            self.record_completion(
+                kwargs["model"], "stream", started, reported_usage, usage
+            )
+            if usage is not None and reported_usage is None:
+                # About four characters per token
+                usage.completion_tokens += streamed_chars // 4
+                usage.total_tokens += streamed_chars // 4
+
+        parser.close()
+        logger.info("Streamed deck JSON fully received from LLM.")
+
+        try:
+            deck = DeckModel.model_validate({**fields, "cards": cards})
+        except ValidationError as e:
+            logger.error("Streamed deck is incomplete, not caching it: %s", e)
+        else:
+            await self.cache_deck_async(topic, deck)
+
+
+@lru_cache
+def get_async_llm_service() -> AsyncLLMService:
+    """
+    Dependency returning the shared AsyncLLMService.
+    A single instance is reused so the underlying HTTP connection pool is shared across requests.
+
+    Returns:
+        AsyncLLMService: The shared async LLM service.
+    """
+    return AsyncLLMService()
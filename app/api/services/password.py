@@ -0,0 +1,117 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.utils import password_utils
+from app.utils.logger import logger
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a pool of worker processes.
+    A hash costs a few hundred milliseconds of CPU. Running it in processes keeps
+    logins from holding the GIL and the threadpool that every sync route shares.
+    Attributes:
+        workers (int): The number of worker processes, 0 to hash in the threadpool instead.
+        max_pending (int): The number of hashes running or queued before new ones are refused.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.PASSWORD_HASH_WORKERS,
+        max_pending: int = settings.PASSWORD_HASH_MAX_PENDING,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self.pending = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        if self.workers > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            logger.info("Started %s password hashing workers", self.workers)
+
+    def stop(self) -> None:
+        """Stop the worker processes, waiting for the running hashes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info("Stopped password hashing workers")
+
+    async def _run(self, function: Callable, *args):
+        # Refuse work beyond the bound instead of letting a burst queue up unboundedly
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            logger.warning("Password hashing queue full (%s pending)", self.pending)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        try:
+            if self._executor is None:
+                result = await run_in_threadpool(function, *args)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._executor, function, *args)
+        finally:
+            self.pending -= 1
+
+        self.completed += 1
+        return result
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the current policy.
+
+        Args:
+            password (str): The plain password.
+
+        Returns:
+            str: The hash to store.
+        """
+        return await self._run(password_utils.hash_password, password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """Verify a password against its stored hash.
+
+        Args:
+            password (str): The plain password.
+            hashed_password (str): The stored hash.
+
+        Returns:
+            Tuple[bool, Optional[str]]: Whether the password matches, and a new hash
+            to store if the stored one was made with an outdated policy.
+        """
+        valid, new_hash = await self._run(
+            password_utils.verify_and_update, password, hashed_password
+        )
+        if new_hash is not None:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self) -> dict:
+        """Return the queue depth and the completed, rejected and rehashed counters."""
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,189 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.api.models.revoked_token import RevokedToken
+from app.api.repositories.revoked_token import RevokedTokenRepository
+from app.core import response_messages
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.utils import jwt_helpers
+from app.utils.logger import logger
+from app.utils.revocation import RevocationIndex, revocation_index
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; every timestamp here is written in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class TokenService:
+    """
+    Token service class for issuing, rotating and revoking JWTs.
+    Refresh tokens are single use: a refresh revokes the token it was given and
+    issues a new pair.
+    """
+
+    def __init__(self, db: Session, index: RevocationIndex = revocation_index):
+        self.repository = RevokedTokenRepository(db)
+        self.index = index
+
+    def issue_tokens(self, user_id: str) -> Tuple[str, str]:
+        """Issue an access and a refresh token.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            Tuple[str, str]: The access token and the refresh token.
+        """
+        return (
+            jwt_helpers.create_jwt_token("access", user_id),
+            jwt_helpers.create_jwt_token("refresh", user_id),
+        )
+
+    def revoke(self, token: str, claims: dict) -> bool:
+        """Revoke a verified token.
+
+        The revocation table has one row per token, so a token can only be
+        revoked once, by any worker.
+
+        Args:
+            token (str): The token.
+            claims (dict): Its verified claims.
+
+        Returns:
+            bool: True if the token was revoked now, False if it already was.
+        """
+        jti = jwt_helpers.token_id(token, claims)
+        expires_at = datetime.fromtimestamp(claims["exp"], tz=timezone.utc)
+        try:
+            self.repository.create(RevokedToken(jti=jti, expires_at=expires_at))
+        except IntegrityError:
+            self.repository.db.rollback()
+            return False
+
+        self.index.add(jti, claims["exp"])
+        return True
+
+    def rotate_refresh_token(self, refresh_token: str) -> Tuple[str, str]:
+        """Exchange a refresh token for a new access and refresh token.
+
+        Args:
+            refresh_token (str): The refresh token.
+
+        Returns:
+            Tuple[str, str]: The new access token and refresh token.
+        """
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=response_messages.EXPIRED_REFRESH_TOKEN,
+        )
+        claims = jwt_helpers.verify_jwt_claims(
+            refresh_token, credentials_exception, token_type="refresh"
+        )
+
+        # A concurrent refresh with the same token revokes it first
+        if not self.revoke(refresh_token, claims):
+            logger.warning("Reuse of a rotated refresh token of user: %s", claims["user_id"])
+            raise credentials_exception
+
+        return self.issue_tokens(claims["user_id"])
+
+    def load_index(self) -> datetime:
+        """Replace the revocation index with the unexpired tokens of the revocation table,
+        deleting the expired ones.
+
+        Returns:
+            datetime: The latest revocation time loaded.
+        """
+        now = _utcnow()
+        deleted = self.repository.delete_expired(now)
+        if deleted:
+            logger.info("Deleted %s expired revoked tokens", deleted)
+
+        rows = self.repository.get_unexpired(now)
+        self.index.replace(
+            {jti: _as_utc(expires_at).timestamp() for jti, expires_at, _ in rows}
+        )
+        return max((_as_utc(created_at) for *_, created_at in rows), default=now)
+
+    def sync_index(self, since: datetime) -> Optional[datetime]:
+        """Add the tokens revoked since a given time, by any worker, to the revocation index.
+
+        Args:
+            since (datetime): The revocation time to sync from.
+
+        Returns:
+            Optional[datetime]: The latest revocation time added, None if there was none.
+        """
+        rows = self.repository.get_unexpired(_utcnow(), since=since)
+        for jti, expires_at, _ in rows:
+            self.index.add(jti, _as_utc(expires_at).timestamp())
+        self.index.prune()
+        return max((_as_utc(created_at) for *_, created_at in rows), default=None)
+
+
+class RevocationSync:
+    """
+    Loads the revocation index at startup and adds the tokens revoked by other
+    workers as they show up in the revocation table.
+    Attributes:
+        interval (float): Seconds between syncs.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.REVOCATION_SYNC_INTERVAL,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.interval = interval
+        self.session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self._synced_until: Optional[datetime] = None
+        self.syncs = 0
+
+    async def start(self) -> None:
+        """Load the revocation index and start syncing it."""
+        self._synced_until = await run_in_threadpool(self._call, "load_index")
+        self._task = asyncio.create_task(self._sync(), name="revocation-sync")
+        logger.info("Loaded %s revoked tokens", revocation_index.stats()["revoked"])
+
+    async def stop(self) -> None:
+        """Stop syncing."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _call(self, method: str, *args):
+        with self.session_factory() as db:
+            return getattr(TokenService(db), method)(*args)
+
+    async def _sync(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            # Overlaps the previous sync, for revocations committed out of order
+            since = self._synced_until - timedelta(seconds=self.interval)
+            try:
+                latest = await run_in_threadpool(self._call, "sync_index", since)
+            except Exception as e:
+                logger.error("Error syncing revoked tokens: %s", e)
+                continue
+
+            self.syncs += 1
+            if latest is not None and latest > self._synced_until:
+                self._synced_until = latest
+
+
+# Started in the application lifespan
+revocation_sync = RevocationSync()
@@ -0,0 +1,452 @@
+import asyncio
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from app.api.repositories.llm_usage import LLMUsageRepository
+from app.api.services.llm import TokenUsage
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.utils.limiter import llm_limiter
+from app.utils.logger import logger
+from app.utils.metrics import rate_limit_rejections
+
+T = TypeVar("T")
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _period_starts(now: datetime) -> Tuple[datetime, datetime]:
+    """Return the start of the UTC day and month of a time."""
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day_start, day_start.replace(day=1)
+
+
+def _next_month_start(month_start: datetime) -> datetime:
+    return (month_start + timedelta(days=32)).replace(day=1)
+
+
+class _UserCounter:
+    """The tokens a user consumed in the current day and month."""
+
+    __slots__ = ("day_start", "day_tokens", "month_tokens", "last_used")
+
+    def __init__(self, day_start: datetime, day_tokens: int, month_tokens: int):
+        self.day_start = day_start
+        self.day_tokens = day_tokens
+        self.month_tokens = month_tokens
+        self.last_used = time.monotonic()
+
+
+class UsageLedger:
+    """
+    Ledger of the LLM tokens consumed by each user, and enforcement of their budgets.
+
+    Usage records are buffered in memory and inserted in batches by a background
+    task, so recording one costs the request path nothing but an append. Budgets
+    are checked against in-memory counters of the tokens each active user
+    consumed today and this month, loaded from the ledger on first use and
+    reconciled with it periodically to pick up the usage recorded by other workers.
+    Attributes:
+        flush_interval (float): Seconds between flushes of the buffered records.
+        batch_size (int): Buffered records that trigger a flush before the interval ends.
+        reconcile_interval (float): Seconds between reconciliations of the counters.
+        daily_budget (int): Tokens a user may consume per UTC day, 0 for no limit.
+        monthly_budget (int): Tokens a user may consume per UTC month, 0 for no limit.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = settings.USAGE_FLUSH_INTERVAL,
+        batch_size: int = settings.USAGE_FLUSH_BATCH_SIZE,
+        reconcile_interval: float = settings.USAGE_RECONCILE_INTERVAL,
+        daily_budget: int = settings.LLM_DAILY_TOKEN_BUDGET,
+        monthly_budget: int = settings.LLM_MONTHLY_TOKEN_BUDGET,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.reconcile_interval = reconcile_interval
+        self.daily_budget = daily_budget
+        self.monthly_budget = monthly_budget
+        self.session_factory = session_factory
+        # Records kept while the database is unavailable, beyond which the oldest are dropped
+        self.max_pending = batch_size * 100
+
+        self._pending: List[dict] = []
+        self._counters: Dict[str, _UserCounter] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.recorded = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    async def start(self) -> None:
+        """Start flushing the buffered records."""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="usage-ledger")
+
+    async def stop(self) -> None:
+        """Stop the background task and flush the remaining records."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await run_in_threadpool(self.flush)
+        except Exception as e:
+            logger.error("Error flushing LLM usage records: %s", e)
+
+    def record(self, user_id: str, topic: str, usage: TokenUsage) -> None:
+        """Buffer the usage of a generation and add it to the user's counters.
+
+        Args:
+            user_id (str): The user the generation was for.
+            topic (str): The topic of the generation.
+            usage (TokenUsage): The tokens it consumed; nothing is recorded if it requested no completion.
+        """
+        if not usage.completions:
+            return
+
+        now = _utcnow()
+        row = {
+            "user_id": user_id,
+            "topic": topic,
+            "model": usage.model,
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+            "latency_ms": usage.latency * 1000,
+            "created_at": now,
+        }
+        with self._lock:
+            self._pending.append(row)
+            pending = len(self._pending)
+            counter = self._counters.get(user_id)
+            if counter is not None and counter.day_start == _period_starts(now)[0]:
+                counter.day_tokens += usage.total_tokens
+                counter.month_tokens += usage.total_tokens
+        self.recorded += 1
+
+        if pending >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def check_budget(self, user_id: str) -> None:
+        """Reject a generation if the user spent their daily or monthly budget.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Raises:
+            HTTPException: 429 with a Retry-After header until the budget resets.
+        """
+        if not self.daily_budget and not self.monthly_budget:
+            return
+
+        now = _utcnow()
+        day_start, month_start = _period_starts(now)
+        with self._lock:
+            counter = self._counters.get(user_id)
+        if counter is None or counter.day_start != day_start:
+            counter = await run_in_threadpool(self._load_counter, user_id, now)
+        counter.last_used = time.monotonic()
+
+        if self.daily_budget and counter.day_tokens >= self.daily_budget:
+            self._reject("Daily", day_start + timedelta(days=1) - now)
+        if self.monthly_budget and counter.month_tokens >= self.monthly_budget:
+            self._reject("Monthly", _next_month_start(month_start) - now)
+
+    def _reject(self, period: str, resets_in: timedelta) -> None:
+        self.rejected += 1
+        rate_limit_rejections.labels(f"llm_{period.lower()}_budget").inc()
+        retry_after = math.ceil(resets_in.total_seconds())
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"{period} LLM token budget exhausted, retry in {retry_after} seconds",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    def pending_usage(self, user_id: str, since: datetime) -> dict:
+        """Sum the records of a user that are not flushed yet.
+
+        Args:
+            user_id (str): The ID of the user.
+            since (datetime): The start of the period.
+
+        Returns:
+            dict: The number of requests and the prompt, completion and total tokens.
+        """
+        totals = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        with self._lock:
+            for row in self._pending:
+                if row["user_id"] == user_id and row["created_at"] >= since:
+                    totals["requests"] += 1
+                    for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                        totals[key] += row[key]
+        return totals
+
+    def flush(self) -> int:
+        """Insert the buffered records.
+
+        Returns:
+            int: The number of records inserted.
+
+        Raises:
+            Exception: If the insert fails; the records are kept for the next flush.
+        """
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+
+        try:
+            with self.session_factory() as db:
+                repository = LLMUsageRepository(db)
+                for start in range(0, len(batch), self.batch_size):
+                    repository.insert_many(batch[start : start + self.batch_size])
+        except Exception:
+            with self._lock:
+                self._pending = batch + self._pending
+                overflow = len(self._pending) - self.max_pending
+                if overflow > 0:
+                    del self._pending[:overflow]
+                    self.dropped += overflow
+            raise
+
+        self.flushed += len(batch)
+        return len(batch)
+
+    def _pending_tokens(self, since: datetime) -> Dict[str, int]:
+        # Called with the lock held
+        tokens: Dict[str, int] = {}
+        for row in self._pending:
+            if row["created_at"] >= since:
+                tokens[row["user_id"]] = tokens.get(row["user_id"], 0) + row["total_tokens"]
+        return tokens
+
+    def _load_counter(self, user_id: str, now: datetime) -> _UserCounter:
+        day_start, month_start = _period_starts(now)
+        with self.session_factory() as db:
+            repository = LLMUsageRepository(db)
+            day = repository.get_total_tokens([user_id], day_start)
+            month = repository.get_total_tokens([user_id], month_start)
+
+        with self._lock:
+            counter = _UserCounter(
+                day_start,
+                day.get(user_id, 0) + self._pending_tokens(day_start).get(user_id, 0),
+                month.get(user_id, 0) + self._pending_tokens(month_start).get(user_id, 0),
+            )
+            self._counters[user_id] = counter
+        return counter
+
+    def reconcile(self) -> None:
+        """Replace the counters of the active users with the totals of the ledger,
+        which include the usage recorded by other workers, and drop the idle ones."""
+        now = _utcnow()
+        day_start, month_start = _period_starts(now)
+        idle_since = time.monotonic() - self.reconcile_interval
+        with self._lock:
+            for user_id in [
+                user_id
+                for user_id, counter in self._counters.items()
+                if counter.last_used < idle_since
+            ]:
+                del self._counters[user_id]
+            user_ids = list(self._counters)
+        if not user_ids:
+            return
+
+        with self.session_factory() as db:
+            repository = LLMUsageRepository(db)
+            day = repository.get_total_tokens(user_ids, day_start)
+            month = repository.get_total_tokens(user_ids, month_start)
+
+        with self._lock:
+            pending_day = self._pending_tokens(day_start)
+            pending_month = self._pending_tokens(month_start)
+            for user_id in user_ids:
+                counter = self._counters.get(user_id)
+                if counter is None:
+                    continue
+                counter.day_start = day_start
+                counter.day_tokens = day.get(user_id, 0) + pending_day.get(user_id, 0)
+                counter.month_tokens = month.get(user_id, 0) + pending_month.get(user_id, 0)
+
+    async def _run(self) -> None:
+        last_reconcile = time.monotonic()
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception as e:
+                logger.error("Error flushing LLM usage records: %s", e)
+                continue
+
+            if time.monotonic() - last_reconcile >= self.reconcile_interval:
+                last_reconcile = time.monotonic()
+                try:
+                    await run_in_threadpool(self.reconcile)
+                except Exception as e:
+                    logger.error("Error reconciling LLM usage counters: %s", e)
+
+    def stats(self) -> dict:
+        """Return the number of records recorded, flushed, pending and dropped."""
+        with self._lock:
+            pending = len(self._pending)
+            active_users = len(self._counters)
+        return {
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "pending": pending,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "active_users": active_users,
+        }
+
+
+# Started in the application lifespan
+usage_ledger = UsageLedger()
+
+
+async def reserve_llm_tokens(user_id: str) -> None:
+    """
+    Reserve the request cost of a generation in the user's rate limit bucket.
+
+    Called from the route body, after the request count limits passed, so
+    requests they reject do not drain the bucket. Every reservation is settled
+    by charge_llm_usage once the generation ends.
+
+    Args:
+        user_id (str): The user the generation is for.
+
+    Raises:
+        HTTPException: 429 with a Retry-After header if the bucket does not hold the cost
+    """
+    # The bucket store may be a file or a Redis server
+    await run_in_threadpool(llm_limiter.acquire, f"user:{user_id}")
+
+
+async def charge_llm_usage(
+    user_id: str, topic: str, usage: TokenUsage, settle_reservation: bool = True
+) -> None:
+    """
+    Charge the LLM tokens a generation consumed to the user's rate limit bucket
+    and record them in the usage ledger.
+
+    The request cost reserved when the generation was admitted is deducted from
+    the charge, so a generation that consumed fewer tokens, such as a cache hit,
+    gets the difference back.
+
+    Args:
+        user_id (str): The user the generation was for.
+        topic (str): The topic of the generation.
+        usage (TokenUsage): The tokens it consumed.
+        settle_reservation (bool): Whether this is the last charge of the request that
+            reserved the cost. Attempts of a job that will be retried leave it to the last one.
+    """
+    usage_ledger.record(user_id, topic, usage)
+    reserved = llm_limiter.request_cost if settle_reservation else 0
+    if usage.total_tokens == reserved:
+        return
+
+    # The bucket store may be a file or a Redis server
+    balance = await run_in_threadpool(
+        llm_limiter.charge, f"user:{user_id}", usage.total_tokens, reserved
+    )
+    logger.info(
+        "Charged %s LLM tokens to user %s against %s reserved, %.0f left in the bucket",
+        usage.total_tokens,
+        user_id,
+        reserved,
+        balance,
+    )
+
+
+async def generate_charged(
+    user_id: str, topic: str, generate: Callable[[TokenUsage], Awaitable[T]]
+) -> T:
+    """
+    Run a generation and charge the tokens it consumed, even if the caller is cancelled.
+
+    A generation coalesced with concurrent requests keeps running for them when its
+    leader disconnects, so the charge runs in the same shielded task, once the
+    tokens are known, instead of in the cancelled caller.
+
+    Args:
+        user_id (str): The user the generation is for.
+        topic (str): The topic of the generation.
+        generate (Callable[[TokenUsage], Awaitable[T]]): Runs the generation, collecting
+            the tokens it consumes in the given usage.
+
+    Returns:
+        T: The result of the generation.
+    """
+
+    async def run() -> T:
+        usage = TokenUsage()
+        try:
+            return await generate(usage)
+        finally:
+            await charge_llm_usage(user_id, topic, usage)
+
+    return await asyncio.shield(asyncio.ensure_future(run()))
+
+
+class UsageService:
+    """
+    Usage service class for reporting the LLM usage of a user.
+    """
+
+    def __init__(self, db: Session, ledger: UsageLedger = usage_ledger):
+        """
+        Initialize the UsageService with a database session.
+
+        Args:
+            db (Session): Database session
+            ledger (UsageLedger): The ledger holding the records not flushed yet
+        """
+        self.repository = LLMUsageRepository(db)
+        self.ledger = ledger
+
+    def get_usage(self, user_id: str) -> dict:
+        """
+        Get the LLM usage of a user in the current UTC day and month.
+
+        Args:
+            user_id (str): The ID of the user
+
+        Returns:
+            dict: For the day and the month, the requests and tokens used, the budget and the tokens remaining
+        """
+        day_start, month_start = _period_starts(_utcnow())
+        usage = {}
+        for period, since, budget in (
+            ("day", day_start, self.ledger.daily_budget),
+            ("month", month_start, self.ledger.monthly_budget),
+        ):
+            totals = self.repository.get_user_totals(user_id, since)
+            for key, value in self.ledger.pending_usage(user_id, since).items():
+                totals[key] += value
+            usage[period] = {
+                **totals,
+                "since": since,
+                "budget": budget or None,
+                "remaining": max(budget - totals["total_tokens"], 0) if budget else None,
+            }
+        return usage
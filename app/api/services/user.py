@@ -1,13 +1,122 @@
+from typing import Optional
+
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
 from authlib.oauth2.rfc6749 import OAuth2Token
 
-from app.utils import password_utils
 from app.api.v1.auth import schemas
 from app.api.models.user import User
 from app.api.repositories.user import UserRepository
+from app.api.services.password import password_hasher
+from app.core.config import settings
+from app.db.replicas import record_user_write
+from app.utils.cache import build_cache
 from app.utils.logger import logger
 
+# Cache of authenticated users, so that resolving the user of a request needs no query
+user_cache = (
+    build_cache(
+        max_size=settings.USER_CACHE_MAX_SIZE,
+        ttl=settings.USER_CACHE_TTL,
+        shared_url=settings.CACHE_SHARED_URL,
+        name="user",
+    )
+    if settings.USER_CACHE_ENABLED
+    else None
+)
+
+
+def _user_cache_key(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def get_cached_user(user_id: str) -> Optional[User]:
+    """Get a user from the user cache.
+
+    The password hash is never cached, so it and the timestamps are loaded on
+    first access once the user is added to a session.
+
+    Args:
+        user_id (str): The ID of the user.
+
+    Returns:
+        Optional[User]: A detached user, None on a miss or when caching is disabled.
+    """
+    if user_cache is None:
+        return None
+
+    return _detached_user(user_cache.get(_user_cache_key(user_id)))
+
+
+async def get_cached_user_async(user_id: str) -> Optional[User]:
+    """Async variant of get_cached_user that keeps the shared tier off the event loop.
+
+    Args:
+        user_id (str): The ID of the user.
+
+    Returns:
+        Optional[User]: A detached user, None on a miss or when caching is disabled.
+    """
+    if user_cache is None:
+        return None
+
+    return _detached_user(await user_cache.aget(_user_cache_key(user_id)))
+
+
+def _detached_user(cached_user: Optional[dict]) -> Optional[User]:
+    if cached_user is None:
+        return None
+
+    user = User(**cached_user)
+    # Lets a session take the user as an existing row instead of inserting it
+    make_transient_to_detached(user)
+    return user
+
+
+def _cached_fields(user: User) -> dict:
+    return {"id": user.id, "username": user.username}
+
+
+def cache_user(user: User) -> None:
+    """Store a user in the user cache.
+
+    Args:
+        user (User): The user to cache.
+    """
+    if user_cache is not None:
+        user_cache.set(_user_cache_key(user.id), _cached_fields(user))
+
+
+async def cache_user_async(user: User) -> None:
+    """Async variant of cache_user that keeps the shared tier off the event loop.
+
+    Args:
+        user (User): The user to cache.
+    """
+    if user_cache is not None:
+        await user_cache.aset(_user_cache_key(user.id), _cached_fields(user))
+
+
+def invalidate_cached_user(user_id: str) -> None:
+    """Remove a user from the user cache.
+
+    Args:
+        user_id (str): The ID of the user.
+    """
+    if user_cache is not None:
+        user_cache.delete(_user_cache_key(user_id))
+
+
+# Covers users changed through the unit of work. The bulk UPDATE and DELETE
+# statements of the repository bypass these events, so UserService invalidates
+# the users it writes with them.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, user: User) -> None:
+    invalidate_cached_user(user.id)
+
 
 class UserService:
     """
@@ -18,27 +127,32 @@ class UserService:
     def __init__(self, db: Session):
         self.repository = UserRepository(db)
 
-    def register(self, schema: schemas.RegisterRequest) -> User:
+    async def register(self, schema: schemas.RegisterRequest) -> User:
         """Creates a new user
+        The password is hashed in the password hashing workers and the database
+        work runs in the threadpool.
         Args:
             schema (schemas.RegisterRequest): Registration schema
         Returns:
             User: User object for the newly created user
         """
         # check if user with email already exists
-        if self.repository.get_by_username(schema.username):
+        if await run_in_threadpool(self.repository.get_by_username, schema.username):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User with this username already exists!",
             )
 
         # Hash password
-        schema.password = password_utils.hash_password(password=schema.password)
+        schema.password = await password_hasher.hash(schema.password)
 
         user = User(**schema.model_dump())
 
-        logger.info(f"Creating user with username: {user.username}")
-        return self.repository.create(user)
+        logger.info("Creating user with username: %s", user.username)
+        user = await run_in_threadpool(self.repository.create, user)
+        record_user_write(self.repository.db, user.id)
+        cache_user(user)
+        return user
 
     def google_auth(self, token: OAuth2Token) -> User:
         """Authenticates a user using Google OAuth
@@ -61,19 +175,22 @@ class UserService:
             # Create a new user if not exists
             user = User(username=user_info["email"])
             self.repository.create(user)
+            record_user_write(self.repository.db, user.id)
 
-        logger.info(f"User authenticated with email by Google: {user.username}")
+        cache_user(user)
+        logger.info("User authenticated with email by Google: %s", user.username)
         return user
 
-    def authenticate(self, schema: schemas.LoginRequest) -> User:
+    async def authenticate(self, schema: schemas.LoginRequest) -> User:
         """Authenticates a registered user
+        A password hashed with an outdated policy is rehashed and stored.
         Args:
             schema (schemas.LoginRequest): Login Request schema
         Returns:
             User: Authenticated user
         """
         # check if user with the username exists
-        user = self.repository.get_by_username(schema.username)
+        user = await run_in_threadpool(self.repository.get_by_username, schema.username)
 
         if not user:
             raise HTTPException(
@@ -81,11 +198,45 @@ class UserService:
                 detail="Invalid username",
             )
 
-        if not password_utils.verify_password(schema.password, user.password):
+        # Users who signed up with Google have no password
+        valid, new_hash = (
+            await password_hasher.verify_and_update(schema.password, user.password)
+            if user.password
+            else (False, None)
+        )
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid password",
             )
 
-        logger.info(f"User authenticated with username: {user.username}")
+        if new_hash is not None:
+            logger.info("Rehashing password of user: %s", user.username)
+            user = await run_in_threadpool(self.update, user.id, {"password": new_hash})
+
+        cache_user(user)
+        logger.info("User authenticated with username: %s", user.username)
         return user
+
+    def update(self, user_id: str, values: dict) -> Optional[User]:
+        """Updates the given fields of a user and drops it from the user cache
+        Args:
+            user_id (str): The ID of the user
+            values (dict): The changed fields and their new values
+        Returns:
+            Optional[User]: The updated user, None if it does not exist
+        """
+        user = self.repository.update_fields(user_id, values)
+        invalidate_cached_user(user_id)
+        return user
+
+    def delete(self, user_id: str) -> bool:
+        """Deletes a user and drops it from the user cache
+        Args:
+            user_id (str): The ID of the user
+        Returns:
+            bool: True if the user was deleted, False if it does not exist
+        """
+        deleted = self.repository.delete(user_id)
+        invalidate_cached_user(user_id)
+        return deleted
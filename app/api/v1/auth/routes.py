@@ -5,13 +5,22 @@ from typing import Annotated
 from authlib.integrations.base_client import OAuthError
 from authlib.oauth2.rfc6749 import OAuth2Token
 
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db, get_request_db
 from app.utils import jwt_helpers
 from app.utils.google_oauth import oauth
+from app.core import response_messages
+from app.core.base.schema import BaseResponseModel
 from app.core.config import settings
-from app.core.dependencies.security import get_current_user
+from app.core.dependencies.security import (
+    Principal,
+    get_current_principal,
+    get_current_user_async,
+    oauth_scheme,
+)
 
 from app.api.v1.auth import schemas
+from app.api.services.token import TokenService
+from app.api.services.usage import UsageService
 from app.api.services.user import UserService
 from app.api.models.user import User
 
@@ -27,9 +36,9 @@ auth = APIRouter(prefix="/auth", tags=["Authentication"])
     description="This endpoint takes in the user creation details and returns jwt tokens along with user data",
     tags=["Authentication"],
 )
-def register(
+async def register(
     schema: schemas.RegisterRequest,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_request_db)],
 ):
     """Endpoint for a user to register their account
 
@@ -41,7 +50,7 @@ def register(
     # Create user account
     service = UserService(db=db)
 
-    user = service.register(schema=schema)
+    user = await service.register(schema=schema)
 
     # Create access and refresh tokens
     access_token = jwt_helpers.create_jwt_token("access", user.id)
@@ -66,9 +75,9 @@ def register(
     description="This endpoint retrieves the jwt tokens for a registered user",
     tags=["Authentication"],
 )
-def login(
+async def login(
     schema: schemas.LoginRequest,
-    db: Annotated[Session, Depends(get_db)],
+    db: Annotated[Session, Depends(get_request_db)],
 ):
     """Endpoint for user login
 
@@ -79,7 +88,7 @@ def login(
 
     # user = services.authenticate(db=db, schema=schema)
     service = UserService(db=db)
-    user = service.authenticate(schema=schema)
+    user = await service.authenticate(schema=schema)
 
     # Create access and refresh tokens
     access_token = jwt_helpers.create_jwt_token("access", user.id)
@@ -101,24 +110,75 @@ def login(
     response_model=schemas.TokenRefreshResponse,
     status_code=status.HTTP_200_OK,
     summary="Refresh tokens",
-    description="This endpoint uses the current refresh token to create new access and refresh tokens",
+    description="This endpoint exchanges the current refresh token for new access and refresh tokens. A refresh token can only be used once",
     tags=["Authentication"],
 )
-def refresh_token(schema: schemas.TokenRefreshRequest):
+def refresh_token(
+    schema: schemas.TokenRefreshRequest,
+    db: Annotated[Session, Depends(get_db)],
+):
     """Endpoint to refresh the access token
 
     Args:
         schema (schemas.TokenRefreshRequest): Refresh Token Schema
+        db (Annotated[Session, Depends): Database session
 
     Returns:
         _type_: Refresh Token Response
     """
-    token = jwt_helpers.refresh_access_token(refresh_token=schema.refresh_token)
+    access_token, refresh_token = TokenService(db=db).rotate_refresh_token(
+        refresh_token=schema.refresh_token
+    )
 
     return schemas.TokenRefreshResponse(
         status_code=status.HTTP_200_OK,
-        message="Access token refreshed successfully",
-        access_token=token,
+        message=response_messages.TOKEN_REFRESH_SUCCESSFUL,
+        access_token=access_token,
+        refresh_token=refresh_token,
+    )
+
+
+@auth.post(
+    path="/logout",
+    response_model=BaseResponseModel,
+    status_code=status.HTTP_200_OK,
+    summary="Logout",
+    description="This endpoint revokes the current access token and the given refresh token",
+    tags=["Authentication"],
+)
+def logout(
+    schema: schemas.TokenRefreshRequest,
+    db: Annotated[Session, Depends(get_db)],
+    access_token: Annotated[str, Depends(oauth_scheme)],
+):
+    """Endpoint to revoke the tokens of a session
+
+    Args:
+        schema (schemas.TokenRefreshRequest): Refresh Token Schema
+        db (Annotated[Session, Depends): Database session
+        access_token (Annotated[str, Depends): JWT access token
+
+    Returns:
+        BaseResponseModel: Logout response
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=response_messages.INVALID_CREDENTIALS,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    access_claims = jwt_helpers.verify_jwt_claims(access_token, credentials_exception)
+    refresh_claims = jwt_helpers.verify_jwt_claims(
+        schema.refresh_token, credentials_exception, token_type="refresh"
+    )
+    if refresh_claims["user_id"] != access_claims["user_id"]:
+        raise credentials_exception
+
+    service = TokenService(db=db)
+    service.revoke(access_token, access_claims)
+    service.revoke(schema.refresh_token, refresh_claims)
+
+    return BaseResponseModel(
+        status_code=status.HTTP_200_OK, message="User logged out successfully"
     )
 
 
@@ -149,7 +209,9 @@ async def google_login(request: Request):
     description="This endpoint handles the callback from Google after OAuth2 login",
     tags=["Authentication"],
 )
-async def google_callback(request: Request, db: Annotated[Session, Depends(get_db)]):
+async def google_callback(
+    request: Request, db: Annotated[Session, Depends(get_request_db)]
+):
     """
     Endpoint to handle Google OAuth2 callback
 
@@ -189,7 +251,7 @@ async def google_callback(request: Request, db: Annotated[Session, Depends(get_d
     description="This endpoint retrieves the details of the logged-in user",
     tags=["Authentication"],
 )
-def get_user(current_user: Annotated[User, Depends(get_current_user)]):
+async def get_user(current_user: Annotated[User, Depends(get_current_user_async)]):
     user_schema = schemas.AuthResponseData(
         id=current_user.id, username=current_user.username
     )
@@ -199,3 +261,33 @@ def get_user(current_user: Annotated[User, Depends(get_current_user)]):
         message="User Details Retrieved",
         data=user_schema,
     )
+
+
+@auth.get(
+    path="/user/usage",
+    response_model=schemas.UsageResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Get user LLM usage",
+    description="This endpoint retrieves the LLM tokens used by the logged-in user today and this month, with their budgets",
+    tags=["Authentication"],
+)
+def get_user_usage(
+    db: Annotated[Session, Depends(get_read_db)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+):
+    """Endpoint for the LLM token usage of the current user
+
+    Args:
+        db (Annotated[Session, Depends]): Database session
+        current_user (Annotated[Principal, Depends]): Current authenticated user
+
+    Returns:
+        UsageResponse: The usage of the current UTC day and month
+    """
+    usage = UsageService(db=db).get_usage(user_id=current_user.id)
+
+    return schemas.UsageResponse(
+        status_code=status.HTTP_200_OK,
+        message="User Usage Retrieved",
+        data=usage,
+    )
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Annotated, Optional
 
 from pydantic import BaseModel, StringConstraints
@@ -20,6 +21,7 @@ class TokenRefreshRequest(BaseModel):
 
 class TokenRefreshResponse(BaseResponseModel):
     access_token: str
+    refresh_token: str
 
 
 class AuthResponseData(BaseModel):
@@ -33,4 +35,22 @@ class AuthResponse(BaseResponseModel):
     data: AuthResponseData
 
 class UserResponse(BaseResponseModel):
-    data: AuthResponseData
\ No newline at end of file
+    data: AuthResponseData
+
+class UsagePeriod(BaseModel):
+    since: datetime
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    budget: Optional[int] = None
+    remaining: Optional[int] = None
+
+
+class UsageData(BaseModel):
+    day: UsagePeriod
+    month: UsagePeriod
+
+
+class UsageResponse(BaseResponseModel):
+    data: UsageData
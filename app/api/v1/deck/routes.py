@@ -1,62 +1,127 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Request
+import json
+import anyio
+from fastapi import APIRouter, Depends, Query, status, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Annotated
+from typing import Annotated, AsyncIterator, Optional, Union
 
-from app.db.database import get_db
-from app.core.dependencies.security import get_current_user
+from app.db.database import SessionLocal, get_async_read_db, get_db, get_request_db
+from app.core.dependencies.security import (
+    Principal,
+    get_current_principal,
+    get_current_principal_async,
+)
+from app.core.dependencies.rate_limit import llm_rate_limit
 
 from app.api.v1.deck.schemas import (
     # DeckModel,
     CreateDeckRequest,
     CreateDeckResponse,
+    GenerationJobResponse,
     GetDeckResponse,
+    GetListCardResponse,
     GetListDeckResponse,
     UpdateDeckRequest,
     UpdateDeckResponse,
 )
 
 # from app.api.models.deck import Deck
-from app.api.models.user import User
 
-from app.api.services.deck import DeckService
-from app.api.services.llm import LLMService
+from app.api.services.deck import AsyncDeckService, DeckService
+from app.api.services.generation_job import (
+    GenerationJobService,
+    generation_worker_pool,
+)
+from app.api.services.llm import AsyncLLMService, TokenUsage, get_async_llm_service
+from app.api.services.usage import (
+    charge_llm_usage,
+    generate_charged,
+    reserve_llm_tokens,
+)
 
 from app.utils.limiter import limiter
+from app.utils.logger import logger
 
 deck_router = APIRouter(prefix="/decks", tags=["Deck"])
 
+PageLimit = Annotated[int, Query(ge=1, le=100, description="Maximum number of items per page")]
+PageCursor = Annotated[
+    Optional[str], Query(description="The `next_cursor` of the previous page")
+]
+
 
 @deck_router.post(
     path="/generate",
     status_code=status.HTTP_201_CREATED,
-    response_model=CreateDeckResponse,
+    response_model=Union[CreateDeckResponse, GenerationJobResponse],
     summary="Generate a new deck",
-    description="This endpoint generates a new deck based on the provided topic and returns the generated deck",
+    description="This endpoint generates a new deck based on the provided topic and returns the generated deck. With `background=true` the generation is queued instead and a job is returned with status 202",
     tags=["Deck"],
+    responses={status.HTTP_202_ACCEPTED: {"model": GenerationJobResponse}},
+    dependencies=[Depends(llm_rate_limit)],
 )
 @limiter.limit("2/minute")
-def generate_deck(
+async def generate_deck(
     schema: CreateDeckRequest,
-    db: Annotated[Session, Depends(get_db)],
-    current_user: Annotated[User, Depends(get_current_user)],
+    db: Annotated[Session, Depends(get_request_db)],
+    current_user: Annotated[Principal, Depends(get_current_principal_async)],
+    llm_service: Annotated[AsyncLLMService, Depends(get_async_llm_service)],
     request: Request,
-) -> CreateDeckResponse:
+    background: bool = False,
+) -> Response:
     """Endpoint for generating a new deck based on a topic
 
+    The LLM completion is awaited on the event loop, so a pending generation
+    does not hold a threadpool worker. Only the database writes are offloaded.
+    The request cost is reserved in the user's token bucket once the request count
+    limit passed, and the tokens the generation consumes are charged against it
+    and recorded in the usage ledger.
+
     Args:
         schema (CreateDeckRequest): Request schema containing the topic
         db (Annotated[Session, Depends]): Database session
-        current_user (Annotated[User, Depends]): Current authenticated user
+        current_user (Annotated[Principal, Depends]): Current authenticated user
+        llm_service (Annotated[AsyncLLMService, Depends]): Shared async LLM service
+        background (bool): Queue the generation and return a job instead of the deck
 
     Returns:
-        CreateDeckResponse: Response schema containing the generated deck
+        Response: CreateDeckResponse JSON of the generated deck, or
+        GenerationJobResponse JSON of the queued job
     """
-    
-    # Generate deck using LLM
 
-    llm_service = LLMService()
+    # So the user reads the new deck or job from the primary, despite replication lag
+    db.info["user_id"] = current_user.id
+    await reserve_llm_tokens(current_user.id)
+
+    if background:
+        job_service = GenerationJobService(db=db)
+        try:
+            job = await run_in_threadpool(
+                job_service.enqueue, topic=schema.topic, user_id=current_user.id
+            )
+        except Exception:
+            # The worker settles the reservation of a queued job; this one never ran
+            await charge_llm_usage(current_user.id, schema.topic, TokenUsage())
+            raise
+        generation_worker_pool.notify()
+
+        return GenerationJobResponse.json_response(
+            status_code=status.HTTP_202_ACCEPTED,
+            message="Deck generation queued",
+            data=job,
+        )
+
+    # Generate deck using LLM
     try:
-        generated_deck = llm_service.generate_deck_from_topic(topic=schema.topic)
+        generated_deck = await generate_charged(
+            current_user.id,
+            schema.topic,
+            lambda usage: llm_service.generate_deck_from_topic(
+                topic=schema.topic, usage=usage
+            ),
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -65,12 +130,181 @@ def generate_deck(
 
     # Save deck to database
     deck_service = DeckService(db=db)
-    deck = deck_service.save_deck(deck_model=generated_deck, user_id=current_user.id)
+    deck = await run_in_threadpool(
+        deck_service.save_deck, deck_model=generated_deck, user_id=current_user.id
+    )
 
-    return CreateDeckResponse(
+    # Serialized in the threadpool, where the cards of the deck can be loaded
+    return await run_in_threadpool(
+        CreateDeckResponse.json_response,
         status_code=status.HTTP_201_CREATED,
         message="Deck generated successfully",
-        data=deck.to_dict(),
+        data=deck,
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream_deck_events(
+    topic: str, user_id: str, llm_service: AsyncLLMService
+) -> AsyncIterator[str]:
+    """Generate a deck, persisting and emitting every card as soon as it is parsed
+
+    The request-scoped session is closed before a streamed body is sent, so the
+    stream works with its own session for the lifetime of the generation, and
+    charges the tokens it consumed once it ends.
+    """
+    fields = {}
+    deck = None
+    usage = TokenUsage()
+
+    with SessionLocal(info={"user_id": user_id}) as db:
+        deck_service = DeckService(db=db)
+
+        def create_deck() -> dict:
+            new_deck = deck_service.create_deck(
+                name=fields.get("name", topic),
+                description=fields.get("description", ""),
+                user_id=user_id,
+            )
+            return {
+                "id": new_deck.id,
+                "name": new_deck.name,
+                "description": new_deck.description,
+            }
+
+        def add_card(card) -> dict:
+            return deck_service.add_card(deck_id=deck["id"], card=card).to_dict()
+
+        def finalize_deck() -> dict:
+            name = fields.get("name", deck["name"])
+            description = fields.get("description", deck["description"])
+            if (name, description) == (deck["name"], deck["description"]):
+                return deck
+
+            # Fields that arrived after the first card replace the placeholders
+            deck_service.update_deck(
+                deck_id=deck["id"],
+                schema=UpdateDeckRequest(name=name, description=description),
+                user_id=user_id,
+            )
+            return {"id": deck["id"], "name": name, "description": description}
+
+        try:
+            async for event, payload in llm_service.stream_deck_from_topic(
+                topic=topic, usage=usage
+            ):
+                if event == "field":
+                    key, value = payload
+                    fields[key] = value
+                    continue
+
+                # The deck row is created once the first card is ready
+                if deck is None:
+                    deck = await run_in_threadpool(create_deck)
+
+                yield _sse("card", await run_in_threadpool(add_card, payload))
+
+            if deck is None:
+                deck = await run_in_threadpool(create_deck)
+            else:
+                deck = await run_in_threadpool(finalize_deck)
+
+            yield _sse("deck", deck)
+
+        except Exception as e:
+            logger.error("Error streaming deck generation: %s", e)
+            yield _sse(
+                "error",
+                {
+                    "message": f"Error generating deck: {str(e)}",
+                    "deck_id": deck["id"] if deck else None,
+                },
+            )
+
+        finally:
+            # A client disconnect cancels the stream; the tokens were consumed regardless
+            with anyio.CancelScope(shield=True):
+                await charge_llm_usage(user_id, topic, usage)
+
+
+@deck_router.post(
+    path="/generate/stream",
+    status_code=status.HTTP_200_OK,
+    summary="Generate a new deck as a stream",
+    description="This endpoint generates a new deck based on the provided topic and streams every card as a Server-Sent Event as soon as it is generated",
+    tags=["Deck"],
+    response_class=StreamingResponse,
+    dependencies=[Depends(llm_rate_limit)],
+)
+@limiter.limit("2/minute")
+async def generate_deck_stream(
+    schema: CreateDeckRequest,
+    current_user: Annotated[Principal, Depends(get_current_principal_async)],
+    llm_service: Annotated[AsyncLLMService, Depends(get_async_llm_service)],
+    request: Request,
+) -> StreamingResponse:
+    """Endpoint for generating a new deck as a stream of Server-Sent Events
+
+    Emits a `card` event for every saved flashcard, then a final `deck` event
+    carrying the saved deck id, or an `error` event if generation fails. The
+    request cost is reserved before the stream starts and settled when it ends.
+
+    Args:
+        schema (CreateDeckRequest): Request schema containing the topic
+        current_user (Annotated[Principal, Depends]): Current authenticated user
+        llm_service (Annotated[AsyncLLMService, Depends]): Shared async LLM service
+
+    Returns:
+        StreamingResponse: Event stream of the generated cards
+    """
+    await reserve_llm_tokens(current_user.id)
+
+    return StreamingResponse(
+        _stream_deck_events(
+            topic=schema.topic,
+            user_id=current_user.id,
+            llm_service=llm_service,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@deck_router.get(
+    path="/jobs/{job_id}",
+    status_code=status.HTTP_200_OK,
+    response_model=GenerationJobResponse,
+    summary="Get generation job by ID",
+    description="This endpoint retrieves the status of a queued deck generation job, including the deck ID once it succeeds",
+    tags=["Deck"],
+)
+def get_generation_job(
+    job_id: str,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+) -> Response:
+    """
+    Endpoint for retrieving a generation job by its ID
+
+    Args:
+        job_id (str): ID of the job to retrieve
+        db (Annotated[Session, Depends]): Database session
+        current_user (Annotated[Principal, Depends]): Current authenticated user
+
+    Returns:
+        Response: GenerationJobResponse JSON of the job
+    """
+    job_service = GenerationJobService(db=db)
+    job = job_service.get_job(job_id=job_id, user_id=current_user.id)
+
+    return GenerationJobResponse.json_response(
+        status_code=status.HTTP_200_OK,
+        message="Job retrieved successfully",
+        data=job,
     )
 
 
@@ -79,30 +313,37 @@ def generate_deck(
     status_code=status.HTTP_200_OK,
     response_model=GetListDeckResponse,
     summary="Get list of decks",
-    description="This endpoint retrieves a list of all decks",
+    description="This endpoint retrieves a page of decks, newest first. Pass the returned `next_cursor` as `cursor` to fetch the next page",
     tags=["Deck"],
 )
-def get_list_deck(
-    db: Annotated[Session, Depends(get_db)],
-    current_user: Annotated[User, Depends(get_current_user)],
-):
+async def get_list_deck(
+    db: Annotated[AsyncSession, Depends(get_async_read_db)],
+    current_user: Annotated[Principal, Depends(get_current_principal_async)],
+    limit: PageLimit = 20,
+    cursor: PageCursor = None,
+) -> Response:
     """
-    Endpoint for retrieving a list of all decks
+    Endpoint for retrieving a page of decks
     Args:
-        db (Annotated[Session, Depends]): Database session
-        current_user (Annotated[User, Depends]): Current authenticated user
+        db (Annotated[AsyncSession, Depends]): Read-only async database session
+        current_user (Annotated[Principal, Depends]): Current authenticated user
+        limit (int): Maximum number of decks to return
+        cursor (Optional[str]): Cursor of the page to return
 
     Returns:
-        GetListDeckResponse: Response schema containing the list of decks
+        Response: GetListDeckResponse JSON of the page of decks
     """
 
-    deck_service = DeckService(db=db)
-    decks = deck_service.get_user_decks(user_id=current_user.id)
+    deck_service = AsyncDeckService(db=db)
+    decks, next_cursor = await deck_service.get_user_decks(
+        user_id=current_user.id, limit=limit, cursor=cursor
+    )
 
-    return GetListDeckResponse(
+    return GetListDeckResponse.json_response(
         status_code=status.HTTP_200_OK,
         message="Decks retrieved successfully",
-        data=[deck.to_dict() for deck in decks],
+        data=decks,
+        next_cursor=next_cursor,
     )
 
 
@@ -114,29 +355,70 @@ def get_list_deck(
     description="This endpoint retrieves a deck by its ID",
     tags=["Deck"],
 )
-def get_deck(
+async def get_deck(
     deck_id: str,
-    db: Annotated[Session, Depends(get_db)],
-    current_user: Annotated[User, Depends(get_current_user)],
-) -> GetDeckResponse:
+    db: Annotated[AsyncSession, Depends(get_async_read_db)],
+    current_user: Annotated[Principal, Depends(get_current_principal_async)],
+) -> Response:
     """
     Endpoint for retrieving a deck by its ID
 
     Args:
         deck_id (str): ID of the deck to retrieve
-        db (Annotated[Session, Depends]): Database session
-        current_user (Annotated[User, Depends]): Current authenticated user
+        db (Annotated[AsyncSession, Depends]): Read-only async database session
+        current_user (Annotated[Principal, Depends]): Current authenticated user
 
     Returns:
-        GetDeckResponse: Response schema containing the retrieved deck
+        Response: GetDeckResponse JSON of the retrieved deck
     """
-    deck_service = DeckService(db=db)
-    deck = deck_service.get_deck(deck_id=deck_id, user_id=current_user.id)
+    deck_service = AsyncDeckService(db=db)
+    deck = await deck_service.get_deck(deck_id=deck_id, user_id=current_user.id)
 
-    return GetDeckResponse(
+    return GetDeckResponse.json_response(
         status_code=status.HTTP_200_OK,
         message="Deck retrieved successfully",
-        data=deck.to_dict(),
+        data=deck,
+    )
+
+
+@deck_router.get(
+    path="/{deck_id}/cards",
+    status_code=status.HTTP_200_OK,
+    response_model=GetListCardResponse,
+    summary="Get cards of a deck",
+    description="This endpoint retrieves a page of the cards of a deck in creation order. Pass the returned `next_cursor` as `cursor` to fetch the next page",
+    tags=["Deck"],
+)
+async def get_deck_cards(
+    deck_id: str,
+    db: Annotated[AsyncSession, Depends(get_async_read_db)],
+    current_user: Annotated[Principal, Depends(get_current_principal_async)],
+    limit: PageLimit = 20,
+    cursor: PageCursor = None,
+) -> Response:
+    """
+    Endpoint for retrieving a page of the cards of a deck
+
+    Args:
+        deck_id (str): ID of the deck
+        db (Annotated[AsyncSession, Depends]): Read-only async database session
+        current_user (Annotated[Principal, Depends]): Current authenticated user
+        limit (int): Maximum number of cards to return
+        cursor (Optional[str]): Cursor of the page to return
+
+    Returns:
+        Response: GetListCardResponse JSON of the page of cards
+    """
+    deck_service = AsyncDeckService(db=db)
+    cards, next_cursor = await deck_service.get_deck_cards(
+        deck_id=deck_id, user_id=current_user.id, limit=limit, cursor=cursor
+    )
+
+    return GetListCardResponse.json_response(
+        status_code=status.HTTP_200_OK,
+        message="Cards retrieved successfully",
+        data=cards,
+        next_cursor=next_cursor,
     )
 
 
@@ -152,8 +434,8 @@ def update_deck(
     deck_id: str,
     schema: UpdateDeckRequest,
     db: Annotated[Session, Depends(get_db)],
-    current_user: Annotated[User, Depends(get_current_user)],
-) -> UpdateDeckResponse:
+    current_user: Annotated[Principal, Depends(get_current_principal)],
+) -> Response:
     """
     Endpoint for updating a deck by its ID
 
@@ -161,20 +443,20 @@ def update_deck(
         deck_id (str): ID of the deck to update
         schema (UpdateDeckRequest): Request schema containing the updated deck data
         db (Annotated[Session, Depends]): Database session
-        current_user (Annotated[User, Depends]): Current authenticated user
+        current_user (Annotated[Principal, Depends]): Current authenticated user
 
     Returns:
-        UpdateDeckResponse: Response schema containing the updated deck
+        Response: UpdateDeckResponse JSON of the updated deck
     """
     deck_service = DeckService(db=db)
     deck = deck_service.update_deck(
         deck_id=deck_id, schema=schema, user_id=current_user.id
     )
 
-    return UpdateDeckResponse(
+    return UpdateDeckResponse.json_response(
         status_code=status.HTTP_200_OK,
         message="Deck updated successfully",
-        data=deck.to_dict(),
+        data=deck,
     )
 
 
@@ -188,7 +470,7 @@ def update_deck(
 def delete_deck(
     deck_id: str,
     db: Annotated[Session, Depends(get_db)],
-    current_user: Annotated[User, Depends(get_current_user)],
+    current_user: Annotated[Principal, Depends(get_current_principal)],
 ) -> None:
     """
     Endpoint for deleting a deck by its ID
@@ -196,7 +478,7 @@ def delete_deck(
     Args:
         deck_id (str): ID of the deck to delete
         db (Annotated[Session, Depends]): Database session
-        current_user (Annotated[User, Depends]): Current authenticated user
+        current_user (Annotated[Principal, Depends]): Current authenticated user
 
     Returns:
         None
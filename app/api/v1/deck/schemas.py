@@ -1,4 +1,5 @@
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -22,11 +23,29 @@ class BaseDeckModel(DeckModel):
     user_id: str
 
 
+class CardModel(Flashcard):
+    id: str
+    deck_id: str
+
+
 class ListDeckModel(BaseModel):
     name: str
     description: str
     id: str
     user_id: str
+    card_count: int
+
+
+class GenerationJobModel(BaseModel):
+    id: str
+    topic: str
+    status: str
+    attempts: int
+    deck_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 
 # Request schemas
@@ -60,3 +79,13 @@ class UpdateDeckResponse(BaseDeckResponse):
 
 class GetListDeckResponse(BaseResponseModel):
     data: List[ListDeckModel]
+    next_cursor: Optional[str] = None
+
+
+class GetListCardResponse(BaseResponseModel):
+    data: List[CardModel]
+    next_cursor: Optional[str] = None
+
+
+class GenerationJobResponse(BaseResponseModel):
+    data: GenerationJobModel
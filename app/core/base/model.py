@@ -10,7 +10,7 @@ class BaseTableModel(Base):
 
     __abstract__ = True
 
-    id = Column(String, primary_key=True, index=True, default=lambda: str(uuid7()))
+    id = Column(String, primary_key=True, default=lambda: str(uuid7()))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
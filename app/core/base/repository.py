@@ -1,4 +1,6 @@
-from typing import Generic, TypeVar, Type, Optional, List
+from typing import Any, Dict, Generic, TypeVar, Type, Optional, List
+from sqlalchemy import Delete, Update, delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.base.model import BaseTableModel
@@ -6,6 +8,22 @@ from app.core.base.model import BaseTableModel
 Model = TypeVar("T", bound=BaseTableModel)
 
 
+def _update_fields_statement(
+    model: Type[Model], id: str, values: Dict[str, Any], user_id: Optional[str]
+) -> Update:
+    statement = update(model).where(model.id == id).values(**values).returning(model)
+    if user_id is not None:
+        statement = statement.where(model.user_id == user_id)
+    return statement
+
+
+def _delete_statement(model: Type[Model], id: str, user_id: Optional[str]) -> Delete:
+    statement = delete(model).where(model.id == id)
+    if user_id is not None:
+        statement = statement.where(model.user_id == user_id)
+    return statement
+
+
 class BaseRepository(Generic[Model]):
     """
     Base repository class for CRUD operations.
@@ -22,6 +40,10 @@ class BaseRepository(Generic[Model]):
 
     def create(self, obj: Model) -> Model:
         """Create a new object of the model.
+
+        Server-generated columns come back with the `INSERT ... RETURNING`, so
+        the object is kept out of the commit's expiry instead of refreshed.
+
         Args:
             obj (Model): The object to be created.
         Returns:
@@ -29,8 +51,10 @@ class BaseRepository(Generic[Model]):
         """
 
         self.db.add(obj)
+        self.db.flush()
+        self.db.expunge(obj)
         self.db.commit()
-        self.db.refresh(obj)
+        self.db.add(obj)
         return obj
 
     def get(self, id: str) -> Optional[Model]:
@@ -76,21 +100,160 @@ class BaseRepository(Generic[Model]):
             return existing_obj
         return None
 
-    def delete(self, id: str) -> bool:
+    def update_fields(
+        self, id: str, values: Dict[str, Any], user_id: Optional[str] = None
+    ) -> Optional[Model]:
+        """Update the given fields of an object by id.
+
+        The ownership check, the update and the read-back of the row are a single
+        `UPDATE ... WHERE id = :id [AND user_id = :user_id] RETURNING ...` statement.
+
+        Args:
+            id (str): The id of the object.
+            values (Dict[str, Any]): The changed fields and their new values.
+            user_id (Optional[str]): When given, only update the object if it belongs to this user.
+
+        Returns:
+            Optional[Model]: The updated object, None if no matching object was found.
+        """
+
+        statement = _update_fields_statement(self.model, id, values, user_id)
+        obj = self.db.scalars(statement).one_or_none()
+        if obj is None:
+            self.db.rollback()
+            return None
+
+        # Keep the returned row out of the commit's expiry so reading it back
+        # does not cost another SELECT
+        self.db.expunge(obj)
+        self.db.commit()
+        self.db.add(obj)
+        return obj
+
+    def delete(self, id: str, user_id: Optional[str] = None) -> bool:
         """Delete an object of the model by id.
 
-        This method removes a record from the database based on the provided id.
+        This method removes a record with a single `DELETE ... WHERE id = :id
+        [AND user_id = :user_id]` statement, without loading it. Dependent rows are
+        removed by the database through `ON DELETE CASCADE` foreign keys.
 
         Args:
             id (str): The id of the object to delete.
+            user_id (Optional[str]): When given, only delete the object if it belongs to this user.
 
         Returns:
             bool: True if the object was successfully deleted, False if the object wasn't found.
         """
 
-        obj = self.get(id)
-        if obj:
-            self.db.delete(obj)
-            self.db.commit()
-            return True
-        return False
+        deleted = self.db.execute(_delete_statement(self.model, id, user_id)).rowcount
+        self.db.commit()
+        return deleted > 0
+
+
+class AsyncBaseRepository(Generic[Model]):
+    """
+    Async base repository class for CRUD operations.
+    This class mirrors BaseRepository on an AsyncSession so that routes can await
+    database work on the event loop instead of running in the threadpool.
+    Relationships are not lazily loaded on an AsyncSession; queries that need them
+    must load them eagerly.
+    Attributes:
+        model (Type[Model]): The SQLAlchemy model class.
+        db (AsyncSession): The SQLAlchemy async session.
+    """
+
+    def __init__(self, model: Type[Model], db: AsyncSession):
+        self.model = model
+        self.db = db
+
+    async def create(self, obj: Model) -> Model:
+        """Create a new object of the model, without refreshing it after the commit.
+        Args:
+            obj (Model): The object to be created.
+        Returns:
+            Model: The created object.
+        """
+
+        self.db.add(obj)
+        await self.db.flush()
+        self.db.expunge(obj)
+        await self.db.commit()
+        self.db.add(obj)
+        return obj
+
+    async def get(self, id: str) -> Optional[Model]:
+        """Get an object of the model by id.
+        Args:
+            id (str): The id of the object.
+        Returns:
+            Optional[Model]: The object if found, None otherwise.
+        """
+
+        return await self.db.scalar(select(self.model).where(self.model.id == id))
+
+    async def get_all(self) -> List[Model]:
+        """Get all objects of the model.
+
+        Returns:
+            List[Model]: A list containing all objects of the model in the database.
+        """
+
+        return list(await self.db.scalars(select(self.model)))
+
+    async def update(self, obj: Model) -> Model:
+        """Update an existing object of the model.
+
+        Args:
+            obj (Model): The object containing updated data.
+
+        Returns:
+            Model: The updated object if successful, None if the object wasn't found.
+        """
+
+        existing_obj = await self.get(obj.id)
+        if existing_obj:
+            for key, value in obj.__dict__.items():
+                if not key.startswith("_"):
+                    setattr(existing_obj, key, value)
+            await self.db.commit()
+            await self.db.refresh(existing_obj)
+            return existing_obj
+        return None
+
+    async def update_fields(
+        self, id: str, values: Dict[str, Any], user_id: Optional[str] = None
+    ) -> Optional[Model]:
+        """Update the given fields of an object by id with a single UPDATE ... RETURNING.
+
+        Args:
+            id (str): The id of the object.
+            values (Dict[str, Any]): The changed fields and their new values.
+            user_id (Optional[str]): When given, only update the object if it belongs to this user.
+
+        Returns:
+            Optional[Model]: The updated object, None if no matching object was found.
+        """
+
+        statement = _update_fields_statement(self.model, id, values, user_id)
+        obj = (await self.db.scalars(statement)).one_or_none()
+        if obj is None:
+            await self.db.rollback()
+            return None
+
+        await self.db.commit()
+        return obj
+
+    async def delete(self, id: str, user_id: Optional[str] = None) -> bool:
+        """Delete an object of the model by id with a single DELETE statement.
+
+        Args:
+            id (str): The id of the object to delete.
+            user_id (Optional[str]): When given, only delete the object if it belongs to this user.
+
+        Returns:
+            bool: True if the object was successfully deleted, False if the object wasn't found.
+        """
+
+        result = await self.db.execute(_delete_statement(self.model, id, user_id))
+        await self.db.commit()
+        return result.rowcount > 0
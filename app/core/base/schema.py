@@ -1,6 +1,125 @@
+from functools import cache
+from operator import attrgetter, itemgetter
+from types import UnionType
+from typing import Any, Callable, Optional, Union, get_args, get_origin
+
+import orjson
+from fastapi import Response
 from pydantic import BaseModel
 
 
+class SchemaSerializer:
+    """
+    Serializes ORM rows and dicts straight to the JSON of a schema.
+
+    The fields of the schema, and of the schemas nested in it, are resolved into
+    getters once, so serializing an object only reads the fields the schema
+    declares and encodes them with orjson. The values are not validated: they are
+    expected to come from the database columns the schema describes.
+    Attributes:
+        schema (type[BaseModel]): The schema whose fields are serialized.
+    """
+
+    def __init__(self, schema: type[BaseModel]):
+        self.schema = schema
+        self._convert = _model_converter(schema)
+
+    def to_builtins(self, obj: Any) -> dict:
+        """Get the fields of the schema from an object or a dict, as JSON compatible values.
+
+        Args:
+            obj (Any): An ORM row, or a dict with a key for every field.
+
+        Returns:
+            dict: The fields of the schema.
+        """
+        return self._convert(obj)
+
+    def to_json(self, obj: Any) -> bytes:
+        """Serialize an object or a dict to the JSON of the schema.
+
+        Args:
+            obj (Any): An ORM row, or a dict with a key for every field.
+
+        Returns:
+            bytes: The JSON document.
+        """
+        return orjson.dumps(self._convert(obj), option=orjson.OPT_UTC_Z)
+
+
+def _converter(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    # None for the values that are encoded as they are
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _model_converter(annotation)
+
+    origin = get_origin(annotation)
+    if origin is list:
+        item = _converter(get_args(annotation)[0])
+        return (lambda items: [item(value) for value in items]) if item else list
+    if origin in (Union, UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        inner = _converter(args[0]) if len(args) == 1 else None
+        return (lambda value: None if value is None else inner(value)) if inner else None
+    return None
+
+
+def _model_converter(schema: type[BaseModel]) -> Callable[[Any], dict]:
+    names = tuple(schema.model_fields)
+    converters = [
+        (index, converter)
+        for index, field in enumerate(schema.model_fields.values())
+        if (converter := _converter(field.annotation)) is not None
+    ]
+    if len(names) == 1:
+        get_attributes = lambda obj: (getattr(obj, names[0]),)  # noqa: E731
+        get_items = lambda obj: (obj[names[0]],)  # noqa: E731
+    else:
+        get_attributes, get_items = attrgetter(*names), itemgetter(*names)
+
+    def convert(obj: Any) -> dict:
+        values = get_items(obj) if isinstance(obj, dict) else get_attributes(obj)
+        if converters:
+            values = list(values)
+            for index, converter in converters:
+                values[index] = converter(values[index])
+        return dict(zip(names, values))
+
+    return convert
+
+
+@cache
+def schema_serializer(schema: type[BaseModel]) -> SchemaSerializer:
+    """Get the serializer of a schema, built on first use.
+
+    Args:
+        schema (type[BaseModel]): The schema.
+
+    Returns:
+        SchemaSerializer: The serializer shared by every caller.
+    """
+    return SchemaSerializer(schema)
+
+
 class BaseResponseModel(BaseModel):
     status_code: int
     message: str
+
+    @classmethod
+    def json_response(cls, status_code: int, message: str, **fields: Any) -> Response:
+        """Build the JSON response of the schema without instantiating it.
+
+        Routes that return it skip the validation and encoding of their
+        `response_model`, which then only documents the response.
+
+        Args:
+            status_code (int): The status code of the response, also set in its body.
+            message (str): The message of the body.
+            **fields (Any): The other fields of the schema, e.g. `data` as an ORM row.
+
+        Returns:
+            Response: The response with the JSON body.
+        """
+        body = schema_serializer(cls).to_json(
+            {"status_code": status_code, "message": message, **fields}
+        )
+        return Response(content=body, status_code=status_code, media_type="application/json")
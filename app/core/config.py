@@ -1,6 +1,8 @@
 import os
+import tempfile
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Dict
 
 
 # Use this to build paths inside the project
@@ -16,6 +18,17 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRY: int
     REFRESH_TOKEN_EXPIRY: int
     FRONTEND_URL: str
+    DEBUG: bool = False
+
+    # Requests running the same statement this many times are logged as possible N+1 queries
+    QUERY_N_PLUS_ONE_THRESHOLD: int = 5
+
+    # Logging; `json` or `text` records, written to LOG_DIR by a listener thread fed through a
+    # bounded queue, and the fraction of INFO records kept for the busiest loggers
+    LOG_FORMAT: str = "json"
+    LOG_DIR: str = "logs"
+    LOG_QUEUE_SIZE: int = 10_000
+    LOG_SAMPLE_RATES: Dict[str, float] = {"deck": 0.1, "flashcard": 0.01}
 
     # Database configurations
     DATABASE_HOST: str
@@ -24,24 +37,122 @@ class Settings(BaseSettings):
     DATABASE_PASSWORD: str
     DATABASE_NAME: str
     DATABASE_TYPE: str
+    ASYNC_DATABASE_DRIVER: str = "asyncpg"
+
+    # Connection pool configurations, per engine and per worker process
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30
+    DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_POOL_RECYCLE: int = 1800
+    DATABASE_PGBOUNCER: bool = False
+
+    # Read replica configurations; replicas share the credentials and name of the primary
+    DATABASE_REPLICA_HOSTS: str = ""  # comma-separated host[:port]
+    DATABASE_REPLICA_SELECTION: str = "round_robin"  # or least_loaded
+    DATABASE_READ_YOUR_WRITES_SECONDS: float = 5.0
 
     # Groq API configurations
     GROQ_API_KEY: str
 
+    # Cache configurations
+    CACHE_SHARED_URL: str = ""
+    DECK_CACHE_ENABLED: bool = True
+    DECK_CACHE_TTL: int = 86400
+    DECK_CACHE_MAX_SIZE: int = 1024
+    # Coalesces generations across the workers of a host; requires CACHE_SHARED_URL
+    GENERATION_LOCK_DIR: str = ""
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_TTL: int = 60
+    USER_CACHE_MAX_SIZE: int = 10_000
+    JWT_CACHE_ENABLED: bool = True
+    JWT_CACHE_MAX_SIZE: int = 10_000
+
+    # Revoked token index; other workers' revocations reach this one within the sync interval
+    REVOCATION_SYNC_INTERVAL: float = 5.0
+    REVOCATION_BLOOM_CAPACITY: int = 100_000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+
+    # Password hashing; 0 workers hashes in the threadpool instead of worker processes
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+
+    # Bearer token of /metrics and the /probe/* diagnostics, which are not found without one
+    INTERNAL_API_TOKEN: str = ""
+
+    # Routes that only need the user ID trust the access token without loading the
+    # user; a deleted user's token then keeps working on them until it expires
+    AUTH_LAZY_USER: bool = False
+
+    # Rate limiting; empty storage counts per worker, sqlite:///<path> shares the request
+    # counters and token buckets between the workers of a host and redis://... between all of them
+    RATE_LIMIT_STORAGE_URL: str = ""
+    LLM_TOKEN_BUCKET_CAPACITY: int = 20_000
+    LLM_TOKEN_REFILL_PER_MINUTE: int = 2_000
+    LLM_REQUEST_COST: int = 1_000
+
+    # LLM token budgets per user and UTC day or month, 0 for no limit, and the
+    # batching of the usage ledger behind them
+    LLM_DAILY_TOKEN_BUDGET: int = 200_000
+    LLM_MONTHLY_TOKEN_BUDGET: int = 2_000_000
+    USAGE_FLUSH_INTERVAL: float = 2.0
+    USAGE_FLUSH_BATCH_SIZE: int = 500
+    USAGE_RECONCILE_INTERVAL: float = 60.0
+
+    # Background generation job configurations
+    JOB_WORKERS: int = 2
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF: float = 5.0
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_TIMEOUT: int = 600
+
     # Google clent API configurations
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
     GOOGLE_REDIRECT_URL: str
+    GOOGLE_DISCOVERY_URL: str = "https://accounts.google.com/.well-known/openid-configuration"
+    # Discovery document and JWKS, shared by the workers through the cache file
+    GOOGLE_METADATA_TTL: int = 3600
+    GOOGLE_METADATA_CACHE_FILE: str = os.path.join(
+        tempfile.gettempdir(), "kwiki-google-openid.json"
+    )
 
     # Directories
     MEDIA_DIR: str = os.path.join(BASE_DIR, "media")
     STATIC_DIR: str = os.path.join(BASE_DIR, "static")
     TEMPLATES_DIR: str = os.path.join(BASE_DIR, "templates")
 
+    def _build_database_url(self, scheme: str, host: str, port: int) -> str:
+        return f"{scheme}://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{host}:{port}/{self.DATABASE_NAME}"
+
     @property
     def database_url(self) -> str:
         """Dynamically construct DATABASE_URL"""
-        return f"{self.DATABASE_TYPE}://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
+        return self._build_database_url(
+            self.DATABASE_TYPE, self.DATABASE_HOST, self.DATABASE_PORT
+        )
+
+    @property
+    def async_database_url(self) -> str:
+        """Dynamically construct the DATABASE_URL for the async driver"""
+        return self._build_database_url(
+            f"{self.DATABASE_TYPE}+{self.ASYNC_DATABASE_DRIVER}",
+            self.DATABASE_HOST,
+            self.DATABASE_PORT,
+        )
+
+    def replica_database_urls(self, is_async: bool = False) -> list[str]:
+        """Construct the URLs of the read replicas listed in DATABASE_REPLICA_HOSTS"""
+        scheme = self.DATABASE_TYPE
+        if is_async:
+            scheme = f"{scheme}+{self.ASYNC_DATABASE_DRIVER}"
+
+        urls = []
+        for replica in filter(None, map(str.strip, self.DATABASE_REPLICA_HOSTS.split(","))):
+            host, _, port = replica.partition(":")
+            urls.append(self._build_database_url(scheme, host, int(port or self.DATABASE_PORT)))
+        return urls
 
     class Config:
         env_file = ".env"
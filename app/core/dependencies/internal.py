@@ -0,0 +1,36 @@
+import secrets
+from typing import Annotated, Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from app.core.config import settings
+
+internal_scheme = HTTPBearer(auto_error=False)
+
+
+def verify_internal_token(
+    credentials: Annotated[
+        Optional[HTTPAuthorizationCredentials], Depends(internal_scheme)
+    ],
+) -> None:
+    """
+    Dependency restricting the metrics and diagnostics endpoints to holders of the
+    INTERNAL_API_TOKEN, such as the Prometheus scraper.
+
+    The endpoints are not found while no token is configured.
+
+    Args:
+        credentials (Optional[HTTPAuthorizationCredentials]): The bearer token of the request
+    """
+    if not settings.INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials.encode(), settings.INTERNAL_API_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid internal token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,26 @@
+from fastapi import Depends
+from typing import Annotated
+
+from app.api.services.usage import usage_ledger
+from app.core.dependencies.security import Principal, get_current_principal_async
+
+
+async def llm_rate_limit(
+    current_user: Annotated[Principal, Depends(get_current_principal_async)],
+) -> None:
+    """
+    Dependency admitting a generation request only if the current user has LLM tokens left
+    in their daily and monthly budgets.
+
+    The check takes nothing. The request cost is reserved in the user's token
+    bucket by reserve_llm_tokens in the route body, once the request count limits
+    have passed, and the tokens the generation consumes are charged with
+    charge_llm_usage once it ends.
+
+    Args:
+        current_user (Annotated[Principal, Depends]): Current authenticated user
+
+    Raises:
+        HTTPException: 429 with a Retry-After header if a budget is spent
+    """
+    await usage_ledger.check_budget(current_user.id)
@@ -1,10 +1,20 @@
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import Annotated
+from typing import Annotated, Optional
 
 from app.api.models.user import User
-from app.db.database import get_db
+from app.api.services.user import (
+    cache_user,
+    cache_user_async,
+    get_cached_user,
+    get_cached_user_async,
+)
+from app.core.config import settings
+from app.db.database import get_async_read_db, get_db
+from app.db.replicas import select_read_engine_async
 from app.utils.jwt_helpers import verify_jwt_token
 from app.core import response_messages
 
@@ -13,6 +23,101 @@ from app.core import response_messages
 oauth_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
+class Principal:
+    """
+    The authenticated user of a request, for routes that only need their ID.
+
+    With AUTH_LAZY_USER it is built from the access token alone, and the User
+    row is only loaded if the route asks for it.
+    Attributes:
+        id (str): The ID of the user.
+    """
+
+    def __init__(self, id: str, user: Optional[User] = None):
+        self.id = id
+        self._user = user
+
+    def get_user(self, db: Session) -> User:
+        """Get the User row, loading it on first use.
+
+        Args:
+            db (Session): Database session
+
+        Returns:
+            User: Logged in User object
+        """
+        if self._user is None:
+            self._user = resolve_user(db, self.id)
+        return self._user
+
+    async def get_user_async(self, db: AsyncSession) -> User:
+        """Async variant of get_user.
+
+        Args:
+            db (AsyncSession): Async database session
+
+        Returns:
+            User: Logged in User object
+        """
+        if self._user is None:
+            self._user = await resolve_user_async(db, self.id)
+        return self._user
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=response_messages.INVALID_CREDENTIALS,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def resolve_user(db: Session, user_id: str) -> User:
+    """Load the user of a verified access token, from the user cache when possible.
+
+    A cached user is added to the session as an existing row, so no query runs.
+
+    Args:
+        db (Session): Database session
+        user_id (str): The ID from the access token
+
+    Returns:
+        User: Logged in User object
+    """
+    user = get_cached_user(user_id)
+    if user is not None:
+        return db.merge(user, load=False)
+
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise _credentials_exception()
+
+    cache_user(user)
+    return user
+
+
+async def resolve_user_async(db: AsyncSession, user_id: str) -> User:
+    """Async variant of resolve_user.
+
+    Args:
+        db (AsyncSession): Async database session
+        user_id (str): The ID from the access token
+
+    Returns:
+        User: Logged in User object
+    """
+    user = await get_cached_user_async(user_id)
+    if user is not None:
+        return await db.merge(user, load=False)
+
+    user = await db.scalar(select(User).where(User.id == user_id))
+    if not user:
+        raise _credentials_exception()
+
+    await cache_user_async(user)
+    return user
+
+
 def get_current_user(
     db: Annotated[Session, Depends(get_db)],
     access_token: Annotated[str, Depends(oauth_scheme)],
@@ -29,19 +134,84 @@ def get_current_user(
         User: Logged in User object
     """
 
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail=response_messages.INVALID_CREDENTIALS,
-        headers={"WWW-Authenticate": "Bearer"},
+    user_id = verify_jwt_token(
+        token=access_token, credentials_exception=_credentials_exception()
     )
 
+    # Ties the session's writes to the user, for read-your-writes routing
+    db.info["user_id"] = user_id
+    return resolve_user(db, user_id)
+
+
+async def get_current_user_async(
+    db: Annotated[AsyncSession, Depends(get_async_read_db)],
+    access_token: Annotated[str, Depends(oauth_scheme)],
+) -> User:
+    """Async variant of get_current_user for read-only routes served on the event loop.
+    The user is loaded from a read replica when configured, unless they wrote recently.
+
+    Args:
+        db (Annotated[AsyncSession, Depends): Async database session
+        access_token (Annotated[str, Depends): JWT access token
+
+    Returns:
+        User: Logged in User object
+    """
+
     user_id = verify_jwt_token(
-        token=access_token, credentials_exception=credentials_exception
+        token=access_token, credentials_exception=_credentials_exception()
     )
 
-    user = db.query(User).filter(User.id == user_id).first()
+    # Must be set before the first query, which picks the replica
+    db.info["user_id"] = user_id
+    await select_read_engine_async(db)
+    return await resolve_user_async(db, user_id)
 
-    if not user:
-        raise credentials_exception
 
-    return user
+def get_current_principal(
+    db: Annotated[Session, Depends(get_db)],
+    access_token: Annotated[str, Depends(oauth_scheme)],
+) -> Principal:
+    """Dependency to get the current user for routes that only need their ID.
+    The user is only loaded to check they still exist, unless AUTH_LAZY_USER is set.
+
+    Args:
+        db (Annotated[Session, Depends): Database Session
+        access_token (Annotated[str, Depends): JWT access token
+
+    Returns:
+        Principal: Logged in user
+    """
+    user_id = verify_jwt_token(
+        token=access_token, credentials_exception=_credentials_exception()
+    )
+
+    db.info["user_id"] = user_id
+    if settings.AUTH_LAZY_USER:
+        return Principal(id=user_id)
+    return Principal(id=user_id, user=resolve_user(db, user_id))
+
+
+async def get_current_principal_async(
+    db: Annotated[AsyncSession, Depends(get_async_read_db)],
+    access_token: Annotated[str, Depends(oauth_scheme)],
+) -> Principal:
+    """Async variant of get_current_principal for routes served on the event loop.
+
+    Args:
+        db (Annotated[AsyncSession, Depends): Async database session
+        access_token (Annotated[str, Depends): JWT access token
+
+    Returns:
+        Principal: Logged in user
+    """
+    user_id = verify_jwt_token(
+        token=access_token, credentials_exception=_credentials_exception()
+    )
+
+    db.info["user_id"] = user_id
+    if settings.AUTH_LAZY_USER:
+        return Principal(id=user_id)
+
+    await select_read_engine_async(db)
+    return Principal(id=user_id, user=await resolve_user_async(db, user_id))
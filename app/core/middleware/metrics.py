@@ -0,0 +1,45 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.metrics import http_request_duration_seconds, http_requests_in_progress
+
+
+class MetricsMiddleware:
+    """
+    Records the in-flight requests and the latency of each request in the Prometheus metrics.
+
+    Latencies are labelled with the route template, such as `/api/v1/decks/{deck_id}`,
+    so that the number of series does not grow with the IDs in the paths; requests
+    that match no route share the `unmatched` label. A streaming response is timed
+    until its last chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = http_requests_in_progress.labels(method)
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_request_duration_seconds.labels(method, route, str(status_code)).observe(
+                time.perf_counter() - started
+            )
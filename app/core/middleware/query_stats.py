@@ -0,0 +1,62 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.query_stats import QueryStats, request_query_stats, route_query_metrics
+from app.utils.logger import logger
+
+
+class QueryStatsMiddleware:
+    """
+    Counts and times the SQL statements of each request.
+
+    The totals are aggregated per route in `route_query_metrics`, requests that repeat
+    a statement QUERY_N_PLUS_ONE_THRESHOLD times or more are logged as possible N+1
+    queries, and in DEBUG mode the count and time are returned as the
+    `X-DB-Query-Count` and `X-DB-Query-Time-Ms` headers. Statements a streaming
+    response runs after its headers are sent are only part of the metrics.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = request_query_stats.set(stats)
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"],
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-query-time-ms", f"{stats.duration * 1000:.2f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            request_query_stats.reset(token)
+            self._record(scope, stats)
+
+    def _record(self, scope: Scope, stats: QueryStats) -> None:
+        route = scope.get("route")
+        path = getattr(route, "path", "unmatched")
+
+        repeated = stats.repeated_statements()
+        for statement in repeated:
+            logger.warning(
+                "Possible N+1 query on %s %s: %s x %s",
+                scope["method"],
+                path,
+                stats.statements[statement],
+                statement,
+            )
+
+        route_query_metrics.record(
+            f"{scope['method']} {path}", stats, n_plus_one=bool(repeated)
+        )
@@ -0,0 +1,45 @@
+import re
+from uuid import uuid4
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.logger import request_id
+
+# IDs accepted from the X-Request-ID header of the client or a proxy
+_VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+
+class RequestIdMiddleware:
+    """
+    Gives each request an ID, added to its log records and returned as the `X-Request-ID` header.
+
+    The ID of an incoming `X-Request-ID` header is kept, so that a request can be
+    followed from a proxy through the application logs; otherwise one is generated.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = next(
+            (value for name, value in scope["headers"] if name == b"x-request-id"), b""
+        ).decode("latin-1")
+        current_request = incoming if _VALID_REQUEST_ID.fullmatch(incoming) else uuid4().hex
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-request-id", current_request.encode()),
+                ]
+            await send(message)
+
+        token = request_id.set(current_request)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id.reset(token)
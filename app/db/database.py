@@ -2,16 +2,71 @@
 
 from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from app.core.config import settings
+from app.db.pool import engine_options
+from app.db.replicas import ReplicaSet, RoutingSession
+from app.utils.cache import build_cache
 from app.utils.logger import logger
 
 DATABASE_URL = settings.database_url
+ASYNC_DATABASE_URL = settings.async_database_url
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_engine(DATABASE_URL, **engine_options())
+replica_engines = [
+    create_engine(url, **engine_options()) for url in settings.replica_database_urls()
+]
+
+# Async stack for routes that run on the event loop instead of the threadpool.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(is_async=True))
+async_replica_engines = [
+    create_async_engine(url, **engine_options(is_async=True))
+    for url in settings.replica_database_urls(is_async=True)
+]
+
+# Users who wrote recently, shared by the sync and async stacks (and across
+# workers when a shared cache is configured) to route their reads to the primary
+recent_writes = build_cache(
+    max_size=10_000,
+    ttl=settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+    shared_url=settings.CACHE_SHARED_URL,
+    name="recent_writes",
+)
+replica_set = ReplicaSet(
+    primary=engine,
+    replicas=replica_engines,
+    selection=settings.DATABASE_REPLICA_SELECTION,
+    read_your_writes_window=settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+    recent_writes=recent_writes,
+)
+async_replica_set = ReplicaSet(
+    primary=async_engine.sync_engine,
+    replicas=[replica.sync_engine for replica in async_replica_engines],
+    selection=settings.DATABASE_REPLICA_SELECTION,
+    read_your_writes_window=settings.DATABASE_READ_YOUR_WRITES_SECONDS,
+    recent_writes=recent_writes,
+)
+
+SessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    class_=RoutingSession,
+    info={"replica_set": replica_set},
+)
 db_session = scoped_session(SessionLocal)
 
+# Objects are not expired on commit since expired attributes cannot be lazily
+# reloaded outside of an awaited call.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+    sync_session_class=RoutingSession,
+    info={"replica_set": async_replica_set},
+)
+
 Base = declarative_base()
 
 
@@ -20,13 +75,78 @@ def init_db():
     return Base.metadata.create_all(bind=engine)
 
 
+def pool_stats() -> dict:
+    """Return the connection pool telemetry of the sync and async engines and their replicas."""
+    return {
+        "sync": engine.pool.stats(),
+        "async": async_engine.pool.stats(),
+        "sync_replicas": [replica.pool.stats() for replica in replica_engines],
+        "async_replicas": [replica.pool.stats() for replica in async_replica_engines],
+        "routing": {"sync": replica_set.stats(), "async": async_replica_set.stats()},
+    }
+
+
+async def dispose_async_engines() -> None:
+    """Close the connections of the async engine and its replicas."""
+    for async_db_engine in [async_engine, *async_replica_engines]:
+        await async_db_engine.dispose()
+
+
 def get_db():
     """Yield a new database session and ensure it's closed after use."""
     db = db_session()
     try:
         yield db
     except Exception as e:
-        logger.error(f"Database Error: {e}")
+        logger.error("Database Error: %s", e)
         raise
     finally:
         db.close()
+
+
+def get_request_db():
+    """Yield a database session owned by the request and ensure it's closed after use.
+
+    Unlike get_db, the session is not taken from the thread-local registry, so async
+    routes can hold it across awaits and use it from any threadpool worker.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    except Exception as e:
+        logger.error("Database Error: %s", e)
+        raise
+    finally:
+        db.close()
+
+
+def get_read_db():
+    """Yield a new read-only database session, served by a read replica when configured."""
+    db = SessionLocal(info={"read_only": True})
+    try:
+        yield db
+    except Exception as e:
+        logger.error("Database Error: %s", e)
+        raise
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """Yield a new async database session and ensure it's closed after use."""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error("Database Error: %s", e)
+            raise
+
+
+async def get_async_read_db():
+    """Yield a new read-only async database session, served by a read replica when configured."""
+    async with AsyncSessionLocal(info={"read_only": True}) as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error("Database Error: %s", e)
+            raise
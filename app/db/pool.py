@@ -0,0 +1,163 @@
+"""Connection pools with checkout telemetry"""
+
+import threading
+import time
+from uuid import uuid4
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from app.core.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import (
+    db_pool_checkout_duration_seconds,
+    db_pool_checkout_timeouts,
+    db_pool_connections_in_use,
+)
+
+
+def _in_use_listeners(label: str):
+    """Build the checkout and checkin listeners keeping the in-use gauge of a pool label."""
+    in_use = set()
+    lock = threading.Lock()
+
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        with lock:
+            in_use.add(connection_record)
+        db_pool_connections_in_use.labels(label).inc()
+
+    def checkin(dbapi_connection, connection_record):
+        # Checkin also fires for connections whose checkout failed
+        with lock:
+            if connection_record not in in_use:
+                return
+            in_use.discard(connection_record)
+        db_pool_connections_in_use.labels(label).dec()
+
+    return checkout, checkin
+
+
+_IN_USE_LISTENERS = {label: _in_use_listeners(label) for label in ("sync", "async")}
+
+
+class PoolTelemetryMixin:
+    """
+    Records how long checkouts wait for a connection and how often they time out,
+    in the pool stats and the `sync` or `async` pool metrics.
+    The label is given by the engine, as `create_engine(..., metrics_label="async")`,
+    since a pool class such as NullPool can serve either engine.
+    Attributes:
+        metrics_label (str): The `pool` label of the metrics, `sync` or `async`.
+        checkouts (int): Number of successful checkouts.
+        checkout_timeouts (int): Number of checkouts that gave up waiting.
+        checkout_wait_seconds_total (float): Time spent in checkouts, including connecting and pre-ping.
+        checkout_wait_seconds_max (float): The longest checkout.
+    """
+
+    def __init__(self, creator, metrics_label: str = "sync", **kwargs):
+        super().__init__(creator, **kwargs)
+        self._telemetry_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait_seconds_total = 0.0
+        self.checkout_wait_seconds_max = 0.0
+        self.metrics_label = metrics_label
+
+        # A pool recreated by Engine.dispose() inherits the listeners of the old one
+        inherited = list(self.dispatch.checkout)
+        if not any(checkout in inherited for checkout, _ in _IN_USE_LISTENERS.values()):
+            checkout, checkin = _IN_USE_LISTENERS[metrics_label]
+            event.listen(self, "checkout", checkout)
+            event.listen(self, "checkin", checkin)
+
+    def recreate(self):
+        # Pool.recreate() only passes on the arguments of the SQLAlchemy pool classes
+        pool = super().recreate()
+        pool.metrics_label = self.metrics_label
+        return pool
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            with self._telemetry_lock:
+                self.checkout_timeouts += 1
+            db_pool_checkout_timeouts.labels(self.metrics_label).inc()
+            logger.warning("Connection pool exhausted: %s", self.status())
+            raise
+
+        waited = time.perf_counter() - started
+        with self._telemetry_lock:
+            self.checkouts += 1
+            self.checkout_wait_seconds_total += waited
+            self.checkout_wait_seconds_max = max(self.checkout_wait_seconds_max, waited)
+        db_pool_checkout_duration_seconds.labels(self.metrics_label).observe(waited)
+        return connection
+
+    def stats(self) -> dict:
+        """Return the pool occupancy together with the checkout counters."""
+        stats = {
+            "pool": type(self).__name__,
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.checkout_timeouts,
+            "average_checkout_seconds": self.checkout_wait_seconds_total
+            / max(self.checkouts, 1),
+            "max_checkout_seconds": self.checkout_wait_seconds_max,
+        }
+        if isinstance(self, QueuePool):
+            stats.update(
+                size=self.size(),
+                checked_in=self.checkedin(),
+                in_use=self.checkedout(),
+                overflow=max(self.overflow(), 0),
+                max_overflow=self._max_overflow,
+            )
+        return stats
+
+
+class InstrumentedQueuePool(PoolTelemetryMixin, QueuePool):
+    """QueuePool with checkout telemetry."""
+
+
+class InstrumentedAsyncQueuePool(PoolTelemetryMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool with checkout telemetry."""
+
+
+class InstrumentedNullPool(PoolTelemetryMixin, NullPool):
+    """NullPool with checkout telemetry."""
+
+
+def engine_options(is_async: bool = False) -> dict:
+    """Build the pool keyword arguments of create_engine from the settings.
+
+    With DATABASE_PGBOUNCER set, connections are not pooled by the application and
+    asyncpg prepared statements are disabled, as PgBouncer in transaction mode may
+    run each transaction on a different server connection.
+
+    Args:
+        is_async (bool): Whether the options are for the asyncpg engine.
+
+    Returns:
+        dict: Keyword arguments for create_engine or create_async_engine.
+    """
+    metrics_label = "async" if is_async else "sync"
+    if settings.DATABASE_PGBOUNCER:
+        options = {"poolclass": InstrumentedNullPool, "metrics_label": metrics_label}
+        if is_async:
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+        return options
+
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "metrics_label": metrics_label,
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+    }
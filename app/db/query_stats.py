@@ -0,0 +1,182 @@
+"""Counting and timing of SQL statements per request"""
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.utils.metrics import db_query_duration_seconds
+
+
+class QueryStats:
+    """
+    The statements executed within one request or block of code.
+    Attributes:
+        count (int): Number of statements executed.
+        duration (float): Seconds spent executing them.
+        statements (Counter): Number of executions of each distinct statement.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float) -> None:
+        """Record an executed statement.
+        Args:
+            statement (str): The SQL of the statement.
+            duration (float): Seconds it took.
+        """
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            self.statements[statement] += 1
+
+    def repeated_statements(
+        self, threshold: int = settings.QUERY_N_PLUS_ONE_THRESHOLD
+    ) -> List[str]:
+        """Statements executed at least `threshold` times, the signature of an N+1 pattern.
+        Args:
+            threshold (int): The number of executions from which a statement is reported.
+        Returns:
+            List[str]: The repeated statements.
+        """
+        return [
+            statement
+            for statement, count in self.statements.items()
+            if count >= threshold
+        ]
+
+
+class RouteQueryMetrics:
+    """
+    Statement counts and time aggregated per route.
+    Attributes:
+        routes (dict): For each route path, the number of requests, statements,
+            seconds spent executing them and requests with repeated statements.
+    """
+
+    def __init__(self):
+        self.routes: dict = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, stats: QueryStats, n_plus_one: bool) -> None:
+        """Add the stats of a request to its route.
+        Args:
+            route (str): The route path.
+            stats (QueryStats): The stats of the request.
+            n_plus_one (bool): Whether the request repeated a statement.
+        """
+        with self._lock:
+            metrics = self.routes.setdefault(
+                route,
+                {
+                    "requests": 0,
+                    "queries": 0,
+                    "max_queries": 0,
+                    "query_seconds": 0.0,
+                    "n_plus_one": 0,
+                },
+            )
+            metrics["requests"] += 1
+            metrics["queries"] += stats.count
+            metrics["query_seconds"] += stats.duration
+            metrics["n_plus_one"] += int(n_plus_one)
+            metrics["max_queries"] = max(metrics["max_queries"], stats.count)
+
+    def stats(self) -> dict:
+        """Return the metrics of every route, with the average statements per request."""
+        with self._lock:
+            return {
+                route: {
+                    **metrics,
+                    "average_queries": metrics["queries"] / metrics["requests"],
+                }
+                for route, metrics in self.routes.items()
+            }
+
+
+route_query_metrics = RouteQueryMetrics()
+
+# Stats of the request being served; set by QueryStatsMiddleware
+request_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "request_query_stats", default=None
+)
+
+# Stats of the active count_queries() blocks, which see every statement in the process
+_collectors: List[QueryStats] = []
+
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def _operation(statement: str) -> str:
+    # The first keyword, with the others folded into one label to bound its values
+    words = statement.split(None, 1)
+    keyword = words[0].upper() if words else ""
+    return keyword if keyword in _OPERATIONS else "OTHER"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start_time"].pop()
+    db_query_duration_seconds.labels(_operation(statement)).observe(duration)
+
+    stats = request_query_stats.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    for collector in list(_collectors):
+        collector.record(statement, duration)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Count the statements executed while the block runs, on any engine and thread.
+
+    Yields:
+        QueryStats: The stats, filled in as the block runs.
+    """
+    stats = QueryStats()
+    _collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _collectors.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(max_count: int) -> Iterator[QueryStats]:
+    """Fail if the block executes more than `max_count` statements.
+
+    Args:
+        max_count (int): The query budget of the block.
+
+    Yields:
+        QueryStats: The stats, filled in as the block runs.
+
+    Raises:
+        AssertionError: If the budget is exceeded, listing the executed statements.
+    """
+    with count_queries() as stats:
+        yield stats
+
+    if stats.count > max_count:
+        executed = "\n".join(
+            f"{count} x {statement}" for statement, count in stats.statements.items()
+        )
+        raise AssertionError(
+            f"Expected at most {max_count} queries, {stats.count} were executed:\n{executed}"
+        )
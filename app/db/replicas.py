@@ -0,0 +1,223 @@
+"""Routing of read-only sessions to read replicas"""
+
+import itertools
+import threading
+from typing import List, Optional
+
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.pool import QueuePool
+
+from app.utils.cache import CacheBackend, LRUCache
+
+ROUND_ROBIN = "round_robin"
+LEAST_LOADED = "least_loaded"
+
+
+class ReplicaSet:
+    """
+    A primary engine and the read replicas that serve its read-only sessions.
+
+    A user who wrote through the primary reads from the primary for
+    `read_your_writes_window` seconds, so they see their own writes despite
+    replication lag.
+    Attributes:
+        primary (Engine): The engine of the primary.
+        replicas (List[Engine]): The engines of the replicas.
+        selection (str): `round_robin`, or `least_loaded` to pick the replica with the fewest checked out connections.
+        read_your_writes_window (float): Seconds a user keeps reading from the primary after a write.
+        recent_writes (CacheBackend): Users who wrote within the window, shareable across workers.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: Optional[List[Engine]] = None,
+        selection: str = ROUND_ROBIN,
+        read_your_writes_window: float = 5.0,
+        recent_writes: Optional[CacheBackend] = None,
+    ):
+        if selection not in (ROUND_ROBIN, LEAST_LOADED):
+            raise ValueError(f"Unknown replica selection: {selection}")
+
+        self.primary = primary
+        self.replicas = replicas or []
+        self.selection = selection
+        self.read_your_writes_window = read_your_writes_window
+        if recent_writes is None:
+            recent_writes = LRUCache(max_size=10_000, ttl=read_your_writes_window)
+        self.recent_writes = recent_writes
+        self._round_robin = itertools.cycle(range(len(self.replicas)))
+        self._lock = threading.Lock()
+
+        self.primary_reads = 0
+        self.replica_reads = [0] * len(self.replicas)
+
+    def read_engine(self, user_id: Optional[str] = None) -> Engine:
+        """Choose the engine for a read-only session.
+
+        Args:
+            user_id (Optional[str]): The user the session serves, if known.
+
+        Returns:
+            Engine: The primary if there are no replicas or the user wrote recently, else a replica.
+        """
+        return self._choose(bool(self.replicas and user_id and self.wrote_recently(user_id)))
+
+    async def read_engine_async(self, user_id: Optional[str] = None) -> Engine:
+        """Async variant of read_engine that keeps the recent writes lookup off the event loop.
+
+        Args:
+            user_id (Optional[str]): The user the session serves, if known.
+
+        Returns:
+            Engine: The primary if there are no replicas or the user wrote recently, else a replica.
+        """
+        pinned = bool(
+            self.replicas
+            and user_id
+            and await self.recent_writes.aget(f"wrote:{user_id}") is not None
+        )
+        return self._choose(pinned)
+
+    def _choose(self, pinned: bool) -> Engine:
+        if not self.replicas or pinned:
+            with self._lock:
+                self.primary_reads += 1
+            return self.primary
+
+        with self._lock:
+            if self.selection == LEAST_LOADED:
+                index = min(
+                    range(len(self.replicas)),
+                    key=lambda i: _checked_out(self.replicas[i]),
+                )
+            else:
+                index = next(self._round_robin)
+            self.replica_reads[index] += 1
+        return self.replicas[index]
+
+    def record_write(self, user_id: str) -> None:
+        """Pin a user to the primary for the read-your-writes window.
+
+        Args:
+            user_id (str): The user who wrote.
+        """
+        self.recent_writes.set(
+            f"wrote:{user_id}", True, ttl=self.read_your_writes_window
+        )
+
+    def wrote_recently(self, user_id: str) -> bool:
+        """Whether a user wrote within the read-your-writes window.
+
+        Args:
+            user_id (str): The user.
+
+        Returns:
+            bool: True if the user's reads must go to the primary.
+        """
+        return self.recent_writes.get(f"wrote:{user_id}") is not None
+
+    def stats(self) -> dict:
+        """Return the number of reads routed to the primary and to each replica."""
+        return {
+            "selection": self.selection,
+            "primary_reads": self.primary_reads,
+            "replica_reads": list(self.replica_reads),
+        }
+
+
+def _checked_out(engine: Engine) -> int:
+    pool = engine.pool
+    return pool.checkedout() if isinstance(pool, QueuePool) else 0
+
+
+class RoutingSession(Session):
+    """
+    Session that sends read-only work to a replica.
+
+    Sessions are bound to the primary. One opened with `info={"read_only": True}`
+    runs its queries on a replica chosen by the ReplicaSet in `info["replica_set"]`,
+    once per session so that all its reads see the same snapshot. Flushes and
+    INSERT, UPDATE and DELETE statements always go to the primary.
+
+    The user a session serves is set as `info["user_id"]` by the authentication
+    dependencies, before the first query. After a commit that wrote anything,
+    that user is pinned to the primary for the read-your-writes window.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica_set: Optional[ReplicaSet] = self.info.get("replica_set")
+        if (
+            replica_set is None
+            or not self.info.get("read_only")
+            or self._flushing
+            or isinstance(clause, UpdateBase)
+        ):
+            return super().get_bind(mapper, clause=clause, **kw)
+
+        if "read_engine" not in self.info:
+            self.info["read_engine"] = replica_set.read_engine(self.info.get("user_id"))
+        return self.info["read_engine"]
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_write(session: Session, flush_context) -> None:
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_statement_write(orm_execute_state: ORMExecuteState) -> None:
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _record_write(session: Session) -> None:
+    replica_set: Optional[ReplicaSet] = session.info.get("replica_set")
+    user_id = session.info.get("user_id")
+    if session.info.pop("wrote", False) and replica_set is not None and user_id:
+        replica_set.record_write(user_id)
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_write(session: Session) -> None:
+    session.info.pop("wrote", None)
+
+
+async def select_read_engine_async(session: AsyncSession) -> None:
+    """Choose the replica of a read-only async session before its first query.
+
+    get_bind would otherwise look up the user's recent writes on the event loop.
+
+    Args:
+        session (AsyncSession): The session, with its `info["user_id"]` already set.
+    """
+    replica_set: Optional[ReplicaSet] = session.info.get("replica_set")
+    if (
+        replica_set is not None
+        and session.info.get("read_only")
+        and "read_engine" not in session.info
+    ):
+        session.info["read_engine"] = await replica_set.read_engine_async(
+            session.info.get("user_id")
+        )
+
+
+def record_user_write(session: Session, user_id: str) -> None:
+    """Pin a user to the primary after a write whose user was only known once committed,
+    such as the creation of the user itself.
+
+    Args:
+        session (Session): The session that wrote.
+        user_id (str): The user to pin.
+    """
+    replica_set: Optional[ReplicaSet] = session.info.get("replica_set")
+    if replica_set is not None:
+        replica_set.record_write(user_id)
@@ -1,7 +1,8 @@
 import uvicorn
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, status
-from fastapi import HTTPException, Request
+from fastapi import Depends, FastAPI, status
+from fastapi import HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,18 +11,47 @@ from starlette.middleware.sessions import SessionMiddleware
 
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from app.core.config import settings
-from app.utils.logger import logger
+from app.core.dependencies.internal import verify_internal_token
+from app.core.middleware.metrics import MetricsMiddleware
+from app.core.middleware.query_stats import QueryStatsMiddleware
+from app.core.middleware.request_id import RequestIdMiddleware
+from app.db.database import dispose_async_engines, pool_stats
+from app.db.query_stats import route_query_metrics
+from app.utils.google_oauth import google_metadata
+from app.utils.logger import log_pipeline, logger
 from app.utils.limiter import limiter
+from app.utils.metrics import mark_process_dead, rate_limit_rejections, render_metrics
 from app.api.v1 import main_router
+from app.api.services.generation_job import generation_worker_pool
+from app.api.services.password import password_hasher
+from app.api.services.token import revocation_sync
+from app.api.services.usage import usage_ledger
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    log_pipeline.start()
+    password_hasher.start()
+    await revocation_sync.start()
+    await google_metadata.start()
+    await usage_ledger.start()
+    if settings.JOB_WORKERS > 0:
+        await generation_worker_pool.start()
     logger.info("Application started")
     yield
+    if settings.JOB_WORKERS > 0:
+        await generation_worker_pool.stop()
+    await usage_ledger.stop()
+    await google_metadata.stop()
+    await revocation_sync.stop()
+    password_hasher.stop()
+    await dispose_async_engines()
+    mark_process_dead()
     logger.info("Application shutdown")
+    log_pipeline.stop()
 
 
 app = FastAPI(
@@ -46,6 +76,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
 app.include_router(main_router)
 
 
@@ -63,12 +97,43 @@ async def probe():
     return {"message": "I am the Kwiki AI API responding"}
 
 
+@app.get("/probe/pool", tags=["Home"], dependencies=[Depends(verify_internal_token)])
+async def probe_pool():
+    return pool_stats()
+
+
+@app.get("/probe/queries", tags=["Home"], dependencies=[Depends(verify_internal_token)])
+async def probe_queries():
+    return route_query_metrics.stats()
+
+
+@app.get("/probe/jobs", tags=["Home"], dependencies=[Depends(verify_internal_token)])
+async def probe_jobs():
+    return await run_in_threadpool(generation_worker_pool.stats)
+
+
+@app.get(
+    "/metrics",
+    tags=["Home"],
+    include_in_schema=False,
+    dependencies=[Depends(verify_internal_token)],
+)
+async def metrics():
+    try:
+        await run_in_threadpool(generation_worker_pool.observe_queue_depth)
+    except Exception as e:
+        logger.warning("Could not count the generation jobs for the metrics: %s", e)
+    # Reads the files of every worker in multiprocess mode
+    content = await run_in_threadpool(render_metrics)
+    return Response(content=content, media_type=CONTENT_TYPE_LATEST)
+
+
 # REGISTER EXCEPTION HANDLERS
 @app.exception_handler(HTTPException)
 async def http_exception(request: Request, exc: HTTPException):
     """HTTP exception handler"""
 
-    logger.error(f"HTTP Exception occured; {exc}")
+    logger.error("HTTP Exception occured; %s", exc)
 
     return JSONResponse(
         status_code=exc.status_code,
@@ -89,7 +154,7 @@ async def validation_exception(request: Request, exc: RequestValidationError):
         for error in exc.errors()
     ]
 
-    logger.error(f"Validation Exception occured; {errors}")
+    logger.error("Validation Exception occured; %s", errors)
 
     return JSONResponse(
         status_code=422,
@@ -106,7 +171,7 @@ async def validation_exception(request: Request, exc: RequestValidationError):
 async def integrity_exception(request: Request, exc: IntegrityError):
     """Integrity error exception handlers"""
 
-    logger.error(f"Integrity Exception occured; {exc}")
+    logger.error("Integrity Exception occured; %s", exc)
 
     return JSONResponse(
         status_code=400,
@@ -122,7 +187,7 @@ async def integrity_exception(request: Request, exc: IntegrityError):
 async def exception(request: Request, exc: Exception):
     """Other exception handlers"""
 
-    logger.error(f"Exception occured; {exc}")
+    logger.error("Exception occured; %s", exc)
 
     return JSONResponse(
         status_code=500,
@@ -138,7 +203,8 @@ async def exception(request: Request, exc: Exception):
 async def custom_rate_limit_handler(request: Request, exc: RateLimitExceeded):
     """Rate limit exceeded exception handler"""
 
-    logger.error(f"Rate limit exceeded! {exc}")
+    logger.error("Rate limit exceeded! %s", exc)
+    rate_limit_rejections.labels("requests").inc()
 
     return JSONResponse(
         status_code=429,
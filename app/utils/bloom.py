@@ -0,0 +1,49 @@
+"""Bloom filter for compact set membership checks"""
+
+import hashlib
+import math
+from typing import Iterable, Iterator
+
+
+class BloomFilter:
+    """
+    Probabilistic set: a lookup may return a false positive, never a false negative.
+    Attributes:
+        capacity (int): The number of items the filter is sized for.
+        error_rate (float): The false positive rate at capacity.
+        size (int): The number of bits.
+        hash_count (int): The number of bit positions per item.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, items: Iterable[str] = ()):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        for item in items:
+            self.add(item)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: k positions derived from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, item: str) -> None:
+        """Add an item.
+        Args:
+            item (str): The item.
+        """
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
@@ -0,0 +1,344 @@
+"""Pluggable key-value caches with TTL and size-bounded eviction"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.utils.metrics import cache_lookups
+
+
+class CacheBackend:
+    """
+    Base class for cache backends.
+    Values must be JSON-serializable so that every backend can store them.
+    Code on the event loop uses the async variants of the methods, which keep the
+    I/O of a backend such as SQLiteCache off the loop.
+    Attributes:
+        name (Optional[str]): The name of the cache in the metrics, None to leave it out.
+        hits (int): Number of lookups that found a live entry.
+        misses (int): Number of lookups that found nothing.
+        evictions (int): Number of entries dropped to stay within the size bound.
+    """
+
+    def __init__(self, name: Optional[str] = None):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a cached value.
+        Args:
+            key (str): The cache key.
+        Returns:
+            Optional[Any]: The cached value, None if absent or expired.
+        """
+        return self.get_with_ttl(key)[0]
+
+    def get_with_ttl(self, key: str) -> Tuple[Optional[Any], Optional[float]]:
+        """Get a cached value and the seconds it has left to live.
+        Args:
+            key (str): The cache key.
+        Returns:
+            Tuple[Optional[Any], Optional[float]]: The cached value, None if absent or
+            expired, and its remaining time to live, None if it does not expire.
+        """
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value.
+        Args:
+            key (str): The cache key.
+            value (Any): The value to cache.
+            ttl (Optional[float]): Seconds until the entry expires. Defaults to the backend TTL.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Remove a value if present.
+        Args:
+            key (str): The cache key.
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        raise NotImplementedError
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """Async variant of get."""
+        return (await self.aget_with_ttl(key))[0]
+
+    async def aget_with_ttl(self, key: str) -> Tuple[Optional[Any], Optional[float]]:
+        """Async variant of get_with_ttl, run in place by in-process backends."""
+        return self.get_with_ttl(key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Async variant of set, run in place by in-process backends."""
+        self.set(key, value, ttl)
+
+    async def adelete(self, key: str) -> None:
+        """Async variant of delete, run in place by in-process backends."""
+        self.delete(key)
+
+    def stats(self) -> dict:
+        """Return the hit, miss and eviction counters."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _count_lookup(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.name is not None:
+            cache_lookups.labels(self.name, "hit" if hit else "miss").inc()
+
+
+class LRUCache(CacheBackend):
+    """
+    In-process cache with least-recently-used eviction and per-entry expiry.
+    Attributes:
+        max_size (int): The maximum number of entries.
+        ttl (Optional[float]): The default time to live in seconds, None for no expiry.
+    """
+
+    def __init__(
+        self, max_size: int = 1024, ttl: Optional[float] = None, name: Optional[str] = None
+    ):
+        super().__init__(name)
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_with_ttl(self, key: str) -> Tuple[Optional[Any], Optional[float]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._count_lookup(True)
+                    return value, None if expires_at is None else expires_at - now
+                del self._entries[key]
+            self._count_lookup(False)
+            return None, None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a local SQLite file, shared by every worker process on the host.
+    It stands in for a networked store such as Redis.
+    Attributes:
+        path (str): The path of the SQLite database file.
+        max_size (int): The maximum number of entries.
+        ttl (Optional[float]): The default time to live in seconds, None for no expiry.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int = 10_000,
+        ttl: Optional[float] = None,
+        name: Optional[str] = None,
+    ):
+        super().__init__(name)
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_cache_accessed_at ON cache (accessed_at)"
+        )
+
+    def get_with_ttl(self, key: str) -> Tuple[Optional[Any], Optional[float]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and (row[1] is None or row[1] > now):
+                self._conn.execute(
+                    "UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+                self._count_lookup(True)
+                return json.loads(row[0]), None if row[1] is None else row[1] - now
+            if row is not None:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._count_lookup(False)
+            return None, None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            evicted = self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,),
+            ).rowcount
+            self.evictions += max(evicted, 0)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    # The queries may wait up to the busy timeout for another worker's write
+    async def aget_with_ttl(self, key: str) -> Tuple[Optional[Any], Optional[float]]:
+        return await run_in_threadpool(self.get_with_ttl, key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await run_in_threadpool(self.set, key, value, ttl)
+
+    async def adelete(self, key: str) -> None:
+        await run_in_threadpool(self.delete, key)
+
+
+class TieredCache(CacheBackend):
+    """
+    Two-tier cache with an in-process tier in front of an optional shared tier.
+    Shared hits are copied into the local tier until the shared entry expires, so
+    the copy does not outlive it.
+    Attributes:
+        local (CacheBackend): The in-process tier.
+        shared (Optional[CacheBackend]): The tier shared across workers.
+    """
+
+    def __init__(
+        self,
+        local: CacheBackend,
+        shared: Optional[CacheBackend] = None,
+        name: Optional[str] = None,
+    ):
+        super().__init__(name)
+        self.local = local
+        self.shared = shared
+
+    def get_with_ttl(self, key: str) -> Tuple[Optional[Any], Optional[float]]:
+        value, ttl = self.local.get_with_ttl(key)
+        if value is None and self.shared is not None:
+            value, ttl = self.shared.get_with_ttl(key)
+            if value is not None:
+                self.local.set(key, value, ttl)
+
+        self._count_lookup(value is not None)
+        return value, ttl
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            self.shared.set(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    async def aget_with_ttl(self, key: str) -> Tuple[Optional[Any], Optional[float]]:
+        value, ttl = await self.local.aget_with_ttl(key)
+        if value is None and self.shared is not None:
+            value, ttl = await self.shared.aget_with_ttl(key)
+            if value is not None:
+                await self.local.aset(key, value, ttl)
+
+        self._count_lookup(value is not None)
+        return value, ttl
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.local.aset(key, value, ttl)
+        if self.shared is not None:
+            await self.shared.aset(key, value, ttl)
+
+    async def adelete(self, key: str) -> None:
+        await self.local.adelete(key)
+        if self.shared is not None:
+            await self.shared.adelete(key)
+
+    def clear(self) -> None:
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["local"] = self.local.stats()
+        if self.shared is not None:
+            stats["shared"] = self.shared.stats()
+        return stats
+
+
+def build_cache(
+    max_size: int,
+    ttl: Optional[float] = None,
+    shared_url: Optional[str] = None,
+    name: Optional[str] = None,
+) -> CacheBackend:
+    """Build an in-process LRU cache, backed by a shared tier when configured.
+
+    Args:
+        max_size (int): The maximum number of entries per tier.
+        ttl (Optional[float]): The default time to live in seconds.
+        shared_url (Optional[str]): The shared tier location, e.g. `sqlite:////tmp/kwiki-cache.db`.
+        name (Optional[str]): The name of the cache in the metrics, which count its
+            lookups as a whole rather than per tier.
+
+    Returns:
+        CacheBackend: The configured cache.
+    """
+    if not shared_url:
+        return LRUCache(max_size=max_size, ttl=ttl, name=name)
+
+    if not shared_url.startswith("sqlite:///"):
+        raise ValueError(f"Unsupported shared cache URL: {shared_url}")
+
+    local = LRUCache(max_size=max_size, ttl=ttl)
+    shared = SQLiteCache(
+        path=shared_url.removeprefix("sqlite:///"), max_size=max_size, ttl=ttl
+    )
+    return TieredCache(local=local, shared=shared, name=name)
@@ -1,7 +1,15 @@
+import asyncio
+import json
+import os
+import time
+from typing import Optional
+
+import httpx
 from starlette.config import Config
 from authlib.integrations.starlette_client import OAuth
 
 from app.core.config import settings
+from app.utils.logger import logger
 
 
 # Initialize OAuth with the configuration settings
@@ -16,9 +24,150 @@ oauth = OAuth(starlette_config)
 # Register the Google OAuth provider
 oauth.register(
     name="google",
-    server_metadata_url="https://accounts.google.com/.well-known/openid-configuration",
+    server_metadata_url=settings.GOOGLE_DISCOVERY_URL,
     access_token_url='https://oauth2.googleapis.com/token',
     authorize_url='https://accounts.google.com/o/oauth2/auth',
     client_kwargs={"scope": "openid profile email"},
     redirect_uri=settings.GOOGLE_REDIRECT_URL,
 )
+
+
+class ProviderMetadataCache:
+    """
+    Keeps the discovery document and JWKS of an OpenID provider loaded in its
+    authlib client, so that no login request waits on fetching them.
+
+    They are loaded in the application lifespan and refreshed in the background
+    before they expire. The last fetch is kept in a cache file shared by the
+    workers, so only one of them needs to fetch per TTL. When a refresh fails,
+    the previous metadata stays in use until a retry succeeds.
+    Attributes:
+        client: The authlib client of the provider.
+        metadata_url (str): The URL of the discovery document.
+        cache_file (str): The path of the cache file.
+        ttl (float): Seconds the metadata is used before it is fetched again.
+        retry_interval (float): Seconds before a failed refresh is retried.
+    """
+
+    def __init__(
+        self,
+        client,
+        metadata_url: str,
+        cache_file: str,
+        ttl: float = settings.GOOGLE_METADATA_TTL,
+        retry_interval: float = 30,
+        timeout: float = 5,
+    ):
+        self.client = client
+        self.metadata_url = metadata_url
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.fetched_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.fetches = 0
+        self.failures = 0
+
+    async def start(self) -> None:
+        """Load the metadata and start refreshing it."""
+        await self.refresh()
+        self._task = asyncio.create_task(self._refresh_periodically(), name="openid-metadata")
+
+    async def stop(self) -> None:
+        """Stop refreshing the metadata."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def is_fresh(self, entry: Optional[dict]) -> bool:
+        return entry is not None and entry["fetched_at"] + self.ttl > time.time()
+
+    async def refresh(self) -> bool:
+        """Use the cache file if another worker refreshed it, else fetch the metadata.
+
+        Returns:
+            bool: True if fresh metadata is loaded.
+        """
+        entry = self._read_cache_file()
+        if not self.is_fresh(entry):
+            try:
+                entry = await self._fetch()
+                self._write_cache_file(entry)
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                self.failures += 1
+                logger.error("Error fetching OpenID metadata from %s: %s", self.metadata_url, e)
+                if entry is None:
+                    return False
+                logger.warning("Using expired OpenID metadata until a refresh succeeds")
+
+        self._apply(entry)
+        return self.is_fresh(entry)
+
+    async def _fetch(self) -> dict:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(self.metadata_url)
+            response.raise_for_status()
+            metadata = response.json()
+
+            response = await client.get(metadata["jwks_uri"])
+            response.raise_for_status()
+            jwks = response.json()
+
+        self.fetches += 1
+        return {"metadata": metadata, "jwks": jwks, "fetched_at": time.time()}
+
+    def _apply(self, entry: dict) -> None:
+        # authlib skips discovery once `_loaded_at` is set and reuses a loaded `jwks`
+        self.client.server_metadata.update(
+            {**entry["metadata"], "jwks": entry["jwks"], "_loaded_at": entry["fetched_at"]}
+        )
+        self.fetched_at = entry["fetched_at"]
+
+    def _read_cache_file(self) -> Optional[dict]:
+        try:
+            with open(self.cache_file) as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("url") != self.metadata_url or "fetched_at" not in entry:
+            return None
+        return entry
+
+    def _write_cache_file(self, entry: dict) -> None:
+        # Written to a temporary file and renamed, so other workers never read a partial file
+        temporary_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(temporary_file, "w") as file:
+                json.dump({**entry, "url": self.metadata_url}, file)
+            os.replace(temporary_file, self.cache_file)
+        except OSError as e:
+            logger.error("Error writing OpenID metadata cache file: %s", e)
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            if self.fetched_at is not None and self.is_fresh({"fetched_at": self.fetched_at}):
+                delay = self.fetched_at + self.ttl - time.time()
+            else:
+                delay = self.retry_interval
+            await asyncio.sleep(max(delay, 1))
+            await self.refresh()
+
+    def stats(self) -> dict:
+        """Return the age of the loaded metadata and the fetch counters."""
+        return {
+            "age_seconds": None if self.fetched_at is None else time.time() - self.fetched_at,
+            "fetches": self.fetches,
+            "failures": self.failures,
+        }
+
+
+# Started in the application lifespan
+google_metadata = ProviderMetadataCache(
+    client=oauth.google,
+    metadata_url=settings.GOOGLE_DISCOVERY_URL,
+    cache_file=settings.GOOGLE_METADATA_CACHE_FILE,
+)
@@ -0,0 +1,151 @@
+"""Incremental parser for streamed deck JSON documents"""
+
+import json
+from typing import Any, List, Tuple
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_INCOMPLETE = object()
+
+
+class DeckStreamParser:
+    """
+    Incremental parser for a DeckModel JSON document received in chunks.
+
+    Top-level scalar fields are emitted as ("field", (key, value)) events and every
+    element of the `cards` array is emitted as a ("card", dict) event as soon as its
+    closing brace arrives, without waiting for the rest of the document.
+
+    Usage:
+        parser = DeckStreamParser()
+        for chunk in chunks:
+            for event, payload in parser.feed(chunk):
+                ...
+        parser.close()
+    """
+
+    CARDS_KEY = "cards"
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.state = "start"
+        self.key = None
+
+    @property
+    def done(self) -> bool:
+        """Whether the closing brace of the document has been parsed."""
+        return self.state == "done"
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consume a chunk of the document.
+
+        Args:
+            chunk (str): The next piece of the JSON text.
+
+        Returns:
+            List[Tuple[str, Any]]: The events completed by this chunk.
+
+        Raises:
+            ValueError: If the document is not a JSON object of the expected shape.
+        """
+        self.buffer += chunk
+        events = []
+
+        while self.state != "done":
+            self._skip_whitespace()
+            if self.pos >= len(self.buffer):
+                break
+
+            char = self.buffer[self.pos]
+
+            if self.state == "start":
+                # Tolerate any preamble emitted before the JSON object
+                start = self.buffer.find("{", self.pos)
+                if start == -1:
+                    self.pos = len(self.buffer)
+                    break
+                self.pos = start + 1
+                self.state = "key"
+
+            elif self.state == "key":
+                if char == ",":
+                    self.pos += 1
+                elif char == "}":
+                    self.pos += 1
+                    self.state = "done"
+                else:
+                    key = self._decode()
+                    if key is _INCOMPLETE:
+                        break
+                    if not isinstance(key, str):
+                        raise ValueError("Expected an object key in deck JSON")
+                    self.key = key
+                    self.state = "colon"
+
+            elif self.state == "colon":
+                if char != ":":
+                    raise ValueError("Expected ':' after object key in deck JSON")
+                self.pos += 1
+                self.state = "value"
+
+            elif self.state == "value":
+                if self.key == self.CARDS_KEY and char == "[":
+                    self.pos += 1
+                    self.state = "cards"
+                else:
+                    value = self._decode()
+                    if value is _INCOMPLETE:
+                        break
+                    events.append(("field", (self.key, value)))
+                    self.state = "key"
+
+            elif self.state == "cards":
+                if char == ",":
+                    self.pos += 1
+                elif char == "]":
+                    self.pos += 1
+                    self.state = "key"
+                else:
+                    card = self._decode()
+                    if card is _INCOMPLETE:
+                        break
+                    if not isinstance(card, dict):
+                        raise ValueError("Expected card objects in deck JSON")
+                    events.append(("card", card))
+
+        # Drop the consumed prefix so the buffer only holds the pending value
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+        return events
+
+    def close(self) -> None:
+        """Signal the end of the stream.
+
+        Raises:
+            ValueError: If the document ended before its closing brace.
+        """
+        if self.state != "done":
+            raise ValueError("Deck JSON ended before it was complete")
+
+    def _skip_whitespace(self) -> None:
+        while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+            self.pos += 1
+
+    def _decode(self) -> Any:
+        """Decode the JSON value at the current position, if it is complete."""
+        try:
+            value, end = _decoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            # Most likely a value cut short by the chunk boundary. A malformed
+            # document never completes and is reported by close().
+            return _INCOMPLETE
+
+        # Bare numbers and literals have no terminator, so one ending exactly at the
+        # buffer boundary may still be cut short.
+        if end == len(self.buffer) and not isinstance(value, (str, dict, list)):
+            return _INCOMPLETE
+
+        self.pos = end
+        return value
+
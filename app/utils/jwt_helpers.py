@@ -1,10 +1,22 @@
+import hashlib
+import time
+import uuid
 from datetime import datetime, timedelta
+from typing import Optional
 
 from app.core.config import settings
-from app.core import response_messages
+from app.utils.cache import LRUCache
+from app.utils.revocation import revocation_index
 from fastapi import HTTPException
 from jose import JWTError, jwt
 
+# Claims of verified tokens, keyed by a hash of the token and expiring with it
+token_cache = (
+    LRUCache(max_size=settings.JWT_CACHE_MAX_SIZE, name="token")
+    if settings.JWT_CACHE_ENABLED
+    else None
+)
+
 
 def create_jwt_token(token_type: str, user_id: str) -> str:
     """Function to create an access token"""
@@ -18,47 +30,93 @@ def create_jwt_token(token_type: str, user_id: str) -> str:
         raise ValueError("token_type should be 'access' or 'refresh'")
 
     expire = datetime.utcnow() + timedelta(hours=expiry_period[token_type])
-    data = {"user_id": user_id, "exp": expire, "type": token_type}
+    data = {
+        "user_id": user_id,
+        "exp": expire,
+        "type": token_type,
+        "jti": str(uuid.uuid4()),
+    }
     encoded_jwt = jwt.encode(data, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
-def verify_jwt_token(token: str, credentials_exception: HTTPException) -> str:
-    """Funtcion to decode and verify access and refresh tokens"""
+def _decode_token(token: str) -> Optional[dict]:
+    """Decode a token, verifying it only if it is not in the token cache
+
+    Returns:
+        Optional[dict]: The claims, None if the token is invalid or expired
+    """
+    key = hashlib.sha256(token.encode()).hexdigest()
+    if token_cache is not None:
+        payload = token_cache.get(key)
+        # The entry expires with the token; the check covers the clock resolution
+        if payload is not None and payload["exp"] > time.time():
+            return payload
 
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
         )
-        user_id: str = payload.get("user_id")
+    except JWTError:
+        return None
 
-        if user_id is None:
-            raise credentials_exception
+    if token_cache is not None and "exp" in payload:
+        token_cache.set(key, payload, ttl=payload["exp"] - time.time())
+    return payload
 
-    except JWTError:
-        raise credentials_exception
 
-    return user_id
+def token_id(token: str, claims: dict) -> str:
+    """The ID under which a token is revoked
+
+    Args:
+        token (str): The token
+        claims (dict): Its verified claims
+
+    Returns:
+        str: The `jti` claim, or a hash of the token if it was issued without one
+    """
+    return claims.get("jti") or hashlib.sha256(token.encode()).hexdigest()
 
 
-def refresh_access_token(refresh_token: str) -> str:
-    """Refresh access token with the refresh token
+def verify_jwt_claims(
+    token: str, credentials_exception: HTTPException, token_type: str = "access"
+) -> dict:
+    """Decode and verify a token of the given type that was not revoked
 
     Args:
-        refresh_token (str): The refresh token
+        token (str): The token
+        credentials_exception (HTTPException): Raised if the token is invalid
+        token_type (str): The expected `type` claim, 'access' or 'refresh'
 
     Returns:
-        str: The new access token
+        dict: The claims of the token
     """
-    credentials_exception = HTTPException(
-        status_code=401, detail=response_messages.EXPIRED_REFRESH_TOKEN
-    )
 
-    user_id = verify_jwt_token(
-        token=refresh_token, credentials_exception=credentials_exception
-    )
+    payload = _decode_token(token)
+    if payload is None or payload.get("type") != token_type:
+        raise credentials_exception
+
+    if payload.get("user_id") is None:
+        raise credentials_exception
+
+    if revocation_index.is_revoked(token_id(token, payload)):
+        raise credentials_exception
+
+    return payload
 
-    if user_id:
-        new_access_token = create_jwt_token("access", user_id=user_id)
 
-        return new_access_token
+def verify_jwt_token(
+    token: str, credentials_exception: HTTPException, token_type: str = "access"
+) -> str:
+    """Funtcion to decode and verify access and refresh tokens
+
+    Args:
+        token (str): The token
+        credentials_exception (HTTPException): Raised if the token is invalid
+        token_type (str): The expected `type` claim, 'access' or 'refresh'
+
+    Returns:
+        str: The ID of the user the token was issued to
+    """
+
+    return verify_jwt_claims(token, credentials_exception, token_type)["user_id"]
@@ -1,5 +1,46 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from starlette.requests import Request
 
+from app.core.config import settings
+from app.utils import jwt_helpers
+from app.utils.rate_limit import TokenBucketLimiter, build_bucket_store
 
-limiter = Limiter(key_func=get_remote_address)
\ No newline at end of file
+
+def rate_limit_key(request: Request) -> str:
+    """Rate limit requests per authenticated user, falling back to the client IP.
+
+    Args:
+        request (Request): The request.
+
+    Returns:
+        str: `user:<id>` for a valid access token, else `ip:<address>`.
+    """
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            user_id = jwt_helpers.verify_jwt_token(token, credentials_exception=ValueError())
+        except ValueError:
+            pass
+        else:
+            return f"user:{user_id}"
+
+    return f"ip:{get_remote_address(request)}"
+
+
+# Request count limits, in the same storage as the token buckets: per-worker memory
+# by default, or a SQLite file (SQLiteCounterStorage) or Redis server shared by the workers
+limiter = Limiter(
+    key_func=rate_limit_key,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URL or "memory://",
+)
+
+# LLM token budget of each user, shared across workers through RATE_LIMIT_STORAGE_URL
+llm_limiter = TokenBucketLimiter(
+    store=build_bucket_store(settings.RATE_LIMIT_STORAGE_URL),
+    capacity=settings.LLM_TOKEN_BUCKET_CAPACITY,
+    refill_rate=settings.LLM_TOKEN_REFILL_PER_MINUTE / 60,
+    request_cost=settings.LLM_REQUEST_COST,
+    name="llm_tokens",
+)
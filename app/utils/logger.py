@@ -1,22 +1,189 @@
+import copy
+import json
 import logging
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import List, Optional
 
-def setup_logger(log_dir: str = "logs") -> logging.Logger:
+from app.core.config import settings
+
+LOGGER_NAME = "kwiki"
+
+# ID of the request being served; set by RequestIdMiddleware
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes of every LogRecord, the others being `extra` fields
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Adds the ID of the current request to records as `request_id`."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Records handed over by a QueueHandler already carry the ID of their request
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of the records below WARNING.
+
+    Records of the same request are kept or dropped together, so a sampled
+    request keeps its whole trail.
+    Attributes:
+        rate (float): The fraction of records kept, from 0 to 1.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self._threshold = int(rate * 10_000)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+
+        current_request = request_id.get()
+        if current_request is None:
+            return random.random() < self.rate
+        return zlib.crc32(current_request.encode()) % 10_000 < self._threshold
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, with their `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merges the arguments into the message, which is all a record needs to be
+        # handed to another thread, keeping the traceback apart for the formatters
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Waits for room rather than failing on a full queue
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    """
+    Moves the handlers of a logger behind a queue, so that logging on the request
+    path only enqueues the record while a listener thread formats it and writes it
+    to the files and the console.
+
+    Until it is started, and after it is stopped, the handlers are attached to the
+    logger directly, so scripts and tests log synchronously.
+    Attributes:
+        logger (logging.Logger): The logger whose handlers are moved.
+        queue_size (int): The records the queue holds before new ones are dropped.
+    """
+
+    def __init__(self, logger: logging.Logger, queue_size: int = settings.LOG_QUEUE_SIZE):
+        self.logger = logger
+        self.queue_size = queue_size
+        self._handlers: List[logging.Handler] = []
+        self._queue_handler: Optional[_DroppingQueueHandler] = None
+        self._listener: Optional[QueueListener] = None
+
+    def start(self) -> None:
+        """Start the listener thread and route the logger through the queue."""
+        if self._listener is not None:
+            return
+
+        log_queue = queue.Queue(maxsize=self.queue_size)
+        self._handlers = list(self.logger.handlers)
+        self._queue_handler = _DroppingQueueHandler(log_queue)
+        self._queue_handler.addFilter(RequestIdFilter())
+        self._listener = _QueueListener(log_queue, *self._handlers, respect_handler_level=True)
+        self._listener.start()
+        self.logger.handlers = [self._queue_handler]
+
+    def stop(self) -> None:
+        """Write the queued records, stop the listener and attach the handlers directly again."""
+        if self._listener is None:
+            return
+
+        self.logger.handlers = self._handlers
+        self._listener.stop()
+        self._listener = None
+
+    def stats(self) -> dict:
+        """Return the number of queued and dropped records."""
+        if self._queue_handler is None:
+            return {"queued": 0, "dropped": 0}
+        return {
+            "queued": self._queue_handler.queue.qsize(),
+            "dropped": self._queue_handler.dropped,
+        }
+
+
+def setup_logger(
+    log_dir: str = settings.LOG_DIR, log_format: str = settings.LOG_FORMAT
+) -> logging.Logger:
     # Create logs directory if it doesn't exist
-    Path(log_dir).mkdir(exist_ok=True)
-    
+    Path(log_dir).mkdir(parents=True, exist_ok=True)
+
     # Configure the logger
-    logger = logging.getLogger(__name__)
+    logger = logging.getLogger(LOGGER_NAME)
     logger.setLevel(logging.INFO)
-    
+
     # Log format
-    log_format = logging.Formatter(
-        "[%(asctime)s] - %(levelname)s: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
-    
+    if log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            "[%(asctime)s] - %(levelname)s: %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S"
+        )
+
     # File handler with rotation (10MB max size, keep 5 backup files)
     file_handler = RotatingFileHandler(
         f"{log_dir}/app.log",
@@ -24,8 +191,8 @@ def setup_logger(log_dir: str = "logs") -> logging.Logger:
         backupCount=5
     )
     file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(log_format)
-    
+    file_handler.setFormatter(formatter)
+
     # Error file handler
     error_handler = RotatingFileHandler(
         f"{log_dir}/error.log",
@@ -33,24 +200,44 @@ def setup_logger(log_dir: str = "logs") -> logging.Logger:
         backupCount=5
     )
     error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(log_format)
-    
+    error_handler.setFormatter(formatter)
+
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(log_format)
+    console_handler.setFormatter(formatter)
     # Add handlers to logger
-    logger.addHandler(file_handler)
-    logger.addHandler(error_handler)
-    logger.addHandler(console_handler)
-    
+    for handler in (file_handler, error_handler, console_handler):
+        handler.addFilter(RequestIdFilter())
+        logger.addHandler(handler)
+
     return logger
 
+
+def get_logger(name: str) -> logging.Logger:
+    """Get a child of the application logger, sampled at its LOG_SAMPLE_RATES rate.
+
+    Args:
+        name (str): The name of the child, e.g. `deck` for `kwiki.deck`.
+
+    Returns:
+        logging.Logger: The logger, whose records go to the application handlers.
+    """
+    child = logging.getLogger(f"{LOGGER_NAME}.{name}")
+    rate = settings.LOG_SAMPLE_RATES.get(name)
+    if rate is not None and not any(isinstance(f, SamplingFilter) for f in child.filters):
+        child.addFilter(SamplingFilter(rate))
+    return child
+
+
 logger = setup_logger()
 
+# Started in the application lifespan
+log_pipeline = LogPipeline(logger)
+
 # Usage example:
 # logger.debug("Debug message")
-# logger.info("Info message")
+# logger.info("Info message: %s", value)
 # logger.warning("Warning message")
 # logger.error("Error message")
-# logger.critical("Critical message")
\ No newline at end of file
+# logger.critical("Critical message")
@@ -0,0 +1,174 @@
+"""Prometheus metrics of the HTTP server, database, LLM and rate limiters
+
+With the PROMETHEUS_MULTIPROC_DIR environment variable set to an empty directory
+before the workers start, every worker process writes its samples to memory-mapped
+files in it and `/metrics` serves the aggregate of all the workers, whichever
+worker handles the scrape. Without it, the metrics are those of the current process.
+"""
+
+import os
+
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+NAMESPACE = "kwiki"
+
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LLM_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served.",
+    ["method"],
+    namespace=NAMESPACE,
+    multiprocess_mode="livesum",
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve an HTTP request, until its response body is sent.",
+    ["method", "route", "status"],
+    namespace=NAMESPACE,
+)
+
+db_query_duration_seconds = Histogram(
+    "db_query_duration_seconds",
+    "Time to execute an SQL statement.",
+    ["operation"],
+    namespace=NAMESPACE,
+    buckets=DB_BUCKETS,
+)
+db_pool_checkout_duration_seconds = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time to check a connection out of the pool, including connecting and pre-ping.",
+    ["pool"],
+    namespace=NAMESPACE,
+    buckets=DB_BUCKETS,
+)
+db_pool_checkout_timeouts = Counter(
+    "db_pool_checkout_timeouts",
+    "Checkouts that gave up waiting for a connection.",
+    ["pool"],
+    namespace=NAMESPACE,
+)
+db_pool_connections_in_use = Gauge(
+    "db_pool_connections_in_use",
+    "Connections checked out of the pools.",
+    ["pool"],
+    namespace=NAMESPACE,
+    multiprocess_mode="livesum",
+)
+
+llm_request_duration_seconds = Histogram(
+    "llm_request_duration_seconds",
+    "Time to receive an LLM completion, until the end of the stream for streamed ones.",
+    ["model", "mode"],
+    namespace=NAMESPACE,
+    buckets=LLM_BUCKETS,
+)
+llm_request_errors = Counter(
+    "llm_request_errors",
+    "LLM completion requests that failed.",
+    ["model", "mode"],
+    namespace=NAMESPACE,
+)
+llm_tokens = Counter(
+    "llm_tokens",
+    "LLM tokens consumed.",
+    ["model", "type"],
+    namespace=NAMESPACE,
+)
+
+generation_jobs_queued = Gauge(
+    "generation_jobs_queued",
+    "Generation jobs pending or running, counted in the database at the last scrape.",
+    ["status"],
+    namespace=NAMESPACE,
+    multiprocess_mode="mostrecent",
+)
+generation_job_attempts = Counter(
+    "generation_job_attempts",
+    "Generation job attempts, by outcome.",
+    ["outcome"],
+    namespace=NAMESPACE,
+)
+generation_job_wait_seconds = Histogram(
+    "generation_job_wait_seconds",
+    "Time a generation job waited in the queue before a worker claimed it.",
+    namespace=NAMESPACE,
+    buckets=JOB_BUCKETS,
+)
+generation_job_run_seconds = Histogram(
+    "generation_job_run_seconds",
+    "Time a worker spent on a generation job attempt.",
+    namespace=NAMESPACE,
+    buckets=JOB_BUCKETS,
+)
+
+cache_lookups = Counter(
+    "cache_lookups",
+    "Cache lookups, by whether they found a live entry.",
+    ["cache", "result"],
+    namespace=NAMESPACE,
+)
+
+single_flight_calls = Counter(
+    "single_flight_calls",
+    "Calls to a coalescer, by whether they ran or joined a call already in flight.",
+    ["flight", "outcome"],
+    namespace=NAMESPACE,
+)
+
+rate_limit_rejections = Counter(
+    "rate_limit_rejections",
+    "Requests rejected by a rate limit or budget.",
+    ["limiter"],
+    namespace=NAMESPACE,
+)
+
+
+def multiprocess_enabled() -> bool:
+    """Whether the metrics are shared between worker processes."""
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render_metrics() -> bytes:
+    """Render the metrics in the Prometheus text exposition format.
+
+    Returns:
+        bytes: The metrics of every worker in multiprocess mode, else of this process.
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead() -> None:
+    """Drop the live gauges of this worker from the multiprocess metrics as it exits."""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def observe_llm_completion(model: str, mode: str, seconds: float, usage) -> None:
+    """Record an LLM completion.
+
+    Args:
+        model (str): The model that served it.
+        mode (str): `completion` or `stream`.
+        seconds (float): How long it took.
+        usage: The `usage` reported with it, or None.
+    """
+    llm_request_duration_seconds.labels(model, mode).observe(seconds)
+    for token_type in ("prompt_tokens", "completion_tokens"):
+        count = getattr(usage, token_type, None)
+        if count:
+            llm_tokens.labels(model, token_type.removesuffix("_tokens")).inc(count)
@@ -0,0 +1,61 @@
+"""Keyset pagination helpers"""
+
+import base64
+import binascii
+import uuid
+from typing import List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def encode_cursor(last_id: str) -> str:
+    """Encode the ID of the last row of a page as an opaque cursor.
+
+    Args:
+        last_id (str): The ID of the last row returned.
+
+    Returns:
+        str: The cursor for the next page.
+    """
+    return base64.urlsafe_b64encode(last_id.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    """Decode a cursor back into the row ID it points after.
+
+    Args:
+        cursor (str): The cursor received from the client.
+
+    Returns:
+        str: The ID of the last row of the previous page.
+
+    Raises:
+        ValueError: If the cursor was not produced by encode_cursor.
+    """
+    try:
+        last_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        uuid.UUID(last_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+    return last_id
+
+
+def paginate(rows: Sequence[T], limit: int, key: str = "id") -> Tuple[List[T], Optional[str]]:
+    """Split the rows of a query run with `limit + 1` into a page and the next cursor.
+
+    Args:
+        rows (Sequence[T]): Up to `limit + 1` rows, as dicts or objects.
+        limit (int): The page size.
+        key (str): The ID field the rows are ordered by.
+
+    Returns:
+        Tuple[List[T], Optional[str]]: The page, and the next cursor or None on the last page.
+    """
+    page = list(rows[:limit])
+    if len(rows) <= limit:
+        return page, None
+
+    last = page[-1]
+    last_id = last[key] if isinstance(last, dict) else getattr(last, key)
+    return page, encode_cursor(last_id)
@@ -1,9 +1,32 @@
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 
-password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.config import settings
+
+# Hashes made with other rounds are upgraded to the current policy on the next login
+password_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+)
 
 def hash_password(password: str) -> str:
     return password_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> str:
     return password_context.verify(plain_password, hashed_password)
+
+def verify_and_update(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """Verify a password, rehashing it if its hash does not match the current policy.
+
+    Args:
+        plain_password (str): The password to check.
+        hashed_password (str): The stored hash.
+
+    Returns:
+        Tuple[bool, Optional[str]]: Whether the password matches, and the new hash to store if it must be replaced.
+    """
+    return password_context.verify_and_update(plain_password, hashed_password)
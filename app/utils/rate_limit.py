@@ -0,0 +1,338 @@
+"""Token bucket rate limiting with buckets shared across workers"""
+
+import math
+import sqlite3
+import threading
+import time
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, status
+from limits.storage import Storage
+
+from app.utils.metrics import rate_limit_rejections
+
+
+def _refill(balance: float, updated_at: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, balance + max(now - updated_at, 0) * rate)
+
+
+class BucketStore:
+    """
+    Base class for token bucket stores.
+    A bucket starts full, refills continuously up to its capacity, and can be
+    overdrawn down to minus its capacity by costs only known after the fact.
+    A negative cost credits tokens back, again up to the capacity.
+    """
+
+    def take(
+        self,
+        key: str,
+        cost: float,
+        capacity: float,
+        refill_rate: float,
+        allow_debt: bool = False,
+    ) -> Tuple[bool, float]:
+        """Atomically refill a bucket and take a cost from it.
+        Args:
+            key (str): The bucket key.
+            cost (float): The tokens to take.
+            capacity (float): The size of the bucket.
+            refill_rate (float): Tokens added per second.
+            allow_debt (bool): Take the cost even if the bucket does not hold it.
+        Returns:
+            Tuple[bool, float]: Whether the cost was taken, and the balance left.
+        """
+        raise NotImplementedError
+
+
+class MemoryBucketStore(BucketStore):
+    """
+    Buckets held in process memory, so every worker counts on its own.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, cost, capacity, refill_rate, allow_debt=False):
+        now = time.time()
+        with self._lock:
+            balance, updated_at = self._buckets.get(key, (capacity, now))
+            balance = _refill(balance, updated_at, now, capacity, refill_rate)
+            allowed = allow_debt or cost <= balance
+            if allowed:
+                balance = min(max(balance - cost, -capacity), capacity)
+            self._buckets[key] = (balance, now)
+            return allowed, balance
+
+
+def _connect_sqlite(path: str) -> sqlite3.Connection:
+    # Autocommit, with transactions opened explicitly by BEGIN IMMEDIATE
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+class SQLiteBucketStore(BucketStore):
+    """
+    Buckets stored in a local SQLite file, shared by every worker process on the host.
+    It stands in for a networked store such as Redis.
+    Attributes:
+        path (str): The path of the SQLite database file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = _connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, balance REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def take(self, key, cost, capacity, refill_rate, allow_debt=False):
+        with self._lock:
+            # Holds the write lock from the read to the write, across processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT balance, updated_at FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                balance, updated_at = row if row is not None else (capacity, now)
+                balance = _refill(balance, updated_at, now, capacity, refill_rate)
+                allowed = allow_debt or cost <= balance
+                if allowed:
+                    balance = min(max(balance - cost, -capacity), capacity)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, balance, updated_at) VALUES (?, ?, ?)",
+                    (key, balance, now),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return allowed, balance
+
+
+class SQLiteCounterStorage(Storage):
+    """
+    Fixed window request counters of the slowapi limiter, stored in the SQLite file
+    of the token buckets, so the request count limits are shared by every worker
+    process on the host like the buckets are.
+
+    Registered with the `limits` package for `sqlite:///<path>` storage URIs.
+    Attributes:
+        path (str): The path of the SQLite database file.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = uri[len("sqlite:///"):]
+        self._conn = _connect_sqlite(self.path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS request_counters ("
+            "key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: float, elastic_expiry: bool = False, amount: int = 1) -> int:
+        with self.lock:
+            # Holds the write lock from the read to the write, across processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT count, expires_at FROM request_counters WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row[1] <= now:
+                    count, expires_at = amount, now + expiry
+                else:
+                    count, expires_at = row[0] + amount, row[1]
+                    if elastic_expiry:
+                        expires_at = now + expiry
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO request_counters (key, count, expires_at) VALUES (?, ?, ?)",
+                    (key, count, expires_at),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return count
+
+    def get(self, key: str) -> int:
+        with self.lock:
+            row = self._conn.execute(
+                "SELECT count FROM request_counters WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row is not None else 0
+
+    def get_expiry(self, key: str) -> float:
+        with self.lock:
+            row = self._conn.execute(
+                "SELECT expires_at FROM request_counters WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row is not None else time.time()
+
+    def check(self) -> bool:
+        with self.lock:
+            self._conn.execute("SELECT 1").fetchone()
+        return True
+
+    def reset(self) -> int:
+        with self.lock:
+            return self._conn.execute("DELETE FROM request_counters").rowcount
+
+    def clear(self, key: str) -> None:
+        with self.lock:
+            self._conn.execute("DELETE FROM request_counters WHERE key = ?", (key,))
+
+
+# Refills and takes in one atomic step, on the clock of the Redis server
+_REDIS_TAKE_SCRIPT = """
+local cost = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local rate = tonumber(ARGV[3])
+local allow_debt = ARGV[4] == "1"
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "balance", "updated_at")
+local balance = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+balance = math.min(capacity, balance + math.max(now - updated_at, 0) * rate)
+local allowed = 0
+if allow_debt or cost <= balance then
+    balance = math.min(math.max(balance - cost, -capacity), capacity)
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "balance", tostring(balance), "updated_at", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(2 * capacity / rate) + 1)
+return {allowed, tostring(balance)}
+"""
+
+
+class RedisBucketStore(BucketStore):
+    """
+    Buckets stored in Redis, or any server speaking its protocol, shared by every worker.
+    Attributes:
+        url (str): The URL of the server, e.g. `redis://localhost:6379/0`.
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise ValueError(
+                "The redis package is required for a redis:// rate limit storage"
+            ) from e
+
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(_REDIS_TAKE_SCRIPT)
+
+    def take(self, key, cost, capacity, refill_rate, allow_debt=False):
+        allowed, balance = self._take(
+            keys=[f"ratelimit:{key}"],
+            args=[cost, capacity, refill_rate, int(allow_debt)],
+        )
+        return bool(int(allowed)), float(balance)
+
+
+def build_bucket_store(url: str = "") -> BucketStore:
+    """Build the token bucket store for a storage URL.
+
+    Args:
+        url (str): Empty for per-worker memory, `sqlite:///<path>` for a file shared
+            by the workers of one host, or `redis://...` for a shared server.
+
+    Returns:
+        BucketStore: The configured store.
+    """
+    if not url:
+        return MemoryBucketStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteBucketStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBucketStore(url)
+    raise ValueError(f"Unsupported rate limit storage URL: {url}")
+
+
+class TokenBucketLimiter:
+    """
+    Rate limiter whose buckets hold tokens of a metered resource rather than requests.
+
+    A request must find `request_cost` tokens in its bucket and reserves them up
+    front. The resource it actually consumed is charged afterwards, less the
+    reservation, so expensive requests drain the bucket faster than cheap ones
+    and requests that consumed nothing get their reservation back.
+    Attributes:
+        store (BucketStore): Where the buckets are kept.
+        capacity (float): The size of each bucket.
+        refill_rate (float): Tokens added to each bucket per second.
+        request_cost (float): Tokens taken when a request starts.
+        name (str): The label of its rejections in the metrics.
+        enabled (bool): Whether limits are enforced.
+    """
+
+    def __init__(
+        self,
+        store: BucketStore,
+        capacity: float,
+        refill_rate: float,
+        request_cost: float,
+        name: str = "token_bucket",
+    ):
+        self.store = store
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.request_cost = request_cost
+        self.name = name
+        self.enabled = True
+
+        self.rejected = 0
+
+    def acquire(self, key: str) -> None:
+        """Take the request cost from a bucket.
+        Args:
+            key (str): The bucket key.
+        Raises:
+            HTTPException: 429 with a Retry-After header if the bucket does not hold the cost.
+        """
+        if not self.enabled:
+            return
+
+        allowed, balance = self.store.take(
+            key, self.request_cost, self.capacity, self.refill_rate
+        )
+        if not allowed:
+            self.rejected += 1
+            rate_limit_rejections.labels(self.name).inc()
+            retry_after = math.ceil((self.request_cost - balance) / self.refill_rate)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded, retry in {retry_after} seconds",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    def charge(self, key: str, tokens: float, reserved: float = 0.0) -> float:
+        """Take the consumed tokens from a bucket, overdrawing it if needed.
+        Args:
+            key (str): The bucket key.
+            tokens (float): The tokens consumed.
+            reserved (float): The tokens already taken by `acquire` for the same
+                request, credited back when they exceed the consumed tokens.
+        Returns:
+            float: The balance left.
+        """
+        if not self.enabled or tokens == reserved:
+            return self.capacity
+        return self.store.take(
+            key, tokens - reserved, self.capacity, self.refill_rate, allow_debt=True
+        )[1]
@@ -0,0 +1,111 @@
+"""In-process index of revoked tokens"""
+
+import threading
+import time
+from typing import Dict
+
+from app.core.config import settings
+from app.utils.bloom import BloomFilter
+
+
+class RevocationIndex:
+    """
+    The IDs of revoked tokens that have not expired yet.
+
+    A Bloom filter answers most lookups, which are for tokens that were never
+    revoked, without touching the exact map; the map settles the filter's
+    positives. The index is loaded from the revoked_tokens table at startup and
+    kept in sync with it by RevocationSync.
+    Attributes:
+        capacity (int): The number of tokens the Bloom filter is sized for; it is resized past that.
+        error_rate (float): The false positive rate of the Bloom filter.
+    """
+
+    def __init__(
+        self,
+        capacity: int = settings.REVOCATION_BLOOM_CAPACITY,
+        error_rate: float = settings.REVOCATION_BLOOM_ERROR_RATE,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._expiries: Dict[str, float] = {}
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.bloom_positives = 0
+
+    def is_revoked(self, token_id: str) -> bool:
+        """Whether a token was revoked.
+        Args:
+            token_id (str): The `jti` of the token.
+        Returns:
+            bool: True if the token must be rejected.
+        """
+        self.lookups += 1
+        if token_id not in self._bloom:
+            return False
+        self.bloom_positives += 1
+        return token_id in self._expiries
+
+    def add(self, token_id: str, expires_at: float) -> None:
+        """Add a revoked token.
+        Args:
+            token_id (str): The `jti` of the token.
+            expires_at (float): The expiry of the token as a Unix timestamp.
+        """
+        with self._lock:
+            if token_id in self._expiries:
+                return
+            self._expiries[token_id] = expires_at
+            if self._bloom.count >= self._bloom.capacity:
+                self._rebuild()
+            else:
+                self._bloom.add(token_id)
+
+    def replace(self, expiries: Dict[str, float]) -> None:
+        """Replace the whole index.
+        Args:
+            expiries (Dict[str, float]): The expiry of each revoked token, by `jti`.
+        """
+        with self._lock:
+            self._expiries = dict(expiries)
+            self._rebuild()
+
+    def prune(self, now: float = None) -> int:
+        """Drop the tokens that expired, which no longer need to be rejected by ID.
+        Args:
+            now (float): The current Unix time.
+        Returns:
+            int: The number of tokens dropped.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [
+                token_id
+                for token_id, expires_at in self._expiries.items()
+                if expires_at <= now
+            ]
+            if not expired:
+                return 0
+            for token_id in expired:
+                del self._expiries[token_id]
+            # A Bloom filter cannot forget items, so it is rebuilt without them
+            self._rebuild()
+            return len(expired)
+
+    def _rebuild(self) -> None:
+        capacity = max(self.capacity, 2 * len(self._expiries))
+        self._bloom = BloomFilter(capacity, self.error_rate, items=self._expiries)
+
+    def stats(self) -> dict:
+        """Return the number of revoked tokens and the lookup counters."""
+        return {
+            "revoked": len(self._expiries),
+            "bloom_capacity": self._bloom.capacity,
+            "lookups": self.lookups,
+            "bloom_positives": self.bloom_positives,
+        }
+
+
+revocation_index = RevocationIndex()
@@ -0,0 +1,131 @@
+"""Coalescing of concurrent identical calls into a single execution"""
+
+import asyncio
+import fcntl
+import hashlib
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.utils.logger import logger
+from app.utils.metrics import single_flight_calls
+
+T = TypeVar("T")
+
+
+class FileLockBackend:
+    """
+    Cross-process lock backend built on advisory file locks.
+    Every uvicorn worker on the host that uses the same directory shares the locks.
+    Attributes:
+        directory (str): The directory holding one lock file per key.
+        timeout (float): Seconds to wait for a lock before running without it.
+        poll_interval (float): Seconds between attempts to take a held lock.
+    """
+
+    def __init__(
+        self, directory: str, timeout: float = 60, poll_interval: float = 0.05
+    ):
+        self.directory = directory
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        os.makedirs(directory, exist_ok=True)
+
+    @asynccontextmanager
+    async def acquire(self, key: str) -> AsyncIterator[bool]:
+        """Hold the lock of a key for the duration of the block.
+
+        Args:
+            key (str): The key to lock.
+
+        Yields:
+            bool: True if the lock is held, False if waiting for it timed out.
+        """
+        digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+        path = os.path.join(self.directory, f"{digest}.lock")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            deadline = time.monotonic() + self.timeout
+            acquired = False
+            while not acquired:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    acquired = True
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        logger.warning("Timed out waiting for lock on key: %s", key)
+                        break
+                    await asyncio.sleep(self.poll_interval)
+
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the same key
+    await the result of the call already in flight instead of starting their own.
+    Attributes:
+        name (str): The name of the coalescer in the metrics.
+        lock_backend (Optional[FileLockBackend]): Lock shared with other processes, held while a call runs.
+        calls (int): Number of calls received.
+        executions (int): Number of calls that actually ran.
+        coalesced (int): Number of calls served by a call already in flight.
+    """
+
+    def __init__(self, name: str, lock_backend: Optional[FileLockBackend] = None):
+        self.name = name
+        self.lock_backend = lock_backend
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run `fn` for a key, or join the run already in flight for it.
+
+        Args:
+            key (str): The key identifying identical calls.
+            fn (Callable[[], Awaitable[T]]): The call to run.
+
+        Returns:
+            T: The result of the call, shared by every caller of the key.
+        """
+        self.calls += 1
+        task = self._in_flight.get(key)
+
+        if task is None:
+            self.executions += 1
+            single_flight_calls.labels(self.name, "executed").inc()
+            task = asyncio.ensure_future(self._run(key, fn))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+            single_flight_calls.labels(self.name, "coalesced").inc()
+            logger.info("Coalesced call for key: %s", key)
+
+        # Shielded so a disconnecting caller does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _run(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        if self.lock_backend is None:
+            return await fn()
+
+        async with self.lock_backend.acquire(key):
+            return await fn()
+
+    def stats(self) -> dict:
+        """Return the call, execution and coalescing counters."""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
@@ -0,0 +1,119 @@
+"""Logging cost on the request path
+
+Replays the records of a deck generation request, a deck and 25 flashcards
+created with a few lines of request logging, once through the original setup (text
+records written to the files and the console by the request thread, the messages
+formatted eagerly) and once through the log pipeline (JSON records handed to the
+listener thread, the flashcard and deck records sampled). Reports the time the
+request thread spends logging per request.
+
+Writes to a temporary directory, with the console redirected to /dev/null:
+
+    python -m benchmarks.bench_logging [REQUESTS] [CARDS]
+"""
+
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+import app.main  # noqa: F401  (resolves the import order of the api package)
+from app.utils.logger import (
+    LOGGER_NAME,
+    LogPipeline,
+    get_logger,
+    request_id,
+    setup_logger,
+)
+
+QUESTION = "What does the Global Interpreter Lock prevent two threads from doing at once?"
+
+
+@contextmanager
+def configured(log_dir: str, log_format: str):
+    logger = logging.getLogger(LOGGER_NAME)
+    saved = logger.handlers
+    logger.handlers = []
+    setup_logger(log_dir, log_format)
+    try:
+        yield logger
+    finally:
+        for handler in logger.handlers:
+            handler.close()
+        logger.handlers = saved
+
+
+def request_before(logger: logging.Logger, cards: int) -> None:
+    deck_id = str(uuid4())
+    logger.info(f"Generating flashcards for topic: {QUESTION[:20]}")
+    logger.info(f"Creating deck with name: {QUESTION[:20]}")
+    logger.info(f"Created deck with ID: {deck_id}")
+    for _ in range(cards):
+        logger.info(f"Created flashcard with ID: {uuid4()} for deck ID: {deck_id} - {QUESTION}")
+    logger.info(f"Saved {cards} flashcards for deck ID: {deck_id}")
+
+
+def request_after(logger: logging.Logger, deck_logger, card_logger, cards: int) -> None:
+    deck_id = str(uuid4())
+    logger.info("Generating flashcards for topic: %s", QUESTION[:20])
+    deck_logger.info("Creating deck with name: %s", QUESTION[:20])
+    deck_logger.info("Created deck with ID: %s", deck_id)
+    for _ in range(cards):
+        card_logger.info("Created flashcard with ID: %s for deck ID: %s", uuid4(), deck_id)
+    logger.info("Saved %s flashcards for deck ID: %s", cards, deck_id)
+
+
+def measure(run, requests: int) -> list:
+    timings = []
+    for _ in range(requests):
+        token = request_id.set(uuid4().hex)
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1e6)
+        request_id.reset(token)
+    return timings
+
+
+def report(name: str, timings: list, extra: str = "") -> None:
+    timings.sort()
+    print(
+        f"{name:<10} {statistics.median(timings):>10.1f} "
+        f"{timings[int(len(timings) * 0.99)]:>10.1f} {statistics.mean(timings):>10.1f} {extra}"
+    )
+
+
+def main(requests: str = "2000", cards: str = "25"):
+    requests, cards = int(requests), int(cards)
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        with tempfile.TemporaryDirectory() as log_dir:
+            with configured(log_dir, "text") as logger:
+                before = measure(lambda: request_before(logger, cards), requests)
+
+            with configured(log_dir, "json") as logger:
+                deck_logger, card_logger = get_logger("deck"), get_logger("flashcard")
+                pipeline = LogPipeline(logger)
+                pipeline.start()
+                after = measure(
+                    lambda: request_after(logger, deck_logger, card_logger, cards), requests
+                )
+                drain_started = time.perf_counter()
+                pipeline.stop()
+                drained = time.perf_counter() - drain_started
+                dropped = pipeline.stats()["dropped"]
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"{requests} requests of {cards + 4} records, {os.cpu_count()} CPUs, µs per request")
+    print(f"{'logging':<10} {'p50':>10} {'p99':>10} {'mean':>10}")
+    report("direct", before)
+    report("pipeline", after, f"(listener drained in {drained * 1000:.0f} ms, {dropped} dropped)")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,128 @@
+"""Login throughput under concurrency
+
+Fires a burst of concurrent logins while another client keeps polling a sync
+endpoint, once with bcrypt running in the shared threadpool (as the sync login
+route did) and once in the password hashing worker processes. Reports logins per
+second and the latency the burst inflicts on the other endpoint.
+
+Runs in-process against a temporary SQLite database:
+
+    python -m benchmarks.bench_login [CONCURRENCY] [WORKERS]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.main import app
+from app.api.models.generation_job import GenerationJob
+from app.api.models.user import User
+from app.api.services import user as user_service
+from app.api.services.password import PasswordHasher
+from app.db.database import Base, get_db
+from app.utils import jwt_helpers
+from app.utils.limiter import limiter
+from app.utils.password_utils import hash_password
+
+PASSWORD = "benchmark-password"
+
+
+def setup_database(path: str) -> dict:
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    with Session() as db:
+        user = User(username=f"bench-{time.time_ns()}", password=hash_password(PASSWORD))
+        db.add(user)
+        db.flush()
+        job = GenerationJob(
+            topic="benchmark",
+            user_id=user.id,
+            status=GenerationJob.PENDING,
+            available_at=datetime.now(timezone.utc),
+        )
+        db.add(job)
+        db.commit()
+        ids = {"username": user.username, "user_id": user.id, "job_id": job.id}
+
+    def override_get_db():
+        with Session() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    return ids
+
+
+async def run_burst(ids: dict, concurrency: int) -> tuple:
+    transport = httpx.ASGITransport(app=app)
+    headers = {
+        "Authorization": f"Bearer {jwt_helpers.create_jwt_token('access', ids['user_id'])}"
+    }
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def login():
+            response = await client.post(
+                "/api/v1/auth/login",
+                json={"username": ids["username"], "password": PASSWORD},
+            )
+            return response.status_code
+
+        done = asyncio.Event()
+        latencies = []
+
+        async def poll():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get(f"/api/v1/decks/jobs/{ids['job_id']}", headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        poller = asyncio.create_task(poll())
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(login() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await poller
+
+    return statuses, elapsed, latencies
+
+
+def main(concurrency: str = "32", workers: str = str(os.cpu_count() or 1)):
+    concurrency, workers = int(concurrency), int(workers)
+    limiter.enabled = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ids = setup_database(os.path.join(tmp, "bench.db"))
+
+        print(f"{concurrency} concurrent logins, {os.cpu_count()} CPUs")
+        print(f"{'hashing':<16} {'ok':>4} {'503':>4} {'logins/s':>9} {'other p50 ms':>13} {'other max ms':>13}")
+        for name, hasher in (
+            ("threadpool", PasswordHasher(workers=0, max_pending=concurrency)),
+            (f"{workers} processes", PasswordHasher(workers=workers, max_pending=concurrency)),
+        ):
+            user_service.password_hasher = hasher
+            hasher.start()
+            try:
+                statuses, elapsed, latencies = asyncio.run(run_burst(ids, concurrency))
+            finally:
+                hasher.stop()
+
+            ok = statuses.count(200)
+            print(
+                f"{name:<16} {ok:>4} {statuses.count(503):>4} {ok / elapsed:>9.1f} "
+                f"{statistics.median(latencies):>13.1f} {max(latencies):>13.1f}"
+            )
+
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
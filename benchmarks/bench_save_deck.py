@@ -0,0 +1,104 @@
+"""Round trips and latency of saving a generated deck
+
+Compares the previous per-card persistence path (deck INSERT, then a deck lookup and
+an INSERT + COMMIT + refresh per card) against the bulk DeckService.save_deck path.
+
+Runs against an in-memory SQLite database, or the database given as an argument:
+
+    python -m benchmarks.bench_save_deck [DATABASE_URL]
+"""
+
+import sys
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.main  # noqa: F401  (resolves the import order of the api package)
+from app.api.models.deck import Deck
+from app.api.models.user import User
+from app.api.repositories.deck import DeckRepository
+from app.api.services.deck import DeckService
+from app.api.services.flashcard import FlashCardService
+from app.api.v1.deck.schemas import DeckModel, Flashcard
+from app.db.database import Base
+
+CARD_COUNTS = [8, 50]
+RUNS = 20
+
+
+class RoundTripCounter:
+    """Counts statements and transaction commands sent to the database"""
+
+    def __init__(self, engine):
+        self.count = 0
+        for name in ("before_cursor_execute", "commit", "rollback"):
+            event.listen(engine, name, self._increment)
+
+    def _increment(self, *args, **kwargs):
+        self.count += 1
+
+
+def save_per_card(db, deck_model: DeckModel, user_id: str) -> Deck:
+    """The persistence path used before bulk inserts"""
+    deck = DeckRepository(db).create(
+        Deck(name=deck_model.name, description=deck_model.description, user_id=user_id)
+    )
+    flashcard_service = FlashCardService(db)
+    for card in deck_model.cards:
+        flashcard_service.create_flashcard(
+            question=card.question,
+            answer=card.answer,
+            explanation=card.explanation,
+            deck_id=deck.id,
+        )
+    return deck
+
+
+def save_bulk(db, deck_model: DeckModel, user_id: str) -> Deck:
+    return DeckService(db).save_deck(deck_model=deck_model, user_id=user_id)
+
+
+def main(database_url: str = "sqlite://"):
+    engine = create_engine(
+        database_url,
+        poolclass=StaticPool if database_url.startswith("sqlite") else None,
+    )
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    counter = RoundTripCounter(engine)
+
+    with Session() as db:
+        user = User(username=f"bench-{time.time_ns()}")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+
+    print(f"{'path':<10} {'cards':>5} {'round trips':>12} {'ms/save':>8}")
+    for card_count in CARD_COUNTS:
+        deck_model = DeckModel(
+            name="Benchmark deck",
+            description="Deck used to benchmark persistence",
+            cards=[
+                Flashcard(question=f"Question {i}", answer="Answer", explanation="Why")
+                for i in range(card_count)
+            ],
+        )
+
+        for name, save in (("per-card", save_per_card), ("bulk", save_bulk)):
+            with Session() as db:
+                counter.count = 0
+                save(db, deck_model, user_id)
+                round_trips = counter.count
+
+                started = time.perf_counter()
+                for _ in range(RUNS):
+                    save(db, deck_model, user_id)
+                elapsed_ms = (time.perf_counter() - started) * 1000 / RUNS
+
+            print(f"{name:<10} {card_count:>5} {round_trips:>12} {elapsed_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,103 @@
+"""Deck response serialization
+
+Serializes a deck and its cards to the body of GET /decks/{deck_id} three ways:
+the previous path (`Deck.to_dict()` wrapped in GetDeckResponse, validated again
+against the `response_model` by FastAPI and encoded with the stdlib), pydantic
+`from_attributes` validation with its own JSON encoder, and the prebuilt
+schema serializer with orjson that the deck routes return. Reports µs per
+response for decks of 10, 100 and 5,000 cards.
+
+Runs in-process on transient ORM rows, without a database:
+
+    python -m benchmarks.bench_serialize_deck [SIZES]
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+from app.main import app
+from app.api.models import Deck, Flashcard
+from app.api.v1.deck.schemas import GetDeckResponse
+
+ROUTE = next(
+    route
+    for route in app.routes
+    if getattr(route, "path", None) == "/api/v1/decks/{deck_id}" and "GET" in route.methods
+)
+
+
+def build_deck(cards: int) -> Deck:
+    deck = Deck(id="0" * 36, name="Concurrency", description="Threads and the GIL", user_id="1" * 36)
+    deck.cards = [
+        Flashcard(
+            id=f"{n:036d}",
+            question="What does the Global Interpreter Lock prevent two threads from doing at once?",
+            answer="Executing Python bytecode in parallel",
+            explanation="Only the thread holding the GIL runs bytecode, so CPU bound threads take turns.",
+            deck_id=deck.id,
+        )
+        for n in range(cards)
+    ]
+    return deck
+
+
+async def previous(deck: Deck) -> bytes:
+    content = GetDeckResponse(status_code=200, message="Deck retrieved successfully", data=deck.to_dict())
+    content = await serialize_response(
+        field=ROUTE.response_field, response_content=content, is_coroutine=True
+    )
+    return JSONResponse(content).body
+
+
+async def from_attributes(deck: Deck) -> bytes:
+    model = GetDeckResponse.model_validate(
+        {"status_code": 200, "message": "Deck retrieved successfully", "data": deck},
+        from_attributes=True,
+    )
+    return model.model_dump_json().encode()
+
+
+async def serializer(deck: Deck) -> bytes:
+    return GetDeckResponse.json_response(
+        status_code=200, message="Deck retrieved successfully", data=deck
+    ).body
+
+
+async def measure(run, deck: Deck, repeat: int) -> float:
+    timings = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            await run(deck)
+        timings.append((time.perf_counter() - started) / repeat * 1e6)
+    return statistics.median(timings)
+
+
+async def run_sizes(sizes: str) -> None:
+    paths = (previous, from_attributes, serializer)
+    print(f"{'cards':>6} " + " ".join(f"{path.__name__:>16}" for path in paths) + f" {'speedup':>8}  (µs per response)")
+    for cards in map(int, sizes.split(",")):
+        deck = build_deck(cards)
+        bodies = [json.loads(await path(deck)) for path in paths]
+        assert all(body == bodies[0] for body in bodies), "the paths disagree"
+
+        repeat = max(3, 20_000 // max(cards, 1))
+        timings = [await measure(path, deck, repeat) for path in paths]
+        print(
+            f"{cards:>6} " + " ".join(f"{timing:>16.1f}" for timing in timings)
+            + f" {timings[0] / timings[-1]:>7.1f}x"
+        )
+
+
+def main(sizes: str = "10,100,5000"):
+    asyncio.run(run_sizes(sizes))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+import pytest
+
+# The logger is set up on import; keep the test run's logs out of the repository
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="kwiki-test-logs-"))
+
+from app.db import query_stats  # noqa: E402
+
+
+@pytest.fixture
+def assert_max_queries():
+    """Context manager failing the test if its block exceeds a query budget.
+
+    Usage:
+        with assert_max_queries(2):
+            client.get("/api/v1/decks", headers=headers)
+    """
+    return query_stats.assert_max_queries
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+from prometheus_client import REGISTRY
+
+from app.utils.cache import LRUCache, SQLiteCache, TieredCache, build_cache
+
+
+def _sample(**labels) -> float:
+    return REGISTRY.get_sample_value("kwiki_cache_lookups_total", labels) or 0.0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 1}
+
+
+def test_lru_expires_entries():
+    cache = LRUCache(max_size=2, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+
+
+def test_tiered_cache_fills_local_tier_from_shared_tier(tmp_path):
+    shared = SQLiteCache(path=str(tmp_path / "cache.db"), max_size=10)
+    shared.set("deck", {"name": "Photosynthesis"})
+    cache = TieredCache(local=LRUCache(max_size=10), shared=shared)
+
+    assert cache.get("deck") == {"name": "Photosynthesis"}
+    assert cache.local.get("deck") == {"name": "Photosynthesis"}
+    assert cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_async_lookups_query_the_shared_tier_off_the_event_loop(tmp_path):
+    shared = SQLiteCache(path=str(tmp_path / "cache.db"), max_size=10)
+    cache = TieredCache(local=LRUCache(max_size=10), shared=shared)
+    threads = []
+    get_with_ttl = shared.get_with_ttl
+
+    def recording_get_with_ttl(key):
+        threads.append(threading.get_ident())
+        return get_with_ttl(key)
+
+    shared.get_with_ttl = recording_get_with_ttl
+
+    async def set_and_get():
+        await cache.aset("deck", {"name": "Photosynthesis"})
+        cache.local.clear()
+        return await cache.aget("deck"), await cache.aget("deck")
+
+    assert asyncio.run(set_and_get()) == ({"name": "Photosynthesis"},) * 2
+    # The second lookup is served by the local tier
+    assert len(threads) == 1 and threads[0] != threading.get_ident()
+
+
+
+def test_local_copy_expires_with_the_shared_entry(tmp_path):
+    shared = SQLiteCache(path=str(tmp_path / "cache.db"), max_size=10, ttl=3600)
+    shared.set("user", {"id": "u1"}, ttl=0.05)
+    cache = TieredCache(local=LRUCache(max_size=10, ttl=3600), shared=shared)
+
+    assert cache.get("user") == {"id": "u1"}
+    assert cache.local.get_with_ttl("user")[1] <= 0.05
+    time.sleep(0.06)
+    assert cache.get("user") is None
+
+
+def test_named_caches_export_lookups_once_across_tiers(tmp_path):
+    cache = build_cache(
+        max_size=10, shared_url=f"sqlite:///{tmp_path / 'cache.db'}", name="test"
+    )
+    hits, misses = _sample(cache="test", result="hit"), _sample(cache="test", result="miss")
+
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+
+    assert _sample(cache="test", result="hit") == hits + 1
+    assert _sample(cache="test", result="miss") == misses + 1
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, func, insert, select, update
+from sqlalchemy.orm import sessionmaker
+
+import app.main  # noqa: F401  (resolves the import order of the api package)
+from app.api.models import Deck, GenerationJob, User
+from app.api.services import generation_job
+from app.api.services.generation_job import GenerationJobService, GenerationWorkerPool
+from app.api.v1.deck.schemas import DeckModel, Flashcard as FlashcardModel
+from app.core.config import settings
+from app.db.database import Base
+
+USER_ID = "user-1"
+GENERATED_DECK = DeckModel(
+    name="Generated",
+    description="A generated deck",
+    cards=[FlashcardModel(question=f"q{n}", answer="a", explanation="e") for n in range(3)],
+)
+
+
+class FakeLLMService:
+    async def generate_deck_from_topic(self, topic: str, usage=None) -> DeckModel:
+        return GENERATED_DECK
+
+
+class FailingLLMService:
+    async def generate_deck_from_topic(self, topic: str, usage=None) -> DeckModel:
+        raise RuntimeError("model unavailable")
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": USER_ID, "username": "jobs"}])
+
+    async def charge_llm_usage(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(generation_job, "charge_llm_usage", charge_llm_usage)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _claimed_job(pool: GenerationWorkerPool) -> dict:
+    pool._call("enqueue", "topic", USER_ID)
+    return pool._claim()
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(f"kwiki_{name}", labels) or 0.0
+
+
+def _state(session_factory, job_id: str) -> tuple[str, int]:
+    with session_factory() as db:
+        job = db.get(GenerationJob, job_id)
+        decks = db.scalar(select(func.count()).select_from(Deck))
+        return job.status, decks
+
+
+def test_cancelling_during_completion_keeps_the_saved_deck(session_factory, monkeypatch):
+    pool = GenerationWorkerPool(
+        session_factory=session_factory, llm_service_factory=FakeLLMService
+    )
+    job = _claimed_job(pool)
+    saving, unblocked = threading.Event(), threading.Event()
+    complete_job = GenerationJobService.complete_job
+
+    def slow_complete_job(self, *args):
+        saving.set()
+        unblocked.wait(5)
+        return complete_job(self, *args)
+
+    monkeypatch.setattr(GenerationJobService, "complete_job", slow_complete_job)
+
+    async def cancel_while_saving():
+        task = asyncio.create_task(pool._process(job))
+        while not saving.is_set():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        unblocked.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_while_saving())
+
+    assert _state(session_factory, job["id"]) == (GenerationJob.SUCCEEDED, 1)
+    assert pool.completed == 1
+
+
+def test_a_job_that_is_no_longer_running_is_neither_completed_nor_released(session_factory):
+    pool = GenerationWorkerPool(session_factory=session_factory)
+    job = _claimed_job(pool)
+
+    assert pool._call("release_job", job["id"])
+    assert pool._call("complete_job", job["id"], USER_ID, GENERATED_DECK) is None
+    assert not pool._call("release_job", job["id"])
+    assert _state(session_factory, job["id"]) == (GenerationJob.PENDING, 0)
+
+
+def test_failed_attempts_are_retried_and_exported(session_factory):
+    pool = GenerationWorkerPool(
+        session_factory=session_factory, llm_service_factory=FailingLLMService
+    )
+    retried = _sample("generation_job_attempts_total", outcome="retried")
+    runs = _sample("generation_job_run_seconds_count")
+    job = _claimed_job(pool)
+
+    asyncio.run(pool._process(job))
+
+    with session_factory() as db:
+        assert db.get(GenerationJob, job["id"]).error == "model unavailable"
+    assert pool.stats()[GenerationJob.PENDING] == 1
+    assert _sample("generation_jobs_queued", status=GenerationJob.PENDING) == 1
+    assert _sample("generation_job_attempts_total", outcome="retried") == retried + 1
+    assert _sample("generation_job_run_seconds_count") == runs + 1
+
+
+def test_stale_jobs_are_swept_periodically_until_out_of_attempts(session_factory, monkeypatch):
+    pool = GenerationWorkerPool(session_factory=session_factory, sweep_interval=60)
+    retrying, exhausted = _claimed_job(pool), _claimed_job(pool)
+    with session_factory() as db:
+        db.execute(
+            update(GenerationJob).values(
+                started_at=datetime.now(timezone.utc) - timedelta(seconds=settings.JOB_TIMEOUT + 1)
+            )
+        )
+        db.execute(
+            update(GenerationJob)
+            .where(GenerationJob.id == exhausted["id"])
+            .values(attempts=settings.JOB_MAX_ATTEMPTS)
+        )
+        db.commit()
+    settled = []
+
+    async def charge_llm_usage(user_id, topic, usage, settle_reservation=True):
+        settled.append((user_id, usage.total_tokens, settle_reservation))
+
+    monkeypatch.setattr(generation_job, "charge_llm_usage", charge_llm_usage)
+
+    asyncio.run(pool._sweep_stale_jobs())
+
+    assert _state(session_factory, retrying["id"]) == (GenerationJob.PENDING, 0)
+    assert _state(session_factory, exhausted["id"]) == (GenerationJob.FAILED, 0)
+    assert settled == [(USER_ID, 0, True)]
+    assert pool.failed == 1
+    # The next sweep is due one interval later, run by whichever worker polls first
+    assert pool._next_sweep > generation_job.time.monotonic() + 59
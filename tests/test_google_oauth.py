@@ -0,0 +1,112 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from authlib.integrations.starlette_client import OAuth
+
+from app.utils.google_oauth import ProviderMetadataCache
+
+
+class DiscoveryServer:
+    """Local stand-in for the discovery and JWKS endpoints of an OpenID provider."""
+
+    def __init__(self):
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.path)
+                documents = {
+                    "/.well-known/openid-configuration": {
+                        "issuer": "https://accounts.example.com",
+                        "jwks_uri": f"{server.url}/jwks",
+                        "id_token_signing_alg_values_supported": ["RS256"],
+                    },
+                    "/jwks": {"keys": [{"kty": "RSA", "kid": "test", "n": "AQAB", "e": "AQAB"}]},
+                }
+                body = json.dumps(documents.get(self.path, {})).encode()
+                self.send_response(200 if self.path in documents else 404)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self.metadata_url = f"{self.url}/.well-known/openid-configuration"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def discovery_server():
+    server = DiscoveryServer()
+    yield server
+    server.stop()
+
+
+def _client(metadata_url: str):
+    oauth = OAuth()
+    oauth.register(
+        name="provider",
+        client_id="client",
+        client_secret="secret",
+        server_metadata_url=metadata_url,
+    )
+    return oauth.provider
+
+
+def test_metadata_is_loaded_before_requests_need_it(discovery_server, tmp_path):
+    client = _client(discovery_server.metadata_url)
+    cache = ProviderMetadataCache(
+        client, discovery_server.metadata_url, str(tmp_path / "openid.json")
+    )
+
+    async def main():
+        assert await cache.refresh()
+        fetched = len(discovery_server.requests)
+        await client.load_server_metadata()
+        jwks = await client.fetch_jwk_set()
+        return fetched, jwks
+
+    fetched, jwks = asyncio.run(main())
+
+    assert fetched == 2
+    assert len(discovery_server.requests) == 2
+    assert jwks["keys"][0]["kid"] == "test"
+
+
+def test_workers_share_the_cache_file(discovery_server, tmp_path):
+    cache_file = str(tmp_path / "openid.json")
+    first = ProviderMetadataCache(
+        _client(discovery_server.metadata_url), discovery_server.metadata_url, cache_file
+    )
+    second_client = _client(discovery_server.metadata_url)
+    second = ProviderMetadataCache(second_client, discovery_server.metadata_url, cache_file)
+
+    asyncio.run(first.refresh())
+    asyncio.run(second.refresh())
+
+    assert len(discovery_server.requests) == 2
+    assert second_client.server_metadata["issuer"] == "https://accounts.example.com"
+
+
+def test_expired_metadata_is_kept_when_refresh_fails(discovery_server, tmp_path):
+    client = _client(discovery_server.metadata_url)
+    cache = ProviderMetadataCache(
+        client, discovery_server.metadata_url, str(tmp_path / "openid.json"), ttl=0
+    )
+    asyncio.run(cache.refresh())
+    discovery_server.stop()
+
+    assert not asyncio.run(cache.refresh())
+    assert cache.stats()["failures"] == 1
+    assert client.server_metadata["jwks"]["keys"]
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from app.utils.json_stream import DeckStreamParser
+
+DECK = {
+    "name": 'Deck "with" {braces}',
+    "description": "A deck",
+    "cards": [
+        {"question": f"Question {i}]}}", "answer": "Answer", "explanation": "Why"}
+        for i in range(3)
+    ],
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 1000])
+def test_emits_fields_and_cards_in_order(chunk_size):
+    document = "preamble " + json.dumps(DECK, indent=2)
+    parser = DeckStreamParser()
+    events = []
+    for i in range(0, len(document), chunk_size):
+        events += parser.feed(document[i : i + chunk_size])
+    parser.close()
+
+    assert events == [
+        ("field", ("name", DECK["name"])),
+        ("field", ("description", DECK["description"])),
+    ] + [("card", card) for card in DECK["cards"]]
+
+
+def test_card_is_emitted_before_document_ends():
+    document = json.dumps(DECK)
+    first_card_end = document.index('"Why"}') + len('"Why"}')
+    parser = DeckStreamParser()
+
+    events = parser.feed(document[:first_card_end])
+
+    assert events[-1] == ("card", DECK["cards"][0])
+    assert not parser.done
+
+
+def test_truncated_document_is_rejected():
+    parser = DeckStreamParser()
+    parser.feed(json.dumps(DECK)[:-5])
+
+    with pytest.raises(ValueError):
+        parser.close()
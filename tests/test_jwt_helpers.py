@@ -0,0 +1,73 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from app.core.config import settings
+from app.utils import jwt_helpers
+
+credentials_exception = HTTPException(status_code=401)
+
+
+@pytest.fixture(autouse=True)
+def empty_token_cache():
+    jwt_helpers.token_cache.clear()
+
+
+def test_refresh_token_is_not_an_access_token():
+    refresh_token = jwt_helpers.create_jwt_token("refresh", "u1")
+
+    with pytest.raises(HTTPException):
+        jwt_helpers.verify_jwt_token(refresh_token, credentials_exception)
+    assert (
+        jwt_helpers.verify_jwt_token(
+            refresh_token, credentials_exception, token_type="refresh"
+        )
+        == "u1"
+    )
+
+
+def test_access_token_is_not_a_refresh_token():
+    access_token = jwt_helpers.create_jwt_token("access", "u1")
+
+    with pytest.raises(HTTPException):
+        jwt_helpers.verify_jwt_token(
+            access_token, credentials_exception, token_type="refresh"
+        )
+
+
+def test_verified_token_is_decoded_once(monkeypatch):
+    access_token = jwt_helpers.create_jwt_token("access", "u1")
+    hits = jwt_helpers.token_cache.hits
+    decode_calls = []
+    decode = jwt.decode
+    monkeypatch.setattr(
+        jwt, "decode", lambda *args, **kwargs: decode_calls.append(1) or decode(*args, **kwargs)
+    )
+
+    for _ in range(3):
+        assert jwt_helpers.verify_jwt_token(access_token, credentials_exception) == "u1"
+
+    assert len(decode_calls) == 1
+    assert jwt_helpers.token_cache.hits - hits == 2
+
+
+def test_cached_token_expires_with_the_token():
+    token = jwt.encode(
+        {"user_id": "u1", "type": "access", "exp": int(time.time()) + 1},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+    assert jwt_helpers.verify_jwt_token(token, credentials_exception) == "u1"
+
+    # jose compares expiry in whole seconds
+    time.sleep(2.1)
+    with pytest.raises(HTTPException):
+        jwt_helpers.verify_jwt_token(token, credentials_exception)
+
+
+def test_invalid_token_is_not_cached():
+    with pytest.raises(HTTPException):
+        jwt_helpers.verify_jwt_token("not-a-token", credentials_exception)
+    assert len(jwt_helpers.token_cache) == 0
@@ -0,0 +1,134 @@
+import json
+import logging
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.main  # noqa: F401  (resolves the import order of the api package)
+from app.core.middleware.request_id import RequestIdMiddleware
+from app.utils.logger import (
+    JsonFormatter,
+    LogPipeline,
+    RequestIdFilter,
+    SamplingFilter,
+    request_id,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, unblocked: threading.Event = None):
+        super().__init__()
+        self.records = []
+        self.unblocked = unblocked
+
+    def emit(self, record):
+        if self.unblocked is not None:
+            self.unblocked.wait(5)
+        self.records.append(record)
+
+
+def _logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f"test_logger.{name}")
+    logger.handlers = [handler]
+    logger.filters = []
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def _record(message: str, *args, level: int = logging.INFO, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("kwiki", level, __file__, 1, message, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_records_carry_request_id_and_extras():
+    token = request_id.set("req-1")
+    try:
+        record = _record("Deck %s created", "d1", deck_id="d1")
+        RequestIdFilter().filter(record)
+    finally:
+        request_id.reset(token)
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "Deck d1 created"
+    assert entry["level"] == "INFO"
+    assert entry["request_id"] == "req-1"
+    assert entry["deck_id"] == "d1"
+
+
+def test_sampling_keeps_warnings_and_whole_requests():
+    sampler = SamplingFilter(0.5)
+
+    assert SamplingFilter(0).filter(_record("failed", level=logging.WARNING))
+    assert not SamplingFilter(0).filter(_record("created"))
+
+    kept = 0
+    for n in range(200):
+        token = request_id.set(f"req-{n}")
+        try:
+            decisions = {sampler.filter(_record("created")) for _ in range(5)}
+        finally:
+            request_id.reset(token)
+        assert len(decisions) == 1
+        kept += decisions.pop()
+    assert 50 < kept < 150
+
+
+def test_pipeline_writes_records_on_listener_thread():
+    handler = ListHandler()
+    logger = _logger("pipeline", handler)
+    pipeline = LogPipeline(logger, queue_size=100)
+
+    pipeline.start()
+    token = request_id.set("req-2")
+    try:
+        logger.info("Card %s of %s", 1, "d1")
+    finally:
+        request_id.reset(token)
+    pipeline.stop()
+
+    assert logger.handlers == [handler]
+    [record] = handler.records
+    assert record.getMessage() == "Card 1 of d1"
+    assert record.request_id == "req-2"
+
+
+def test_pipeline_drops_records_when_queue_is_full():
+    release = threading.Event()
+    handler = ListHandler(release)
+    logger = _logger("full", handler)
+    pipeline = LogPipeline(logger, queue_size=2)
+
+    pipeline.start()
+    for n in range(10):
+        logger.info("record %s", n)
+    dropped = pipeline.stats()["dropped"]
+    release.set()
+    pipeline.stop()
+
+    assert dropped > 0
+    assert len(handler.records) == 10 - dropped
+
+
+def test_request_id_header_is_returned_and_logged():
+    seen = []
+    api = FastAPI()
+    api.add_middleware(RequestIdMiddleware)
+
+    @api.get("/ping")
+    def ping():
+        seen.append(request_id.get())
+        return {}
+
+    client = TestClient(api)
+    given = client.get("/ping", headers={"X-Request-ID": "abc-123"})
+    generated = client.get("/ping")
+    invalid = client.get("/ping", headers={"X-Request-ID": "bad id\n"})
+
+    assert given.headers["X-Request-ID"] == "abc-123"
+    assert len(generated.headers["X-Request-ID"]) == 32
+    assert invalid.headers["X-Request-ID"] != "bad id\n"
+    assert seen[:2] == ["abc-123", generated.headers["X-Request-ID"]]
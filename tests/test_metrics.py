@@ -0,0 +1,132 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.main import app
+from app.core.config import settings
+from app.db.pool import InstrumentedQueuePool, engine_options
+from app.utils.metrics import observe_llm_completion
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(f"kwiki_{name}", labels) or 0.0
+
+
+TOKEN = "internal-token"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", TOKEN)
+    yield TestClient(app)
+
+
+def test_requests_are_timed_per_route_template(client):
+    before = _sample(
+        "http_request_duration_seconds_count", method="GET", route="/probe", status="200"
+    )
+
+    client.get("/probe")
+    client.get("/does-not-exist")
+    response = client.get("/metrics", headers={"Authorization": f"Bearer {TOKEN}"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        _sample(
+            "http_request_duration_seconds_count",
+            method="GET",
+            route="/probe",
+            status="200",
+        )
+        == before + 1
+    )
+    assert 'route="unmatched",status="404"' in response.text
+    assert _sample("http_requests_in_progress", method="GET") == 0
+
+
+def test_internal_endpoints_require_the_internal_token(client, monkeypatch):
+    for path in ("/metrics", "/probe/pool", "/probe/queries"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert (
+            client.get(path, headers={"Authorization": f"Bearer {TOKEN}"}).status_code
+            == 200
+        )
+
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", "")
+    assert client.get("/metrics", headers={"Authorization": "Bearer "}).status_code == 404
+
+
+def test_llm_completions_count_latency_and_tokens():
+    before = _sample("llm_tokens_total", model="m", type="completion")
+    usage = type("Usage", (), {"prompt_tokens": 10, "completion_tokens": 30})()
+
+    observe_llm_completion("m", "completion", 1.5, usage)
+    observe_llm_completion("m", "stream", 2.0, None)
+
+    assert _sample("llm_tokens_total", model="m", type="completion") == before + 30
+    assert _sample("llm_request_duration_seconds_count", model="m", mode="stream") >= 1
+
+
+def test_statements_and_checkouts_are_timed():
+    engine = create_engine("sqlite://", poolclass=InstrumentedQueuePool)
+    selects = _sample("db_query_duration_seconds_count", operation="SELECT")
+    checkouts = _sample("db_pool_checkout_duration_seconds_count", pool="sync")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert _sample("db_pool_connections_in_use", pool="sync") >= 1
+
+    assert _sample("db_query_duration_seconds_count", operation="SELECT") == selects + 1
+    assert _sample("db_pool_checkout_duration_seconds_count", pool="sync") == checkouts + 1
+    engine.dispose()
+
+
+def test_pgbouncer_pools_are_labelled_by_their_engine(monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_PGBOUNCER", True)
+    options = {**engine_options(is_async=True), "connect_args": {}}
+    engine = create_async_engine("sqlite+aiosqlite://", **options)
+    checkouts = _sample("db_pool_checkout_duration_seconds_count", pool="async")
+
+    async def select_one():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        await engine.dispose()
+
+    asyncio.run(select_one())
+
+    assert engine.pool.metrics_label == "async"
+    assert _sample("db_pool_checkout_duration_seconds_count", pool="async") == checkouts + 1
+
+
+def test_metrics_aggregate_across_processes(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    record = (
+        "from app.utils.metrics import rate_limit_rejections;"
+        "rate_limit_rejections.labels('requests').inc(2)"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", record], env=env, check=True)
+
+    rendered = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys; from app.utils.metrics import render_metrics;"
+            "sys.stdout.write(render_metrics().decode())",
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+    assert 'kwiki_rate_limit_rejections_total{limiter="requests"} 4.0' in rendered
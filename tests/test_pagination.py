@@ -0,0 +1,24 @@
+import pytest
+from uuid_extensions import uuid7
+
+from app.utils.pagination import decode_cursor, encode_cursor, paginate
+
+
+def test_paginate_returns_cursor_of_last_row_when_more_rows_exist():
+    rows = [{"id": str(uuid7())} for _ in range(3)]
+
+    page, cursor = paginate(rows, limit=2)
+
+    assert page == rows[:2]
+    assert decode_cursor(cursor) == rows[1]["id"]
+
+
+def test_paginate_last_page_has_no_cursor():
+    rows = [{"id": str(uuid7())} for _ in range(2)]
+
+    assert paginate(rows, limit=2) == (rows, None)
+
+
+def test_decode_cursor_rejects_tampered_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("not-an-id"))
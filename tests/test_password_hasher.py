@@ -0,0 +1,49 @@
+import asyncio
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.api.services.password import PasswordHasher
+
+
+def test_hashes_and_verifies_in_worker_processes():
+    async def main():
+        hasher = PasswordHasher(workers=1)
+        hasher.start()
+        try:
+            hashed = await hasher.hash("secret")
+            return hashed, await hasher.verify_and_update("secret", hashed)
+        finally:
+            hasher.stop()
+
+    hashed, (valid, new_hash) = asyncio.run(main())
+
+    assert hashed.startswith("$2b$")
+    assert valid and new_hash is None
+
+
+def test_outdated_hash_is_rehashed():
+    outdated = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+    hasher = PasswordHasher(workers=0)
+
+    valid, new_hash = asyncio.run(hasher.verify_and_update("secret", outdated))
+
+    assert valid
+    assert new_hash is not None and new_hash != outdated
+    assert hasher.stats()["rehashed"] == 1
+
+
+def test_full_queue_is_refused():
+    hasher = PasswordHasher(workers=0, max_pending=2)
+
+    async def main():
+        return await asyncio.gather(
+            *(hasher.hash("secret") for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+
+    refused = [result for result in results if isinstance(result, HTTPException)]
+    assert len(refused) == 1
+    assert refused[0].status_code == 503
+    assert hasher.stats()["rejected"] == 1
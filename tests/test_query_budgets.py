@@ -0,0 +1,408 @@
+"""Query budgets of the API endpoints
+
+Every endpoint runs against a SQLite database with enough rows to expose an
+N+1 pattern, and fails if it executes more statements than its budget. Raise
+a budget only together with the change that needs the extra query.
+"""
+
+import inspect
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.responses import RedirectResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from uuid_extensions import uuid7
+
+from app.main import app
+from app.api.models import Deck, Flashcard, GenerationJob, User
+from app.api.services.llm import get_async_llm_service
+from app.api.services.usage import usage_ledger
+from app.api.services.user import UserService, user_cache
+from app.api.v1.auth import routes as auth_routes
+from app.api.v1.deck import routes as deck_routes
+from app.api.v1.deck.schemas import DeckModel, Flashcard as FlashcardModel
+from app.db.database import (
+    Base,
+    get_async_db,
+    get_async_read_db,
+    get_db,
+    get_read_db,
+    get_request_db,
+)
+from app.core.config import settings
+from app.utils import jwt_helpers
+from app.utils.limiter import limiter, llm_limiter
+from app.utils.password_utils import hash_password
+from app.utils.rate_limit import MemoryBucketStore
+
+CARDS = 25
+PASSWORD = "password"
+
+GENERATED_DECK = DeckModel(
+    name="Generated",
+    description="A generated deck",
+    cards=[
+        FlashcardModel(question=f"q{n}", answer="a", explanation="e")
+        for n in range(CARDS)
+    ],
+)
+
+
+class FakeLLMService:
+    async def generate_deck_from_topic(self, topic: str, usage=None) -> DeckModel:
+        return GENERATED_DECK
+
+    async def stream_deck_from_topic(self, topic: str, usage=None):
+        yield "field", ("name", GENERATED_DECK.name)
+        yield "field", ("description", GENERATED_DECK.description)
+        for card in GENERATED_DECK.cards:
+            yield "card", card
+
+
+def _new_id() -> str:
+    return str(uuid7())
+
+
+@pytest.fixture(scope="module")
+def database(tmp_path_factory):
+    path = tmp_path_factory.mktemp("budgets") / "kwiki.db"
+    engine = create_engine(f"sqlite:///{path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    Base.metadata.create_all(engine)
+
+    user = {"id": _new_id(), "username": "budget", "password": hash_password(PASSWORD)}
+    decks = [
+        {"id": _new_id(), "name": f"deck{n}", "description": "", "user_id": user["id"]}
+        for n in range(CARDS)
+    ]
+    cards = [
+        {
+            "id": _new_id(),
+            "question": f"q{n}",
+            "answer": "a",
+            "explanation": "e",
+            "deck_id": deck["id"],
+        }
+        for deck in decks
+        for n in range(CARDS)
+    ]
+    job = {
+        "id": _new_id(),
+        "topic": "topic",
+        "user_id": user["id"],
+        "status": GenerationJob.SUCCEEDED,
+        "attempts": 1,
+        "deck_id": decks[0]["id"],
+        "available_at": datetime.now(timezone.utc),
+    }
+    with engine.begin() as conn:
+        conn.execute(insert(User), [user])
+        conn.execute(insert(Deck), decks)
+        conn.execute(insert(Flashcard), cards)
+        conn.execute(insert(GenerationJob), [job])
+
+    yield {
+        "engine": engine,
+        "async_engine": async_engine,
+        "user_id": user["id"],
+        "username": user["username"],
+        "deck_ids": [deck["id"] for deck in decks],
+        "job_id": job["id"],
+    }
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def client(database):
+    SessionLocal = sessionmaker(bind=database["engine"])
+    AsyncSessionLocal = async_sessionmaker(
+        bind=database["async_engine"], expire_on_commit=False
+    )
+
+    def override_get_db():
+        with SessionLocal() as db:
+            yield db
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides = {
+        get_db: override_get_db,
+        get_request_db: override_get_db,
+        get_read_db: override_get_db,
+        get_async_db: override_get_async_db,
+        get_async_read_db: override_get_async_db,
+        get_async_llm_service: FakeLLMService,
+    }
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setattr(deck_routes, "SessionLocal", SessionLocal)
+    monkeypatch.setattr(limiter, "enabled", False)
+    monkeypatch.setattr(llm_limiter, "enabled", False)
+    monkeypatch.setattr(usage_ledger, "daily_budget", 0)
+    monkeypatch.setattr(usage_ledger, "monthly_budget", 0)
+
+    yield TestClient(app)
+
+    monkeypatch.undo()
+    app.dependency_overrides = {}
+
+
+@pytest.fixture(autouse=True)
+def cold_user_cache():
+    # Budgets are for a user who is not cached yet
+    user_cache.clear()
+
+
+@pytest.fixture
+def headers(database) -> dict:
+    token = jwt_helpers.create_jwt_token("access", database["user_id"])
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_register_budget(client, assert_max_queries):
+    with assert_max_queries(2):
+        response = client.post(
+            "/api/v1/auth/register", json={"username": "new", "password": PASSWORD}
+        )
+    assert response.status_code == 201
+
+
+def test_login_budget(client, database, assert_max_queries):
+    with assert_max_queries(1):
+        response = client.post(
+            "/api/v1/auth/login",
+            json={"username": database["username"], "password": PASSWORD},
+        )
+    assert response.status_code == 200
+
+
+def test_refresh_budget(client, database, assert_max_queries):
+    refresh_token = jwt_helpers.create_jwt_token("refresh", database["user_id"])
+    with assert_max_queries(1):
+        response = client.post(
+            "/api/v1/auth/token/refresh", json={"refresh_token": refresh_token}
+        )
+    assert response.status_code == 200
+
+
+def test_logout_budget(client, database, headers, assert_max_queries):
+    refresh_token = jwt_helpers.create_jwt_token("refresh", database["user_id"])
+    access_token = jwt_helpers.create_jwt_token("access", database["user_id"])
+    with assert_max_queries(2):
+        response = client.post(
+            "/api/v1/auth/logout",
+            json={"refresh_token": refresh_token},
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+    assert response.status_code == 200
+
+
+def test_google_login_budget(client, monkeypatch, assert_max_queries):
+    async def authorize_redirect(request, redirect_uri):
+        return RedirectResponse(url="https://accounts.google.com")
+
+    monkeypatch.setattr(
+        auth_routes.oauth.google, "authorize_redirect", authorize_redirect
+    )
+    with assert_max_queries(0):
+        response = client.get("/api/v1/auth/google", follow_redirects=False)
+    assert response.status_code == 307
+
+
+def test_google_callback_budget(client, database, monkeypatch, assert_max_queries):
+    async def authorize_access_token(request):
+        return {"userinfo": {"email": database["username"]}}
+
+    monkeypatch.setattr(
+        auth_routes.oauth.google, "authorize_access_token", authorize_access_token
+    )
+    with assert_max_queries(1):
+        response = client.get("/api/v1/auth/google/callback", follow_redirects=False)
+    assert response.status_code == 307
+
+
+def test_get_user_budget(client, headers, assert_max_queries):
+    with assert_max_queries(1):
+        response = client.get("/api/v1/auth/user", headers=headers)
+    assert response.status_code == 200
+
+
+def test_get_user_usage_budget(client, headers, assert_max_queries):
+    with assert_max_queries(3):
+        response = client.get("/api/v1/auth/user/usage", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["data"]["day"]["budget"] is None
+
+
+def test_generate_deck_budget(client, headers, assert_max_queries):
+    with assert_max_queries(3):
+        response = client.post(
+            "/api/v1/decks/generate", json={"topic": "topic"}, headers=headers
+        )
+    assert response.status_code == 201
+    assert [card["question"] for card in response.json()["data"]["cards"]] == [
+        card.question for card in GENERATED_DECK.cards
+    ]
+
+
+def test_generate_deck_in_background_budget(client, headers, assert_max_queries):
+    with assert_max_queries(2):
+        response = client.post(
+            "/api/v1/decks/generate?background=true",
+            json={"topic": "topic"},
+            headers=headers,
+        )
+    assert response.status_code == 202
+
+
+def test_generate_deck_stream_budget(client, headers, assert_max_queries):
+    # One INSERT per streamed card is inherent to streaming them as they arrive
+    with assert_max_queries(CARDS + 2):
+        response = client.post(
+            "/api/v1/decks/generate/stream", json={"topic": "topic"}, headers=headers
+        )
+    assert response.status_code == 200
+    assert response.text.count("event: card") == CARDS
+
+
+def test_rejected_generations_do_not_drain_the_token_bucket(
+    client, database, headers, monkeypatch
+):
+    monkeypatch.setattr(limiter, "enabled", True)
+    monkeypatch.setattr(llm_limiter, "enabled", True)
+    monkeypatch.setattr(llm_limiter, "store", MemoryBucketStore())
+    limiter.reset()
+
+    statuses = [
+        client.post("/api/v1/decks/generate", json={"topic": "topic"}, headers=headers).status_code
+        for _ in range(3)
+    ]
+    limiter.reset()
+
+    # The fake generations consume no tokens, so every reservation was refunded
+    _, balance = llm_limiter.store.take(
+        f"user:{database['user_id']}", 0, llm_limiter.capacity, 0
+    )
+    assert statuses == [201, 201, 429]
+    assert balance == pytest.approx(llm_limiter.capacity)
+
+
+def test_get_job_budget(client, database, headers, assert_max_queries):
+    with assert_max_queries(2):
+        response = client.get(
+            f"/api/v1/decks/jobs/{database['job_id']}", headers=headers
+        )
+    assert response.status_code == 200
+
+
+def test_list_decks_budget(client, headers, assert_max_queries):
+    with assert_max_queries(2):
+        response = client.get("/api/v1/decks?limit=100", headers=headers)
+    assert response.status_code == 200
+    assert all(deck["card_count"] == CARDS for deck in response.json()["data"][:CARDS])
+
+
+def test_get_deck_budget(client, database, headers, assert_max_queries):
+    with assert_max_queries(3):
+        response = client.get(
+            f"/api/v1/decks/{database['deck_ids'][0]}", headers=headers
+        )
+    assert response.status_code == 200
+    assert len(response.json()["data"]["cards"]) == CARDS
+
+
+def test_list_deck_cards_budget(client, database, headers, assert_max_queries):
+    with assert_max_queries(3):
+        response = client.get(
+            f"/api/v1/decks/{database['deck_ids'][0]}/cards", headers=headers
+        )
+    assert response.status_code == 200
+
+
+def test_update_deck_budget(client, database, headers, assert_max_queries):
+    with assert_max_queries(3):
+        response = client.patch(
+            f"/api/v1/decks/{database['deck_ids'][1]}",
+            json={"name": "renamed"},
+            headers=headers,
+        )
+    assert response.status_code == 200
+    assert len(response.json()["data"]["cards"]) == CARDS
+
+
+def test_delete_deck_budget(client, database, headers, assert_max_queries):
+    with assert_max_queries(2):
+        response = client.delete(
+            f"/api/v1/decks/{database['deck_ids'][-1]}", headers=headers
+        )
+    assert response.status_code == 204
+
+
+def test_cached_user_costs_no_query(client, database, headers, assert_max_queries):
+    client.get("/api/v1/auth/user", headers=headers)
+
+    with assert_max_queries(1):
+        response = client.get("/api/v1/decks", headers=headers)
+    assert response.status_code == 200
+
+    with assert_max_queries(0):
+        response = client.get("/api/v1/auth/user", headers=headers)
+    assert response.json()["data"]["username"] == database["username"]
+
+
+def test_lazy_user_costs_no_query(
+    client, headers, monkeypatch, assert_max_queries
+):
+    monkeypatch.setattr(settings, "AUTH_LAZY_USER", True)
+    with assert_max_queries(1):
+        response = client.get("/api/v1/decks", headers=headers)
+    assert response.status_code == 200
+
+
+def test_updated_user_is_not_served_from_cache(client, database, headers):
+    client.get("/api/v1/auth/user", headers=headers)
+
+    with Session(database["engine"]) as db:
+        db.get(User, database["user_id"]).username = "renamed"
+        db.commit()
+
+    response = client.get("/api/v1/auth/user", headers=headers)
+    assert response.json()["data"]["username"] == "renamed"
+
+    with Session(database["engine"]) as db:
+        db.get(User, database["user_id"]).username = database["username"]
+        db.commit()
+
+
+def test_deleted_user_is_not_served_from_cache(client, database):
+    user_id = _new_id()
+    with Session(database["engine"]) as db:
+        db.add(User(id=user_id, username="deleted"))
+        db.commit()
+    token = jwt_helpers.create_jwt_token("access", user_id)
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/api/v1/auth/user", headers=headers).status_code == 200
+
+    with Session(database["engine"]) as db:
+        assert UserService(db).delete(user_id)
+
+    assert client.get("/api/v1/auth/user", headers=headers).status_code == 401
+
+
+def _dependency_calls(dependant):
+    for dependency in dependant.dependencies:
+        yield dependency.call
+        yield from _dependency_calls(dependency)
+
+
+def test_async_routes_do_not_share_thread_local_sessions():
+    # get_db hands out the session of the threadpool worker resolving it, which
+    # another request may take over while an async route awaits
+    for route in app.routes:
+        dependant = getattr(route, "dependant", None)
+        if dependant is not None and inspect.iscoroutinefunction(dependant.call):
+            assert get_db not in set(_dependency_calls(dependant)), route.path
@@ -0,0 +1,147 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from starlette.requests import Request
+
+import app.main  # noqa: F401  (resolves the import order of the api package)
+from app.api.services.llm import TokenUsage
+from app.utils import jwt_helpers
+from app.utils.limiter import rate_limit_key
+from app.utils.rate_limit import (
+    MemoryBucketStore,
+    SQLiteBucketStore,
+    SQLiteCounterStorage,
+    TokenBucketLimiter,
+    build_bucket_store,
+)
+
+
+def _limiter(store=None, capacity=100, refill_rate=10, request_cost=40):
+    return TokenBucketLimiter(
+        store=store or MemoryBucketStore(),
+        capacity=capacity,
+        refill_rate=refill_rate,
+        request_cost=request_cost,
+    )
+
+
+def test_requests_are_rejected_once_the_bucket_is_empty():
+    limiter = _limiter()
+
+    limiter.acquire("user:u1")
+    limiter.acquire("user:u1")
+    with pytest.raises(HTTPException) as e:
+        limiter.acquire("user:u1")
+
+    assert e.value.status_code == 429
+    assert e.value.headers["Retry-After"] == "2"
+    limiter.acquire("user:u2")
+
+
+def test_consumed_tokens_overdraw_the_bucket_up_to_its_capacity():
+    limiter = _limiter()
+
+    limiter.acquire("user:u1")
+    assert limiter.charge("user:u1", 1_000) == pytest.approx(-100, abs=1)
+
+    with pytest.raises(HTTPException) as e:
+        limiter.acquire("user:u1")
+    assert e.value.headers["Retry-After"] == "14"
+
+
+def test_charges_are_settled_against_the_reservation():
+    limiter = _limiter(refill_rate=0.001)
+
+    limiter.acquire("user:u1")
+    assert limiter.charge("user:u1", 0, reserved=40) == pytest.approx(100, abs=1)
+
+    limiter.acquire("user:u1")
+    assert limiter.charge("user:u1", 100, reserved=40) == pytest.approx(0, abs=1)
+
+
+def test_bucket_refills_over_time():
+    limiter = _limiter(refill_rate=1_000)
+
+    limiter.charge("user:u1", 100)
+    time.sleep(0.1)
+
+    limiter.acquire("user:u1")
+
+
+def test_sqlite_buckets_are_shared_between_stores(tmp_path):
+    path = tmp_path / "buckets.db"
+    worker1 = _limiter(SQLiteBucketStore(str(path)), refill_rate=0.001)
+    worker2 = _limiter(SQLiteBucketStore(str(path)), refill_rate=0.001)
+
+    worker1.acquire("user:u1")
+    worker2.acquire("user:u1")
+    with pytest.raises(HTTPException):
+        worker1.acquire("user:u1")
+
+
+def test_sqlite_request_counters_are_shared_between_workers(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'buckets.db'}"
+    worker1 = FixedWindowRateLimiter(storage_from_string(uri))
+    worker2 = FixedWindowRateLimiter(storage_from_string(uri))
+    two_per_minute = parse("2/minute")
+
+    assert isinstance(worker1.storage, SQLiteCounterStorage)
+    assert worker1.hit(two_per_minute, "user:u1")
+    assert worker2.hit(two_per_minute, "user:u1")
+    assert not worker1.hit(two_per_minute, "user:u1")
+    assert worker2.hit(two_per_minute, "user:u2")
+
+
+def test_sqlite_request_counters_expire_with_their_window(tmp_path):
+    storage = SQLiteCounterStorage(f"sqlite:///{tmp_path / 'buckets.db'}")
+
+    assert storage.incr("key", expiry=0.05) == 1
+    assert storage.incr("key", expiry=0.05) == 2
+    time.sleep(0.06)
+
+    assert storage.get("key") == 0
+    assert storage.incr("key", expiry=0.05) == 1
+
+
+def test_disabled_limiter_allows_everything():
+    limiter = _limiter()
+    limiter.enabled = False
+
+    limiter.charge("user:u1", 1_000)
+    limiter.acquire("user:u1")
+
+
+def test_build_bucket_store(tmp_path):
+    assert isinstance(build_bucket_store(""), MemoryBucketStore)
+    assert isinstance(
+        build_bucket_store(f"sqlite:///{tmp_path / 'buckets.db'}"), SQLiteBucketStore
+    )
+    with pytest.raises(ValueError):
+        build_bucket_store("memcached://localhost")
+
+
+def test_token_usage_ignores_missing_usage():
+    usage = TokenUsage()
+    usage.add(None)
+    usage.add(type("Usage", (), {"total_tokens": 1234})())
+
+    assert usage.total_tokens == 1234
+
+
+def _request(authorization: str = "") -> Request:
+    headers = [(b"authorization", authorization.encode())] if authorization else []
+    return Request(
+        {"type": "http", "headers": headers, "client": ("10.0.0.1", 1234)}
+    )
+
+
+def test_rate_limit_key_prefers_the_authenticated_user():
+    token = jwt_helpers.create_jwt_token("access", "u1")
+
+    assert rate_limit_key(_request(f"Bearer {token}")) == "user:u1"
+    assert rate_limit_key(_request("Bearer invalid")) == "ip:10.0.0.1"
+    assert rate_limit_key(_request()) == "ip:10.0.0.1"
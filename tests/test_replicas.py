@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import Column, MetaData, String, Table, create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db.replicas import LEAST_LOADED, ReplicaSet, RoutingSession
+from app.utils.cache import LRUCache
+
+notes = Table("notes", MetaData(), Column("user_id", String))
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """A primary and two replicas, each a SQLite file that knows its own name."""
+    engines = {}
+    for name in ("primary", "replica1", "replica2"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}.db")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE server (name TEXT)"))
+            conn.execute(text("CREATE TABLE notes (user_id TEXT)"))
+            conn.execute(text("INSERT INTO server VALUES (:name)"), {"name": name})
+        engines[name] = engine
+    yield engines
+    for engine in engines.values():
+        engine.dispose()
+
+
+def _session_factory(engines, **kwargs):
+    replica_set = ReplicaSet(
+        primary=engines["primary"],
+        replicas=[engines["replica1"], engines["replica2"]],
+        **kwargs,
+    )
+    factory = sessionmaker(
+        bind=engines["primary"], class_=RoutingSession, info={"replica_set": replica_set}
+    )
+    return factory, replica_set
+
+
+def _server(db) -> str:
+    return db.execute(text("SELECT name FROM server")).scalar()
+
+
+def test_read_only_sessions_rotate_over_replicas(engines):
+    Session, replica_set = _session_factory(engines)
+
+    served = []
+    for _ in range(4):
+        with Session(info={"read_only": True}) as db:
+            served.append(_server(db))
+
+    assert served == ["replica1", "replica2", "replica1", "replica2"]
+    with Session() as db:
+        assert _server(db) == "primary"
+    assert replica_set.stats()["replica_reads"] == [2, 2]
+
+
+def test_user_reads_from_primary_after_a_write(engines):
+    Session, _ = _session_factory(engines, read_your_writes_window=0.2)
+
+    with Session(info={"user_id": "u1"}) as db:
+        db.execute(insert(notes).values(user_id="u1"))
+        db.commit()
+
+    with Session(info={"read_only": True, "user_id": "u1"}) as db:
+        assert _server(db) == "primary"
+    with Session(info={"read_only": True, "user_id": "u2"}) as db:
+        assert _server(db).startswith("replica")
+
+    time.sleep(0.25)
+    with Session(info={"read_only": True, "user_id": "u1"}) as db:
+        assert _server(db).startswith("replica")
+
+
+def test_rolled_back_write_does_not_pin_user(engines):
+    Session, replica_set = _session_factory(engines)
+
+    with Session(info={"user_id": "u1"}) as db:
+        db.execute(insert(notes).values(user_id="u1"))
+        db.rollback()
+        db.commit()
+
+    assert not replica_set.wrote_recently("u1")
+
+
+def test_least_loaded_prefers_idle_replica(engines):
+    Session, _ = _session_factory(engines, selection=LEAST_LOADED)
+
+    with Session(info={"read_only": True}) as busy:
+        first = _server(busy)
+        with Session(info={"read_only": True}) as db:
+            assert _server(db) != first
+
+
+def test_replica_sets_share_recent_writes(engines):
+    recent_writes = LRUCache(max_size=10, ttl=5)
+    sync_set = ReplicaSet(engines["primary"], [engines["replica1"]], recent_writes=recent_writes)
+    async_set = ReplicaSet(engines["primary"], [engines["replica2"]], recent_writes=recent_writes)
+
+    sync_set.record_write("u1")
+
+    assert async_set.read_engine("u1") is engines["primary"]
+    assert asyncio.run(async_set.read_engine_async("u1")) is engines["primary"]
+    assert asyncio.run(async_set.read_engine_async("u2")) is engines["replica2"]
@@ -0,0 +1,92 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+import app.main  # noqa: F401  (resolves the import order of the api package)
+from app.api.models import Deck, Flashcard, GenerationJob
+from app.api.v1.deck.schemas import (
+    GenerationJobResponse,
+    GetDeckResponse,
+    GetListCardResponse,
+    GetListDeckResponse,
+)
+from app.core.base.schema import SchemaSerializer, schema_serializer
+
+
+def _deck(cards: int) -> Deck:
+    deck = Deck(id="deck-1", name="Python", description="The GIL", user_id="user-1")
+    deck.cards = [
+        Flashcard(
+            id=f"card-{n}",
+            question=f"Question {n} \"quoted\" é",
+            answer="Answer",
+            explanation="Explanation",
+            deck_id=deck.id,
+        )
+        for n in range(cards)
+    ]
+    return deck
+
+
+def _expected(schema, **fields) -> dict:
+    model = schema.model_validate(fields, from_attributes=True)
+    return json.loads(model.model_dump_json())
+
+
+@pytest.mark.parametrize("cards", [0, 1, 25])
+def test_deck_matches_pydantic_serialization(cards):
+    fields = {"status_code": 200, "message": "ok", "data": _deck(cards)}
+
+    body = schema_serializer(GetDeckResponse).to_json(fields)
+
+    assert json.loads(body) == _expected(GetDeckResponse, **fields)
+
+
+def test_pages_of_rows_and_dicts_match_pydantic_serialization():
+    cards = {"status_code": 200, "message": "ok", "data": _deck(3).cards, "next_cursor": None}
+    summaries = {
+        "status_code": 200,
+        "message": "ok",
+        "data": [{"id": "deck-1", "name": "n", "description": "", "user_id": "u", "card_count": 2}],
+        "next_cursor": "cursor",
+    }
+
+    for schema, fields in ((GetListCardResponse, cards), (GetListDeckResponse, summaries)):
+        body = schema_serializer(schema).to_json(fields)
+        assert json.loads(body) == _expected(schema, **fields)
+
+
+def test_datetimes_and_optional_fields_match_pydantic_serialization():
+    job = GenerationJob(
+        id="job-1",
+        topic="Python",
+        status=GenerationJob.PENDING,
+        attempts=0,
+        created_at=datetime(2025, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc),
+    )
+    fields = {"status_code": 202, "message": "queued", "data": job}
+
+    body = schema_serializer(GenerationJobResponse).to_json(fields)
+
+    assert json.loads(body) == _expected(GenerationJobResponse, **fields)
+    assert b'"created_at":"2025-01-02T03:04:05.678000Z"' in body
+
+
+def test_only_schema_fields_are_serialized():
+    card = _deck(1).cards[0]
+
+    assert SchemaSerializer(GetListCardResponse).to_builtins(
+        {"status_code": 200, "message": "ok", "data": [card], "next_cursor": None}
+    )["data"] == [card.to_dict()]
+    assert set(schema_serializer(GetDeckResponse).to_builtins(
+        {"status_code": 200, "message": "ok", "data": _deck(1)}
+    )["data"]["cards"][0]) == {"question", "answer", "explanation"}
+
+
+def test_json_response_sets_status_and_media_type():
+    response = GetDeckResponse.json_response(status_code=201, message="created", data=_deck(2))
+
+    assert response.status_code == 201
+    assert response.media_type == "application/json"
+    assert json.loads(response.body)["status_code"] == 201
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+import app.main  # noqa: F401  (resolves the import order of the api package)
+from app.api.services.llm import build_generation_flight
+from app.utils.cache import build_cache
+from app.utils.single_flight import SingleFlight
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(f"kwiki_{name}", labels) or 0.0
+
+
+def test_concurrent_calls_are_coalesced_and_counted():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def generate():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "deck"
+
+    async def call_concurrently():
+        return await asyncio.gather(*(flight.do("topic", generate) for _ in range(3)))
+
+    assert asyncio.run(call_concurrently()) == ["deck"] * 3
+    assert len(runs) == 1
+    assert flight.stats()["coalesced"] == 2
+    assert _sample("single_flight_calls_total", flight="test", outcome="executed") == 1
+    assert _sample("single_flight_calls_total", flight="test", outcome="coalesced") == 2
+
+
+def test_cross_worker_locks_require_a_shared_deck_cache(tmp_path):
+    lock_dir = str(tmp_path / "locks")
+    shared = build_cache(max_size=10, shared_url=f"sqlite:///{tmp_path / 'cache.db'}")
+
+    assert build_generation_flight("", None).lock_backend is None
+    assert build_generation_flight(lock_dir, shared).lock_backend is not None
+    for cache in (None, build_cache(max_size=10)):
+        with pytest.raises(ValueError):
+            build_generation_flight(lock_dir, cache)
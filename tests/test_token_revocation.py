@@ -0,0 +1,106 @@
+import time
+import uuid
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.main  # noqa: F401  (resolves the import order of the api package)
+from app.api.services.token import TokenService
+from app.db.database import Base
+from app.utils import jwt_helpers
+from app.utils.bloom import BloomFilter
+from app.utils.revocation import RevocationIndex
+
+credentials_exception = HTTPException(status_code=401)
+
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tokens.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    items = [str(uuid.uuid4()) for _ in range(1000)]
+    bloom = BloomFilter(capacity=1000, error_rate=0.01, items=items)
+
+    assert all(item in bloom for item in items)
+    false_positives = sum(str(uuid.uuid4()) in bloom for _ in range(10_000))
+    assert false_positives < 300
+
+
+def test_index_forgets_expired_tokens():
+    index = RevocationIndex(capacity=10)
+    index.add("expired", time.time() - 1)
+    index.add("live", time.time() + 60)
+
+    assert index.prune() == 1
+    assert not index.is_revoked("expired")
+    assert index.is_revoked("live")
+
+
+def test_index_grows_past_its_capacity():
+    index = RevocationIndex(capacity=4)
+    token_ids = [str(uuid.uuid4()) for _ in range(20)]
+    for token_id in token_ids:
+        index.add(token_id, time.time() + 60)
+
+    assert all(index.is_revoked(token_id) for token_id in token_ids)
+    assert index.stats()["bloom_capacity"] >= 20
+
+
+def test_refresh_token_is_single_use(Session):
+    index = RevocationIndex()
+    refresh_token = jwt_helpers.create_jwt_token("refresh", "u1")
+
+    with Session() as db:
+        access_token, new_refresh_token = TokenService(db, index).rotate_refresh_token(
+            refresh_token
+        )
+    assert jwt_helpers.verify_jwt_token(access_token, credentials_exception) == "u1"
+
+    # Another worker, whose index does not know the token yet
+    with Session() as db:
+        with pytest.raises(HTTPException):
+            TokenService(db, RevocationIndex()).rotate_refresh_token(refresh_token)
+    with Session() as db:
+        TokenService(db, index).rotate_refresh_token(new_refresh_token)
+
+
+def test_revoked_access_token_is_rejected(Session, monkeypatch):
+    index = RevocationIndex()
+    monkeypatch.setattr(jwt_helpers, "revocation_index", index)
+    access_token = jwt_helpers.create_jwt_token("access", "u1")
+    claims = jwt_helpers.verify_jwt_claims(access_token, credentials_exception)
+
+    with Session() as db:
+        assert TokenService(db, index).revoke(access_token, claims)
+
+    with pytest.raises(HTTPException):
+        jwt_helpers.verify_jwt_token(access_token, credentials_exception)
+
+
+def test_revocations_of_other_workers_are_synced(Session):
+    access_token = jwt_helpers.create_jwt_token("access", "u1")
+    claims = jwt_helpers.verify_jwt_claims(access_token, credentials_exception)
+    worker, other_worker = RevocationIndex(), RevocationIndex()
+
+    with Session() as db:
+        since = TokenService(db, worker).load_index()
+        TokenService(db, other_worker).revoke(access_token, claims)
+        assert not worker.is_revoked(claims["jti"])
+
+        # RevocationSync overlaps each sync with the previous one
+        TokenService(db, worker).sync_index(since - timedelta(seconds=5))
+    assert worker.is_revoked(claims["jti"])
+
+    with Session() as db:
+        TokenService(db, RevocationIndex()).load_index()
+        restarted = RevocationIndex()
+        TokenService(db, restarted).load_index()
+    assert restarted.is_revoked(claims["jti"])
@@ -0,0 +1,193 @@
+import asyncio
+
+import anyio
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+import app.main  # noqa: F401  (resolves the import order of the api package)
+from app.api.models import LLMUsage
+from app.api.services.llm import TokenUsage
+from app.api.services import usage as usage_service
+from app.api.services.usage import UsageLedger, UsageService, generate_charged
+from app.api.v1.deck import routes as deck_routes
+from app.db.database import Base
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ledger.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def _usage(total_tokens: int) -> TokenUsage:
+    usage = TokenUsage()
+    usage.add(
+        type(
+            "Usage",
+            (),
+            {
+                "prompt_tokens": total_tokens // 4,
+                "completion_tokens": total_tokens - total_tokens // 4,
+                "total_tokens": total_tokens,
+            },
+        )(),
+        model="model",
+        latency=0.5,
+    )
+    return usage
+
+
+def _ledger(session_factory, **kwargs) -> UsageLedger:
+    return UsageLedger(
+        session_factory=session_factory,
+        **{"daily_budget": 1_000, "monthly_budget": 5_000, **kwargs},
+    )
+
+
+def _rows(session_factory) -> int:
+    with session_factory() as db:
+        return db.scalar(select(func.count()).select_from(LLMUsage))
+
+
+def test_records_are_written_in_batches(session_factory):
+    ledger = _ledger(session_factory, batch_size=2)
+
+    for _ in range(3):
+        ledger.record("u1", "topic", _usage(100))
+    ledger.record("u1", "cached", TokenUsage())
+    assert _rows(session_factory) == 0
+
+    assert ledger.flush() == 3
+    assert _rows(session_factory) == 3
+    with session_factory() as db:
+        row = db.scalars(select(LLMUsage)).first()
+        assert (row.model, row.prompt_tokens, row.total_tokens, row.latency_ms) == (
+            "model",
+            25,
+            100,
+            500,
+        )
+
+
+def test_usage_includes_records_not_flushed_yet(session_factory):
+    ledger = _ledger(session_factory)
+    ledger.record("u1", "topic", _usage(100))
+    ledger.flush()
+    ledger.record("u1", "topic", _usage(50))
+    ledger.record("u2", "topic", _usage(70))
+
+    with session_factory() as db:
+        usage = UsageService(db, ledger=ledger).get_usage("u1")
+
+    assert usage["day"]["requests"] == 2
+    assert usage["day"]["total_tokens"] == 150
+    assert usage["day"]["remaining"] == 850
+    assert usage["month"]["remaining"] == 4_850
+
+
+def test_spent_budget_rejects_generations(session_factory):
+    ledger = _ledger(session_factory)
+
+    asyncio.run(ledger.check_budget("u1"))
+    ledger.record("u1", "topic", _usage(1_200))
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(ledger.check_budget("u1"))
+    assert e.value.status_code == 429
+    assert 0 < int(e.value.headers["Retry-After"]) <= 86_400
+    asyncio.run(ledger.check_budget("u2"))
+
+
+def test_counters_load_the_usage_of_every_worker(session_factory):
+    worker1 = _ledger(session_factory)
+    worker2 = _ledger(session_factory)
+
+    asyncio.run(worker1.check_budget("u1"))
+    worker2.record("u1", "topic", _usage(1_200))
+    worker2.flush()
+    asyncio.run(worker1.check_budget("u1"))
+
+    worker1.reconcile()
+    with pytest.raises(HTTPException):
+        asyncio.run(worker1.check_budget("u1"))
+
+    # A fresh worker loads the ledger on first use
+    with pytest.raises(HTTPException):
+        asyncio.run(_ledger(session_factory).check_budget("u1"))
+
+
+def test_failed_flush_keeps_the_records(session_factory):
+    def unavailable():
+        raise ConnectionError("database unavailable")
+
+    ledger = _ledger(unavailable)
+    ledger.record("u1", "topic", _usage(100))
+
+    with pytest.raises(ConnectionError):
+        ledger.flush()
+
+    ledger.session_factory = session_factory
+    assert ledger.flush() == 1
+    assert ledger.stats()["pending"] == 0
+
+
+def test_a_cancelled_caller_is_charged_once_its_generation_ends(monkeypatch):
+    charged = []
+
+    async def charge_llm_usage(user_id, topic, usage, settle_reservation=True):
+        charged.append((user_id, usage.total_tokens))
+
+    monkeypatch.setattr(usage_service, "charge_llm_usage", charge_llm_usage)
+    finished = asyncio.Event()
+
+    async def generate(usage: TokenUsage) -> str:
+        await asyncio.sleep(0.05)
+        usage.add(_usage(120))
+        finished.set()
+        return "deck"
+
+    async def disconnect_during_generation():
+        caller = asyncio.create_task(generate_charged("u1", "topic", generate))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        assert charged == []
+        await finished.wait()
+        await asyncio.sleep(0)
+
+    asyncio.run(disconnect_during_generation())
+
+    assert charged == [("u1", 120)]
+
+
+def test_a_disconnected_stream_is_still_charged(session_factory, monkeypatch):
+    charged = []
+
+    async def charge_llm_usage(user_id, topic, usage, settle_reservation=True):
+        # Any checkpoint raises again in a cancelled scope that is not shielded
+        await anyio.sleep(0)
+        charged.append((user_id, usage.total_tokens))
+
+    class StalledLLMService:
+        async def stream_deck_from_topic(self, topic: str, usage=None):
+            usage.add(_usage(80))
+            await anyio.sleep(10)
+            yield "field", ("name", topic)
+
+    monkeypatch.setattr(deck_routes, "charge_llm_usage", charge_llm_usage)
+    monkeypatch.setattr(deck_routes, "SessionLocal", session_factory)
+
+    async def disconnect_mid_stream():
+        events = deck_routes._stream_deck_events("topic", "u1", StalledLLMService())
+        with anyio.move_on_after(0.05):
+            async for _ in events:
+                pass
+
+    anyio.run(disconnect_mid_stream)
+
+    assert charged == [("u1", 80)]